@@ -5,6 +5,19 @@ from flask_cors import CORS
 from config import Config
 from database import db
 from routes import api_bp
+from routes.async_reads import init_async_views
+from middleware.auth import init_auth
+from middleware.compression import init_compression
+from services.catalog_feed import init_catalog_feed
+from services.read_cache import init_read_caches
+from middleware.query_log import init_slow_query_log
+from services.progress_buffer import progress_buffer
+from services.jobs import job_runner
+from services.images import init_image_pipeline
+from services.suggest import suggest_index
+from services.rankings import init_rankings
+from services.recommendations import init_recommendations
+from services.activity import init_activity
 
 def create_app():
     app = Flask(__name__)
@@ -23,8 +36,21 @@ def create_app():
 
     db.init_app(app)
     migrate = Migrate(app, db)
+    init_slow_query_log(app)
+    init_auth(app)
+    init_compression(app)
+    init_catalog_feed(app)
+    init_read_caches(app)
+    init_image_pipeline(app)
+    suggest_index.init_app(app)
+    init_rankings(app)
+    init_recommendations(app)
+    init_activity(app)
+    progress_buffer.init_app(app)
+    job_runner.init_app(app)
 
     app.register_blueprint(api_bp)
+    init_async_views(app)
     
     @app.route('/health', methods=['GET'])
     def health_check():
@@ -32,8 +58,27 @@ def create_app():
     
     return app
 
+def start_background_threads(app):
+    """Start the job runner and the progress flusher in a process that serves requests.
+
+    create_app never does, so CLI commands (flask db upgrade, shell) neither run
+    jobs nor replay the progress journal.
+    """
+    job_runner.start()
+    progress_buffer.start()
+
+def init_worker(app):
+    """Per-process setup for a worker forked from a preloading master"""
+    with app.app_context():
+        # Connections opened in the master must not be shared; leave them for the master to close
+        db.engine.dispose(close=False)
+    start_background_threads(app)
+
 if __name__ == '__main__':
     app = create_app()
+    # With the reloader only the child process serves; the watching parent stays idle
+    if os.environ.get('WERKZEUG_RUN_MAIN') == 'true':
+        start_background_threads(app)
     port = int(os.environ.get('PORT', 5001))
     host = os.environ.get('HOST', '127.0.0.1')
     app.run(debug=True, host=host, port=port)
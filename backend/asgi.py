@@ -0,0 +1,19 @@
+"""ASGI entry point with the async read views enabled: uvicorn asgi:app --port 5001
+
+Flask stays a WSGI app. a2wsgi runs it on a pool of ASGI_THREADS threads and
+the async views run on the process's shared event loop (see AsyncDatabase),
+so uvicorn serves about as many concurrent requests as a gunicorn gthread
+worker with the same thread count. asgiref's WsgiToAsgi is not used: it runs
+every request on one thread.
+"""
+import os
+
+os.environ.setdefault('ASYNC_VIEWS', 'True')
+
+from a2wsgi import WSGIMiddleware
+from app import create_app, start_background_threads
+
+flask_app = create_app()
+start_background_threads(flask_app)
+
+app = WSGIMiddleware(flask_app, workers=int(os.getenv('ASGI_THREADS', '10')))
@@ -28,3 +28,130 @@ class Config:
             'http://127.0.0.1:3001'
         ])
         CORS_ORIGINS = list(set(CORS_ORIGINS))  # Remove duplicates
+
+    # Slow query log: statements slower than the threshold are logged with an EXPLAIN
+    SLOW_QUERY_LOG = os.getenv('SLOW_QUERY_LOG', 'True') == 'True'
+    SLOW_QUERY_THRESHOLD_MS = float(os.getenv('SLOW_QUERY_THRESHOLD_MS', '200'))
+    SLOW_QUERY_EXPLAIN = os.getenv('SLOW_QUERY_EXPLAIN', 'True') == 'True'
+
+    # Write-behind mode for progress toggles: events are coalesced in memory and flushed in bulk.
+    # Unflushed toggles are visible only in the worker process that took them: with several
+    # gunicorn workers, read-your-writes holds for PROGRESS_FLUSH_INTERVAL only if the load
+    # balancer routes each learner to the same worker (sticky sessions).
+    PROGRESS_WRITE_BEHIND = os.getenv('PROGRESS_WRITE_BEHIND', 'False') == 'True'
+    PROGRESS_FLUSH_INTERVAL = float(os.getenv('PROGRESS_FLUSH_INTERVAL', '1.0'))
+    PROGRESS_JOURNAL_PATH = os.getenv('PROGRESS_JOURNAL_PATH')  # unset keeps the buffer in memory only
+    # One journal per process (<path>.<pid>) for multi-worker servers; journals of dead workers are adopted
+    PROGRESS_JOURNAL_PER_PROCESS = os.getenv('PROGRESS_JOURNAL_PER_PROCESS', 'False') == 'True'
+    # Completed-lecture delta sync hands out cursors this far in the past, so writes committed late
+    # (longer transactions, second-precision timestamps) are not skipped
+    PROGRESS_SYNC_SETTLE_SECONDS = float(os.getenv('PROGRESS_SYNC_SETTLE_SECONDS', '5'))
+
+    # Rows per multi-row INSERT/IN list in bulk enrollment and import paths
+    BULK_CHUNK_SIZE = int(os.getenv('BULK_CHUNK_SIZE', '500'))
+
+    # Seconds a resolved X-User-Id principal (id, role, status) is reused across requests
+    PRINCIPAL_CACHE_TTL = float(os.getenv('PRINCIPAL_CACHE_TTL', '30'))
+
+    # Response compression (gzip, plus br/zstd when brotli/zstandard are installed)
+    COMPRESS_MIN_SIZE = int(os.getenv('COMPRESS_MIN_SIZE', '1024'))
+    COMPRESS_LEVEL = int(os.getenv('COMPRESS_LEVEL', '6'))
+    COMPRESS_CACHE_MAX_BYTES = int(os.getenv('COMPRESS_CACHE_MAX_BYTES', str(32 * 1024 * 1024)))
+
+    # Newest catalog changes are held back this long so concurrent commits cannot be skipped by a cursor.
+    # Change ids are allocated by a transaction's last statements, so this must exceed the time a COMMIT
+    # itself can take (not the transaction's length); a commit stalled longer can still be skipped.
+    CHANGE_FEED_SETTLE_SECONDS = float(os.getenv('CHANGE_FEED_SETTLE_SECONDS', '1'))
+
+    # Background jobs: durable queue in background_jobs, drained by an in-process thread pool
+    BACKGROUND_JOBS = os.getenv('BACKGROUND_JOBS', 'True') == 'True'
+    JOB_WORKERS = int(os.getenv('JOB_WORKERS', '2'))
+    JOB_POLL_INTERVAL = float(os.getenv('JOB_POLL_INTERVAL', '1.0'))
+    JOB_LOCK_TIMEOUT = int(os.getenv('JOB_LOCK_TIMEOUT', '300'))  # running jobs without a heartbeat this long are requeued
+    JOB_MAX_ATTEMPTS = int(os.getenv('JOB_MAX_ATTEMPTS', '5'))
+
+    # Media storage for uploaded lecture files (video, pdf, documents)
+    MEDIA_STORAGE = os.getenv('MEDIA_STORAGE', 'local')
+    MEDIA_ROOT = os.getenv('MEDIA_ROOT', os.path.join(os.path.dirname(os.path.abspath(__file__)), 'media'))
+    MEDIA_MAX_UPLOAD_SIZE = int(os.getenv('MEDIA_MAX_UPLOAD_SIZE', str(5 * 1024 * 1024 * 1024)))
+    MEDIA_CHUNK_SIZE = int(os.getenv('MEDIA_CHUNK_SIZE', str(1024 * 1024)))  # read/write block when streaming to disk
+    MEDIA_UPLOAD_TTL = int(os.getenv('MEDIA_UPLOAD_TTL', str(24 * 3600)))  # unfinished uploads are discarded after this
+    MEDIA_CHUNK_CLAIM_TIMEOUT = int(os.getenv('MEDIA_CHUNK_CLAIM_TIMEOUT', '60'))  # a chunk append claimed longer ago was abandoned
+    MEDIA_CACHE_MAX_AGE = int(os.getenv('MEDIA_CACHE_MAX_AGE', str(365 * 24 * 3600)))
+    # Types an upload may declare; files are served with it from the API origin, so nothing scriptable (html, svg)
+    MEDIA_ALLOWED_MIMETYPES = os.getenv(
+        'MEDIA_ALLOWED_MIMETYPES',
+        'video/mp4,video/webm,application/pdf,application/msword,'
+        'application/vnd.openxmlformats-officedocument.wordprocessingml.document,'
+        'application/vnd.openxmlformats-officedocument.presentationml.presentation,'
+        'image/png,image/jpeg,image/gif,image/webp'
+    ).split(',')
+    # Served inline; every other type is sent as an attachment
+    MEDIA_INLINE_MIMETYPES = os.getenv('MEDIA_INLINE_MIMETYPES', 'image/png,image/jpeg,image/gif,image/webp').split(',')
+    # Let a fronting Apache/lighttpd send media files (X-Sendfile) instead of the worker
+    USE_X_SENDFILE = os.getenv('USE_X_SENDFILE', 'False') == 'True'
+
+    # Resized WebP/JPEG derivatives of course images and profile pictures (needs Pillow)
+    IMAGE_DERIVATIVES = os.getenv('IMAGE_DERIVATIVES', 'True') == 'True'
+    # Redirects are followed only to hosts on this list, and never to non-public addresses
+    IMAGE_REMOTE_HOSTS = os.getenv(
+        'IMAGE_REMOTE_HOSTS', 'images.unsplash.com,unsplash.com,picsum.photos,fastly.picsum.photos'
+    ).split(',')
+    IMAGE_MAX_SOURCE_BYTES = int(os.getenv('IMAGE_MAX_SOURCE_BYTES', str(20 * 1024 * 1024)))
+    IMAGE_FETCH_TIMEOUT = float(os.getenv('IMAGE_FETCH_TIMEOUT', '10'))
+    IMAGE_QUALITY = int(os.getenv('IMAGE_QUALITY', '80'))
+
+    # Async views for catalog, course detail, reviews and the student dashboard (requirements-async.txt).
+    # They overlap a request's independent queries on one event loop per process; they do not let a
+    # worker thread serve more requests, and only pay off when the database is a network round trip away
+    ASYNC_VIEWS = os.getenv('ASYNC_VIEWS', 'False') == 'True'
+    ASYNC_DATABASE_URI = os.getenv('ASYNC_DATABASE_URL')  # unset derives it from the sync URI
+    ASYNC_POOL_SIZE = int(os.getenv('ASYNC_POOL_SIZE', '10'))
+
+    # Background threads start only in serving processes (wsgi.py, python app.py), never in CLI commands.
+    # Pre-fork servers (gunicorn.conf.py): they start in each worker instead of the master
+    DEFER_BACKGROUND_THREADS = os.getenv('DEFER_BACKGROUND_THREADS', 'False') == 'True'
+    # Fill the catalog, instructor card and course stats caches before the server takes traffic (wsgi.py)
+    WARM_CACHES_ON_START = os.getenv('WARM_CACHES_ON_START', 'True') == 'True'
+    WARMUP_COURSE_LIMIT = int(os.getenv('WARMUP_COURSE_LIMIT', '50'))  # most-enrolled courses whose pages are warmed
+
+    # Typeahead (/courses/suggest): in-memory prefix index, rebuilt in the background to pick up other workers' writes
+    SUGGEST_LIMIT = int(os.getenv('SUGGEST_LIMIT', '8'))
+    SUGGEST_MAX_LIMIT = int(os.getenv('SUGGEST_MAX_LIMIT', '20'))
+    SUGGEST_REFRESH_INTERVAL = float(os.getenv('SUGGEST_REFRESH_INTERVAL', '300'))
+    SUGGEST_MEMO_SIZE = int(os.getenv('SUGGEST_MEMO_SIZE', '1024'))
+
+    # The catalog listing, instructor cards and course stats are cached per process for this many seconds;
+    # a commit drops what it changed in its own process, other workers' writes show up after the TTL
+    READ_CACHE_TTL = float(os.getenv('READ_CACHE_TTL', '60'))
+
+    # Facet counts returned by /courses/search are cached per normalized query for this many seconds
+    FACET_CACHE_TTL = float(os.getenv('FACET_CACHE_TTL', '60'))
+
+    # Course leaderboards (/courses/trending): trending enrollments halve in weight every TRENDING_HALF_LIFE_DAYS
+    TRENDING_HALF_LIFE_DAYS = float(os.getenv('TRENDING_HALF_LIFE_DAYS', '7'))
+    TRENDING_LIMIT = int(os.getenv('TRENDING_LIMIT', '12'))
+    TRENDING_MAX_LIMIT = int(os.getenv('TRENDING_MAX_LIMIT', '50'))
+    # Top rated uses a Bayesian average: ratings are blended with this many votes at the prior mean
+    TOP_RATED_PRIOR_MEAN = float(os.getenv('TOP_RATED_PRIOR_MEAN', '3.5'))
+    TOP_RATED_PRIOR_COUNT = int(os.getenv('TOP_RATED_PRIOR_COUNT', '5'))
+
+    # "Students also enrolled in" (needs numpy and scipy); 0 disables the periodic incremental refresh
+    RECOMMENDATIONS_PER_COURSE = int(os.getenv('RECOMMENDATIONS_PER_COURSE', '10'))  # neighbours stored per course
+    RECOMMENDATIONS_LIMIT = int(os.getenv('RECOMMENDATIONS_LIMIT', '6'))
+    RECOMMENDATIONS_MIN_CO_ENROLLMENTS = int(os.getenv('RECOMMENDATIONS_MIN_CO_ENROLLMENTS', '1'))
+    RECOMMENDATIONS_REFRESH_INTERVAL = int(os.getenv('RECOMMENDATIONS_REFRESH_INTERVAL', '900'))
+    RECOMMENDATIONS_SETTLE_SECONDS = int(os.getenv('RECOMMENDATIONS_SETTLE_SECONDS', '60'))
+
+    # Instructor completion funnels; 0 disables the periodic incremental refresh of the rollups
+    COMPLETION_STATS_REFRESH_INTERVAL = int(os.getenv('COMPLETION_STATS_REFRESH_INTERVAL', '300'))
+    COMPLETION_STATS_SETTLE_SECONDS = int(os.getenv('COMPLETION_STATS_SETTLE_SECONDS', '60'))
+
+    # Activity log rollups behind streaks and heatmaps; 0 disables the periodic rollup
+    ACTIVITY_ROLLUP_INTERVAL = int(os.getenv('ACTIVITY_ROLLUP_INTERVAL', '60'))
+    ACTIVITY_ROLLUP_BATCH = int(os.getenv('ACTIVITY_ROLLUP_BATCH', '100000'))  # events per run
+    # Events are inserted by a transaction's last statements, so this must exceed the time a COMMIT itself
+    # can take; runs are at least this far apart and an event committed later than that is skipped
+    ACTIVITY_ROLLUP_SETTLE_SECONDS = float(os.getenv('ACTIVITY_ROLLUP_SETTLE_SECONDS', '5'))
+    ACTIVITY_DAYS = int(os.getenv('ACTIVITY_DAYS', '365'))  # default heatmap range
+    ACTIVITY_MAX_DAYS = int(os.getenv('ACTIVITY_MAX_DAYS', '731'))
@@ -1,3 +1,227 @@
 from flask_sqlalchemy import SQLAlchemy
+from sqlalchemy.exc import DBAPIError
+from concurrent.futures import Future
+from datetime import timedelta
+from functools import wraps
+import asyncio
+import contextvars
+import os
+import random
+import threading
+import time
 
-db = SQLAlchemy()
\ No newline at end of file
+db = SQLAlchemy()
+
+# Sync driver -> async driver used by the async read views
+ASYNC_DRIVERS = {
+    'mysql+mysqlconnector': 'mysql+aiomysql',
+    'mysql+pymysql': 'mysql+aiomysql',
+    'mysql': 'mysql+aiomysql',
+    'sqlite': 'sqlite+aiosqlite',
+    'postgresql': 'postgresql+asyncpg',
+    'postgresql+psycopg2': 'postgresql+asyncpg'
+}
+
+# MySQL deadlock / lock wait timeout, and SQLite's busy error
+RETRYABLE_ERRORS = (1213, 1205)
+
+
+def upsert(model, rows, conflict_columns, update_columns, increment_columns=()):
+    """Insert rows in one statement, updating update_columns from the new row on a unique-key conflict.
+
+    Uses INSERT ... ON DUPLICATE KEY UPDATE on MySQL and INSERT ... ON CONFLICT on
+    SQLite/PostgreSQL. increment_columns are added to the stored value instead of
+    replacing it. With neither, conflicting rows are left untouched.
+    """
+    if not rows:
+        return None
+    
+    return db.session.execute(upsert_statement(
+        db.session.get_bind().dialect.name, model, rows, conflict_columns, update_columns, increment_columns
+    ))
+
+
+def upsert_statement(dialect, model, rows, conflict_columns, update_columns, increment_columns=()):
+    """The statement behind upsert(), for executing on a Connection (e.g. inside flush events)"""
+    table = model.__table__
+    if dialect == 'mysql':
+        from sqlalchemy.dialects.mysql import insert
+        stmt = insert(model).values(rows)
+        assignments = {column: stmt.inserted[column] for column in update_columns}
+        assignments.update({column: table.c[column] + stmt.inserted[column] for column in increment_columns})
+        # A no-op assignment keeps duplicates silent without INSERT IGNORE swallowing other errors
+        stmt = stmt.on_duplicate_key_update(assignments or {conflict_columns[0]: table.c[conflict_columns[0]]})
+    else:
+        if dialect == 'postgresql':
+            from sqlalchemy.dialects.postgresql import insert
+        else:
+            from sqlalchemy.dialects.sqlite import insert
+        stmt = insert(model).values(rows)
+        assignments = {column: stmt.excluded[column] for column in update_columns}
+        assignments.update({column: table.c[column] + stmt.excluded[column] for column in increment_columns})
+        if assignments:
+            stmt = stmt.on_conflict_do_update(index_elements=conflict_columns, set_=assignments)
+        else:
+            stmt = stmt.on_conflict_do_nothing(index_elements=conflict_columns)
+    
+    return stmt
+
+
+def upsert_created(result, row, created_at):
+    """Whether a one-row upsert() inserted row rather than updating an existing one.
+
+    The upsert must leave created_at out of its update columns: the stored row
+    is new if it still carries the created_at the statement sent. MySQL keeps
+    whole seconds, but it also reports a row the update changed as 2 affected
+    rows (1 under CLIENT_FOUND_ROWS if nothing changed), so only an identical
+    resubmit within the same second reads as created there.
+    """
+    if result.rowcount == 2:
+        return False
+    if db.session.get_bind().dialect.name == 'mysql':
+        return abs(row.created_at - created_at) < timedelta(seconds=1)
+    return row.created_at == created_at
+
+
+def is_retryable(error):
+    """Whether error is a deadlock or lock wait timeout worth rerunning the transaction for.
+
+    mysql.connector raises a deadlock (1213) as InternalError and a lock wait
+    timeout (1205) as DatabaseError, so any DBAPIError is checked by its code.
+    """
+    if not isinstance(error, DBAPIError) or error.orig is None:
+        return False
+    orig = error.orig
+    code = getattr(orig, 'errno', None) or (orig.args[0] if orig.args else None)
+    return code in RETRYABLE_ERRORS or 'database is locked' in str(orig)
+
+
+def retry_on_deadlock(retries=3, backoff=0.05):
+    """Roll back and rerun a write when the database reports a deadlock or lock timeout"""
+    def decorator(f):
+        @wraps(f)
+        def decorated_function(*args, **kwargs):
+            for attempt in range(retries + 1):
+                try:
+                    return f(*args, **kwargs)
+                except DBAPIError as e:
+                    db.session.rollback()
+                    if attempt == retries or not is_retryable(e):
+                        raise
+                    time.sleep(backoff * (2 ** attempt) * (1 + random.random()))
+        
+        return decorated_function
+    
+    return decorator
+
+
+def async_database_uri(uri):
+    """Rewrite a sync SQLAlchemy URI to the matching async driver"""
+    scheme, sep, rest = uri.partition('://')
+    return ASYNC_DRIVERS.get(scheme, scheme) + sep + rest
+
+
+class AsyncDatabase:
+    """Async engine for the async read views.
+
+    Every helper runs on its own session, so independent queries can be
+    awaited together with gather(). Instead of a fresh asgiref loop per view
+    call, all async views of a process run on one long-lived event loop in a
+    background thread, where a pooled engine keeps its connections between
+    requests. The request thread still blocks until its view returns: this
+    buys concurrency inside a request, not more requests per worker thread.
+    """
+
+    def __init__(self):
+        self._uri = None
+        self._pool_size = 10
+        self._lock = threading.Lock()
+        self._loop = None
+        self._pid = None
+        self._engine = None
+        self._sessionmaker = None
+
+    def init_app(self, app):
+        self.dispose()
+        self._uri = app.config.get('ASYNC_DATABASE_URI') or async_database_uri(app.config['SQLALCHEMY_DATABASE_URI'])
+        self._pool_size = app.config.get('ASYNC_POOL_SIZE', 10)
+        # Flask calls this to wrap async views; the default starts a new loop per call
+        app.async_to_sync = self.async_to_sync
+
+    @property
+    def loop(self):
+        """The process's event loop, started on first use and again in a forked worker"""
+        with self._lock:
+            if self._loop is None or self._pid != os.getpid():
+                from sqlalchemy.ext.asyncio import async_sessionmaker, create_async_engine
+
+                options = {} if self._uri.startswith('sqlite') else {'pool_size': self._pool_size, 'pool_recycle': 3600}
+                self._engine = create_async_engine(self._uri, pool_pre_ping=True, **options)
+                self._sessionmaker = async_sessionmaker(self._engine, expire_on_commit=False)
+                self._loop = asyncio.new_event_loop()
+                self._pid = os.getpid()
+                threading.Thread(target=self._serve, args=(self._loop,), name='async-db', daemon=True).start()
+            return self._loop
+
+    @staticmethod
+    def _serve(loop):
+        loop.run_forever()
+        loop.close()
+
+    def run(self, coroutine):
+        """Run a coroutine on the shared loop and wait for its result.
+
+        It runs in a copy of the caller's context, so Flask's request and app
+        contexts are available to it.
+        """
+        loop = self.loop
+        done = Future()
+
+        def finished(task):
+            if task.cancelled():
+                done.cancel()
+            elif task.exception() is not None:
+                done.set_exception(task.exception())
+            else:
+                done.set_result(task.result())
+
+        loop.call_soon_threadsafe(lambda: loop.create_task(coroutine).add_done_callback(finished),
+                                  context=contextvars.copy_context())
+        return done.result()
+
+    def async_to_sync(self, func):
+        @wraps(func)
+        def run_view(*args, **kwargs):
+            return self.run(func(*args, **kwargs))
+        return run_view
+
+    def dispose(self):
+        """Close pooled connections and stop the loop; the next use starts over"""
+        with self._lock:
+            loop, engine, pid = self._loop, self._engine, self._pid
+            self._loop = self._engine = self._sessionmaker = None
+        if loop is None or pid != os.getpid():
+            return
+        asyncio.run_coroutine_threadsafe(engine.dispose(), loop).result()
+        loop.call_soon_threadsafe(loop.stop)
+
+    async def all(self, statement):
+        """Rows of a select"""
+        async with self._sessionmaker() as session:
+            return (await session.execute(statement)).all()
+
+    async def scalars(self, statement):
+        """ORM objects (or single column values) of a select"""
+        async with self._sessionmaker() as session:
+            return (await session.scalars(statement)).all()
+
+    async def scalar(self, statement):
+        async with self._sessionmaker() as session:
+            return await session.scalar(statement)
+
+    @staticmethod
+    async def gather(*awaitables):
+        return await asyncio.gather(*awaitables)
+
+
+async_db = AsyncDatabase()
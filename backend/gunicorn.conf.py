@@ -0,0 +1,46 @@
+"""gunicorn settings for production: gunicorn -c gunicorn.conf.py wsgi:app
+
+The app is imported and its caches warmed once in the master (preload_app),
+then the workers are forked from it and share those pages copy-on-write.
+Background threads (job runner, progress flusher) and database connections
+are never inherited; each worker starts its own in post_fork.
+
+Reloads:
+  kill -HUP <master>    new workers replace the old ones, which finish their
+                        in-flight requests first (up to graceful_timeout).
+                        With preload_app this reuses the code already loaded
+                        in the master, so it only picks up config changes.
+  kill -USR2 <master>   starts a new master running the new code next to the
+                        old one; then kill -WINCH <old master> to drain its
+                        workers and kill -TERM <old master> once they are gone.
+"""
+import multiprocessing
+import os
+
+bind = os.getenv('BIND', f"{os.getenv('HOST', '127.0.0.1')}:{os.getenv('PORT', '5001')}")
+workers = int(os.getenv('WEB_CONCURRENCY', str(multiprocessing.cpu_count() * 2 + 1)))
+threads = int(os.getenv('GUNICORN_THREADS', '1'))
+preload_app = os.getenv('PRELOAD_APP', 'True') == 'True'
+
+# Recycle workers after this many requests (jittered so they do not all restart together)
+max_requests = int(os.getenv('MAX_REQUESTS', '2000'))
+max_requests_jitter = int(os.getenv('MAX_REQUESTS_JITTER', '200'))
+
+# Seconds a stopping worker gets to finish in-flight requests
+graceful_timeout = int(os.getenv('GRACEFUL_TIMEOUT', '30'))
+timeout = int(os.getenv('GUNICORN_TIMEOUT', '60'))
+keepalive = int(os.getenv('KEEPALIVE', '5'))
+
+accesslog = os.getenv('ACCESS_LOG', '-')
+errorlog = '-'
+
+# Read by config.py, which is imported after this file
+os.environ.setdefault('FLASK_DEBUG', 'False')
+os.environ.setdefault('DEFER_BACKGROUND_THREADS', 'True')
+os.environ.setdefault('PROGRESS_JOURNAL_PER_PROCESS', 'True')
+
+
+def post_fork(server, worker):
+    from app import init_worker
+    from wsgi import app
+    init_worker(app)
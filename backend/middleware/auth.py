@@ -1,5 +1,151 @@
-from flask import request, jsonify
+from flask import request, jsonify, g, current_app
 from functools import wraps
+from collections import namedtuple
+from sqlalchemy import event
+from sqlalchemy.orm import Session
+from database import db
+from models import User
+import threading
+import time
+
+Principal = namedtuple('Principal', ['id', 'role', 'status'])
+
+
+class PrincipalCache:
+    """Process-wide TTL cache of principals keyed by user id"""
+    
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._entries = {}
+        self._generation = 0  # bumped by every invalidation
+    
+    def get(self, user_id):
+        with self._lock:
+            entry = self._entries.get(user_id)
+            if entry and entry[0] > time.monotonic():
+                return entry[1]
+            self._entries.pop(user_id, None)
+            return None
+    
+    @property
+    def generation(self):
+        return self._generation
+    
+    def set(self, principal, ttl, generation=None):
+        """Cache principal, unless an invalidation happened since generation was read"""
+        with self._lock:
+            if generation is not None and generation != self._generation:
+                return  # the row may have been read before a committed change
+            self._entries[principal.id] = (time.monotonic() + ttl, principal)
+    
+    def invalidate(self, user_id):
+        with self._lock:
+            self._entries.pop(user_id, None)
+            self._generation += 1
+    
+    def clear(self):
+        with self._lock:
+            self._entries.clear()
+
+
+principal_cache = PrincipalCache()
+
+
+def collect_principal_changes(session, flush_context):
+    """after_flush hook: remember changed users until the transaction commits"""
+    changed = session.info.setdefault('principal_changes', set())
+    for obj in list(session.dirty) + list(session.deleted):
+        if isinstance(obj, User):
+            changed.add(obj.id)
+
+
+def invalidate_principals(session):
+    # Role or status may have changed; other workers catch up when their entry expires
+    for user_id in session.info.pop('principal_changes', ()):
+        principal_cache.invalidate(user_id)
+
+
+def discard_principal_changes(session):
+    session.info.pop('principal_changes', None)
+
+
+def resolve_principal():
+    """Resolve X-User-Id to a Principal once per request, reusing cached lookups across requests"""
+    if 'principal' in g:
+        return g.principal
+    
+    principal = None
+    try:
+        user_id = int(request.headers.get('X-User-Id'))
+    except (TypeError, ValueError):
+        user_id = None
+    
+    if user_id is not None:
+        principal = principal_cache.get(user_id)
+        if principal is None:
+            generation = principal_cache.generation
+            row = db.session.query(User.id, User.role, User.status).filter(User.id == user_id).first()
+            if row:
+                principal = Principal(*row)
+                principal_cache.set(principal, current_app.config.get('PRINCIPAL_CACHE_TTL', 30), generation)
+    
+    g.principal = principal
+    return principal
+
+
+def init_auth(app):
+    # Invalidate after commit: a reader between the UPDATE and the commit would re-cache the old row
+    if not event.contains(Session, 'after_flush', collect_principal_changes):
+        event.listen(Session, 'after_flush', collect_principal_changes)
+        event.listen(Session, 'after_commit', invalidate_principals)
+        event.listen(Session, 'after_rollback', discard_principal_changes)
+    
+    @app.before_request
+    def load_principal():
+        resolve_principal()
+
+
+def require_role(*roles):
+    """Allow the request only if X-User-Id resolves to an active user with one of the roles"""
+    def decorator(f):
+        @wraps(f)
+        def decorated_function(*args, **kwargs):
+            user_id = request.headers.get('X-User-Id')
+            
+            if not user_id:
+                return jsonify({
+                    'success': False,
+                    'error': 'Authentication required'
+                }), 401
+            
+            try:
+                int(user_id)
+            except ValueError:
+                return jsonify({
+                    'success': False,
+                    'error': 'Invalid user ID'
+                }), 401
+            
+            principal = resolve_principal()
+            if not principal or principal.status != 'active':
+                return jsonify({
+                    'success': False,
+                    'error': 'User not found'
+                }), 404
+            
+            if principal.role not in roles:
+                return jsonify({
+                    'success': False,
+                    'error': f'{roles[0].capitalize()} access required'
+                }), 403
+            
+            request.user_id = principal.id
+            return f(*args, **kwargs)
+        
+        return decorated_function
+    
+    return decorator
+
 
 def require_auth(f):
     @wraps(f)
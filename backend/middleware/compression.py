@@ -0,0 +1,144 @@
+import gzip
+import hashlib
+import threading
+from collections import OrderedDict
+
+from flask import request
+
+try:
+    import brotli
+except ImportError:
+    brotli = None
+
+try:
+    import zstandard
+except ImportError:
+    zstandard = None
+
+COMPRESSIBLE_TYPES = ('application/json', 'text/', 'application/javascript', 'image/svg+xml')
+
+
+def _gzip(data, level):
+    return gzip.compress(data, compresslevel=level, mtime=0)
+
+
+def _brotli(data, level):
+    return brotli.compress(data, quality=min(level, 11))
+
+
+def _zstd(data, level):
+    return zstandard.ZstdCompressor(level=level).compress(data)
+
+
+# Server preference order when the client accepts several with the same q-value
+ENCODERS = OrderedDict()
+if brotli:
+    ENCODERS['br'] = _brotli
+if zstandard:
+    ENCODERS['zstd'] = _zstd
+ENCODERS['gzip'] = _gzip
+
+
+def choose_encoding(accept_encoding):
+    """Pick the best supported encoding from an Accept-Encoding header, or None"""
+    accepted = {}
+    for part in (accept_encoding or '').split(','):
+        name, _, params = part.strip().partition(';')
+        name = name.strip().lower()
+        if not name:
+            continue
+        q = 1.0
+        params = params.strip()
+        if params.startswith('q='):
+            try:
+                q = float(params[2:])
+            except ValueError:
+                q = 0.0
+        accepted[name] = q
+    
+    best, best_q = None, 0.0
+    for name in ENCODERS:
+        q = accepted.get(name, accepted.get('*', 0.0))
+        if q > best_q:
+            best, best_q = name, q
+    return best
+
+
+class CompressedBodyCache:
+    """LRU of compressed bodies keyed by (body digest, encoding), bounded by total bytes.
+
+    Hot responses such as the catalog serialize to identical bytes, so they are
+    compressed once and then served from here.
+    """
+    
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._entries = OrderedDict()
+        self._size = 0
+    
+    def get(self, key):
+        with self._lock:
+            body = self._entries.get(key)
+            if body is not None:
+                self._entries.move_to_end(key)
+            return body
+    
+    def put(self, key, body, max_bytes):
+        if len(body) > max_bytes:
+            return
+        with self._lock:
+            if key in self._entries:
+                return
+            self._entries[key] = body
+            self._size += len(body)
+            while self._size > max_bytes:
+                _, evicted = self._entries.popitem(last=False)
+                self._size -= len(evicted)
+    
+    def clear(self):
+        with self._lock:
+            self._entries.clear()
+            self._size = 0
+
+
+compressed_cache = CompressedBodyCache()
+
+
+def compress_body(body, encoding, level, max_cache_bytes):
+    key = (hashlib.sha1(body).digest(), encoding)
+    compressed = compressed_cache.get(key)
+    if compressed is None:
+        compressed = ENCODERS[encoding](body, level)
+        compressed_cache.put(key, compressed, max_cache_bytes)
+    return compressed
+
+
+def init_compression(app):
+    min_size = app.config.get('COMPRESS_MIN_SIZE', 1024)
+    level = app.config.get('COMPRESS_LEVEL', 6)
+    max_cache_bytes = app.config.get('COMPRESS_CACHE_MAX_BYTES', 32 * 1024 * 1024)
+    
+    @app.after_request
+    def compress_response(response):
+        if response.direct_passthrough or response.status_code < 200 or response.status_code >= 300 \
+                or response.status_code == 206 or 'Content-Encoding' in response.headers:
+            return response
+        if not (response.mimetype or '').startswith(COMPRESSIBLE_TYPES):
+            return response
+        
+        response.vary.add('Accept-Encoding')
+        
+        encoding = choose_encoding(request.headers.get('Accept-Encoding'))
+        if not encoding:
+            return response
+        
+        body = response.get_data()
+        if len(body) < min_size:
+            return response
+        
+        response.set_data(compress_body(body, encoding, level, max_cache_bytes))
+        response.headers['Content-Encoding'] = encoding
+        if response.headers.get('ETag'):
+            # A strong ETag names the identity bytes; the encoded variant needs its own
+            response.headers['ETag'] = response.headers['ETag'].rstrip('"') + f'-{encoding}"'
+        return response
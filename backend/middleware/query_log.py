@@ -0,0 +1,222 @@
+import hashlib
+import logging
+import os
+import queue
+import re
+import threading
+import time
+from datetime import datetime
+
+from flask import has_request_context, request
+from sqlalchemy import create_engine, event
+from sqlalchemy.pool import NullPool
+
+from database import db
+
+logger = logging.getLogger('slow_queries')
+
+_STRING_LITERAL = re.compile(r"'(?:''|\\.|[^'\\])*'")
+_NUMBER_LITERAL = re.compile(r'\b\d+(?:\.\d+)?\b')
+_PLACEHOLDER = re.compile(r'%\(\w+\)s|%s|:\w+|\?')
+_IN_LIST = re.compile(r'\bIN\s*\(\s*\?(?:\s*,\s*\?)*\s*\)', re.IGNORECASE)
+_WHITESPACE = re.compile(r'\s+')
+
+_EXPLAINABLE = ('SELECT', 'WITH', 'UPDATE', 'DELETE')
+
+
+def normalize_sql(statement):
+    """Strip literals and bind placeholders so equivalent statements share one shape"""
+    sql = _STRING_LITERAL.sub('?', statement)
+    sql = _PLACEHOLDER.sub('?', sql)
+    sql = _NUMBER_LITERAL.sub('?', sql)
+    sql = _IN_LIST.sub('IN (...)', sql)
+    return _WHITESPACE.sub(' ', sql).strip()
+
+
+def fingerprint(normalized_sql):
+    return hashlib.sha1(normalized_sql.encode('utf-8')).hexdigest()[:16]
+
+
+def parameter_shape(parameters, executemany=False):
+    """Describe bind parameters by type only, never by value"""
+    if executemany:
+        rows = list(parameters or [])
+        return {'rows': len(rows), 'row': parameter_shape(rows[0]) if rows else None}
+    if isinstance(parameters, dict):
+        return {key: type(value).__name__ for key, value in parameters.items()}
+    if isinstance(parameters, (list, tuple)):
+        return [type(value).__name__ for value in parameters]
+    return type(parameters).__name__ if parameters is not None else None
+
+
+def _current_route():
+    if has_request_context():
+        return request.endpoint or request.path
+    return 'background'
+
+
+class QueryStats:
+    """Per-fingerprint aggregate of statement timings, shared across requests"""
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._entries = {}
+
+    def record(self, normalized, duration_ms, route, shape, slow):
+        key = fingerprint(normalized)
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is None:
+                entry = self._entries[key] = {
+                    'fingerprint': key,
+                    'sql': normalized,
+                    'count': 0,
+                    'slow_count': 0,
+                    'total_ms': 0.0,
+                    'max_ms': 0.0,
+                    'routes': {},
+                    'parameter_shape': shape,
+                    'explain': None,
+                    'last_slow_at': None
+                }
+            entry['count'] += 1
+            entry['total_ms'] += duration_ms
+            entry['max_ms'] = max(entry['max_ms'], duration_ms)
+            entry['routes'][route] = entry['routes'].get(route, 0) + 1
+            if slow:
+                entry['slow_count'] += 1
+                entry['parameter_shape'] = shape
+                entry['last_slow_at'] = datetime.utcnow().isoformat()
+
+    def set_explain(self, key, explain):
+        with self._lock:
+            if key in self._entries:
+                self._entries[key]['explain'] = explain
+
+    def top(self, limit=20, sort='total_ms', slow_only=True):
+        with self._lock:
+            entries = [dict(e, routes=dict(e['routes'])) for e in self._entries.values()]
+        if slow_only:
+            entries = [e for e in entries if e['slow_count']]
+        for entry in entries:
+            entry['total_ms'] = round(entry['total_ms'], 2)
+            entry['max_ms'] = round(entry['max_ms'], 2)
+            entry['avg_ms'] = round(entry['total_ms'] / entry['count'], 2)
+        entries.sort(key=lambda e: e.get(sort, 0), reverse=True)
+        return entries[:limit]
+
+    def total_ms(self):
+        with self._lock:
+            return round(sum(e['total_ms'] for e in self._entries.values()), 2)
+
+    def reset(self):
+        with self._lock:
+            self._entries.clear()
+
+
+query_stats = QueryStats()
+
+
+class Explainer:
+    """Runs EXPLAIN for slow statements on a background thread.
+
+    Nothing runs inside the cursor event that found a statement slow: checking
+    out a second pooled connection there, while the first is still held, can
+    exhaust the pool under load. The thread connects through its own unpooled
+    engine, without the timing listeners. Each fingerprint is queued at most
+    once at a time and the queue is bounded, so a burst of slow statements
+    drops plans rather than piling up work.
+    """
+
+    def __init__(self, max_pending=100):
+        self._lock = threading.Lock()
+        self._queue = queue.Queue(maxsize=max_pending)
+        self._pending = set()
+        self._engines = {}
+        self._thread = None
+        self._pid = None
+
+    def submit(self, engine, key, statement, parameters):
+        if not statement.lstrip().upper().startswith(_EXPLAINABLE):
+            return
+        with self._lock:
+            if key in self._pending:
+                return
+            if self._thread is None or self._pid != os.getpid():
+                self._pid = os.getpid()
+                self._thread = threading.Thread(target=self._run, name='slow-query-explain', daemon=True)
+                self._thread.start()
+            try:
+                self._queue.put_nowait((engine.url, engine.dialect.name, key, statement, parameters))
+            except queue.Full:
+                return
+            self._pending.add(key)
+
+    def join(self):
+        """Wait until every queued statement is explained"""
+        self._queue.join()
+
+    def _run(self):
+        while True:
+            url, dialect, key, statement, parameters = self._queue.get()
+            try:
+                explain = self._explain(url, dialect, statement, parameters)
+                query_stats.set_explain(key, explain)
+                logger.warning('Plan of slow query %s: %s', key, explain)
+            finally:
+                with self._lock:
+                    self._pending.discard(key)
+                self._queue.task_done()
+
+    def _explain(self, url, dialect, statement, parameters):
+        prefix = 'EXPLAIN QUERY PLAN ' if dialect == 'sqlite' else 'EXPLAIN '
+        try:
+            engine = self._engines.get(url)
+            if engine is None:
+                engine = self._engines[url] = create_engine(url, poolclass=NullPool)
+            with engine.connect() as conn:
+                result = conn.exec_driver_sql(prefix + statement, parameters)
+                columns = list(result.keys())
+                return [dict(zip(columns, [str(v) if v is not None else None for v in row])) for row in result]
+        except Exception as e:
+            return [{'error': str(e)}]
+
+
+explainer = Explainer()
+
+
+def init_slow_query_log(app):
+    """Time every statement on the app engine and log the ones over SLOW_QUERY_THRESHOLD_MS"""
+    if not app.config.get('SLOW_QUERY_LOG'):
+        return
+
+    threshold_ms = app.config.get('SLOW_QUERY_THRESHOLD_MS', 200)
+    capture_explain = app.config.get('SLOW_QUERY_EXPLAIN', True)
+
+    with app.app_context():
+        engine = db.engine
+
+    # The start time lives on the statement's execution context, so a statement that fails
+    # (after_cursor_execute never fires) leaves nothing behind on the connection
+    @event.listens_for(engine, 'before_cursor_execute')
+    def before_cursor_execute(conn, cursor, statement, parameters, context, executemany):
+        context._query_start = time.perf_counter()
+
+    @event.listens_for(engine, 'after_cursor_execute')
+    def after_cursor_execute(conn, cursor, statement, parameters, context, executemany):
+        duration_ms = (time.perf_counter() - context._query_start) * 1000
+
+        normalized = normalize_sql(statement)
+        shape = parameter_shape(parameters, executemany)
+        route = _current_route()
+        slow = duration_ms >= threshold_ms
+
+        query_stats.record(normalized, duration_ms, route, shape, slow)
+
+        if slow:
+            logger.warning(
+                'Slow query %s (%.1f ms) [%s] %s params=%s',
+                fingerprint(normalized), duration_ms, route, normalized, shape
+            )
+            if capture_explain and not executemany:
+                explainer.submit(engine, fingerprint(normalized), statement, parameters)
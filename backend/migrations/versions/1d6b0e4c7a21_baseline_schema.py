@@ -0,0 +1,152 @@
+"""Baseline schema
+
+The tables as they were before migrations were versioned. A database created
+from those models with db.create_all() is stamped at this revision instead:
+
+    flask db stamp 1d6b0e4c7a21
+
+Revision ID: 1d6b0e4c7a21
+Revises:
+Create Date: 2026-10-19 12:32:17.000000
+
+"""
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision = '1d6b0e4c7a21'
+down_revision = None
+branch_labels = None
+depends_on = None
+
+
+def upgrade():
+    op.create_table('users',
+    sa.Column('id', sa.Integer(), nullable=False),
+    sa.Column('name', sa.String(length=100), nullable=False),
+    sa.Column('email', sa.String(length=120), nullable=False),
+    sa.Column('password', sa.String(length=255), nullable=False),
+    sa.Column('role', sa.Enum('learner', 'instructor', 'admin'), nullable=False),
+    sa.Column('status', sa.Enum('active', 'deleted'), nullable=False),
+    sa.Column('created_at', sa.DateTime(), nullable=True),
+    sa.PrimaryKeyConstraint('id')
+    )
+    op.create_index(op.f('ix_users_email'), 'users', ['email'], unique=True)
+    op.create_table('courses',
+    sa.Column('id', sa.Integer(), nullable=False),
+    sa.Column('title', sa.String(length=200), nullable=False),
+    sa.Column('description', sa.Text(), nullable=False),
+    sa.Column('about', sa.Text(), nullable=True),
+    sa.Column('instructor_id', sa.Integer(), nullable=False),
+    sa.Column('company', sa.String(length=100), nullable=True),
+    sa.Column('category', sa.String(length=50), nullable=False),
+    sa.Column('level', sa.Enum('Beginner', 'Intermediate', 'Advanced'), nullable=True),
+    sa.Column('duration', sa.String(length=50), nullable=True),
+    sa.Column('image', sa.String(length=255), nullable=True),
+    sa.Column('status', sa.Enum('active', 'unpublished', 'deleted'), nullable=False),
+    sa.Column('created_at', sa.DateTime(), nullable=True),
+    sa.ForeignKeyConstraint(['instructor_id'], ['users.id'], ),
+    sa.PrimaryKeyConstraint('id')
+    )
+    op.create_table('profiles',
+    sa.Column('id', sa.Integer(), nullable=False),
+    sa.Column('user_id', sa.Integer(), nullable=False),
+    sa.Column('bio', sa.Text(), nullable=True),
+    sa.Column('profile_picture', sa.String(length=255), nullable=True),
+    sa.Column('website', sa.String(length=255), nullable=True),
+    sa.Column('social_links', sa.Text(), nullable=True),
+    sa.Column('expertise', sa.Text(), nullable=True),
+    sa.Column('education', sa.Text(), nullable=True),
+    sa.Column('status', sa.Enum('active', 'deleted'), nullable=False),
+    sa.Column('updated_at', sa.DateTime(), nullable=True),
+    sa.ForeignKeyConstraint(['user_id'], ['users.id'], ),
+    sa.PrimaryKeyConstraint('id'),
+    sa.UniqueConstraint('user_id')
+    )
+    op.create_table('course_modules',
+    sa.Column('id', sa.Integer(), nullable=False),
+    sa.Column('course_id', sa.Integer(), nullable=False),
+    sa.Column('number', sa.Integer(), nullable=False),
+    sa.Column('title', sa.String(length=200), nullable=False),
+    sa.Column('lessons', sa.Integer(), nullable=True),
+    sa.Column('duration', sa.String(length=50), nullable=True),
+    sa.Column('status', sa.Enum('active', 'deleted'), nullable=False),
+    sa.ForeignKeyConstraint(['course_id'], ['courses.id'], ),
+    sa.PrimaryKeyConstraint('id')
+    )
+    op.create_table('enrollments',
+    sa.Column('id', sa.Integer(), nullable=False),
+    sa.Column('user_id', sa.Integer(), nullable=False),
+    sa.Column('course_id', sa.Integer(), nullable=False),
+    sa.Column('status', sa.Enum('active', 'completed', 'dropped', 'deleted'), nullable=True),
+    sa.Column('enrolled_at', sa.DateTime(), nullable=True),
+    sa.Column('completed_at', sa.DateTime(), nullable=True),
+    sa.ForeignKeyConstraint(['course_id'], ['courses.id'], ),
+    sa.ForeignKeyConstraint(['user_id'], ['users.id'], ),
+    sa.PrimaryKeyConstraint('id'),
+    sa.UniqueConstraint('user_id', 'course_id', name='unique_user_course')
+    )
+    op.create_table('ratings',
+    sa.Column('id', sa.Integer(), nullable=False),
+    sa.Column('course_id', sa.Integer(), nullable=False),
+    sa.Column('user_id', sa.Integer(), nullable=False),
+    sa.Column('rating', sa.Integer(), nullable=False),
+    sa.Column('status', sa.Enum('active', 'deleted'), nullable=False),
+    sa.Column('created_at', sa.DateTime(), nullable=True),
+    sa.ForeignKeyConstraint(['course_id'], ['courses.id'], ),
+    sa.ForeignKeyConstraint(['user_id'], ['users.id'], ),
+    sa.PrimaryKeyConstraint('id'),
+    sa.UniqueConstraint('user_id', 'course_id', name='unique_user_course_rating')
+    )
+    op.create_table('reviews',
+    sa.Column('id', sa.Integer(), nullable=False),
+    sa.Column('course_id', sa.Integer(), nullable=False),
+    sa.Column('user_id', sa.Integer(), nullable=False),
+    sa.Column('comment', sa.Text(), nullable=False),
+    sa.Column('status', sa.Enum('active', 'deleted'), nullable=False),
+    sa.Column('created_at', sa.DateTime(), nullable=True),
+    sa.Column('updated_at', sa.DateTime(), nullable=True),
+    sa.ForeignKeyConstraint(['course_id'], ['courses.id'], ),
+    sa.ForeignKeyConstraint(['user_id'], ['users.id'], ),
+    sa.PrimaryKeyConstraint('id')
+    )
+    op.create_table('lecture_resources',
+    sa.Column('id', sa.Integer(), nullable=False),
+    sa.Column('lecture_id', sa.Integer(), nullable=False),
+    sa.Column('resource_type', sa.Enum('video', 'pdf', 'link', 'document', 'quiz', 'text'), nullable=False),
+    sa.Column('title', sa.String(length=200), nullable=False),
+    sa.Column('url', sa.String(length=500), nullable=True),
+    sa.Column('content', sa.Text(), nullable=True),
+    sa.Column('duration', sa.String(length=50), nullable=True),
+    sa.Column('order', sa.Integer(), nullable=True),
+    sa.Column('status', sa.Enum('active', 'deleted'), nullable=False),
+    sa.Column('created_at', sa.DateTime(), nullable=True),
+    sa.ForeignKeyConstraint(['lecture_id'], ['course_modules.id'], ),
+    sa.PrimaryKeyConstraint('id')
+    )
+    op.create_table('progress',
+    sa.Column('id', sa.Integer(), nullable=False),
+    sa.Column('enrollment_id', sa.Integer(), nullable=False),
+    sa.Column('lecture_resource_id', sa.Integer(), nullable=False),
+    sa.Column('completed', sa.Boolean(), nullable=True),
+    sa.Column('completed_at', sa.DateTime(), nullable=True),
+    sa.Column('status', sa.Enum('active', 'deleted'), nullable=False),
+    sa.ForeignKeyConstraint(['enrollment_id'], ['enrollments.id'], ),
+    sa.ForeignKeyConstraint(['lecture_resource_id'], ['lecture_resources.id'], ),
+    sa.PrimaryKeyConstraint('id'),
+    sa.UniqueConstraint('enrollment_id', 'lecture_resource_id', name='unique_enrollment_lecture')
+    )
+
+
+def downgrade():
+    op.drop_table('progress')
+    op.drop_table('lecture_resources')
+    op.drop_table('reviews')
+    op.drop_table('ratings')
+    op.drop_table('enrollments')
+    op.drop_table('course_modules')
+    op.drop_table('profiles')
+    op.drop_table('courses')
+    op.drop_index(op.f('ix_users_email'), table_name='users')
+    op.drop_table('users')
@@ -0,0 +1,60 @@
+"""Deduplicate reviews and add unique_user_course_review
+
+Review submission upserts against (user_id, course_id), which is only atomic
+once the database enforces the key. Earlier schemas allowed several reviews
+per learner and course; all but the newest are removed first.
+
+Revision ID: 3f1c2a7d9b10
+Revises: 9b2f6d1a4c73
+Create Date: 2026-10-19 14:00:00.000000
+
+"""
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision = '3f1c2a7d9b10'
+down_revision = '9b2f6d1a4c73'
+branch_labels = None
+depends_on = None
+
+CONSTRAINT = 'unique_user_course_review'
+
+
+def upgrade():
+    bind = op.get_bind()
+    reviews = sa.table(
+        'reviews',
+        sa.column('id', sa.Integer),
+        sa.column('user_id', sa.Integer),
+        sa.column('course_id', sa.Integer),
+        sa.column('created_at', sa.DateTime),
+        sa.column('updated_at', sa.DateTime)
+    )
+    # Newest first per (user, course): last edit, then creation, then id
+    rows = bind.execute(sa.select(reviews.c.id, reviews.c.user_id, reviews.c.course_id).order_by(
+        reviews.c.user_id,
+        reviews.c.course_id,
+        sa.func.coalesce(reviews.c.updated_at, reviews.c.created_at).desc(),
+        reviews.c.created_at.desc(),
+        reviews.c.id.desc()
+    )).all()
+    seen = set()
+    duplicates = []
+    for review_id, user_id, course_id in rows:
+        if (user_id, course_id) in seen:
+            duplicates.append(review_id)
+        seen.add((user_id, course_id))
+    for start in range(0, len(duplicates), 500):
+        bind.execute(reviews.delete().where(reviews.c.id.in_(duplicates[start:start + 500])))
+
+    with op.batch_alter_table('reviews') as batch_op:
+        batch_op.create_unique_constraint(CONSTRAINT, ['user_id', 'course_id'])
+
+
+def downgrade():
+    # On MySQL the unique key may be the index backing the user_id foreign key
+    op.create_index('ix_reviews_user_id', 'reviews', ['user_id'])
+    with op.batch_alter_table('reviews') as batch_op:
+        batch_op.drop_constraint(CONSTRAINT, type_='unique')
@@ -0,0 +1,51 @@
+"""Add incrementally maintained course rankings
+
+Rows are seeded from the enrollment and rating aggregates on first use;
+the rebuild_course_rankings job fills in every course.
+
+Revision ID: 4f9c2e7a6b10
+Revises: d1a7b5c3e864
+Create Date: 2026-10-19 13:04:20.000000
+
+"""
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision = '4f9c2e7a6b10'
+down_revision = 'd1a7b5c3e864'
+branch_labels = None
+depends_on = None
+
+
+def upgrade():
+    op.create_table('course_rankings',
+    sa.Column('course_id', sa.Integer(), nullable=False),
+    sa.Column('category', sa.String(length=50), nullable=False),
+    sa.Column('active', sa.Boolean(), nullable=False),
+    sa.Column('trending_score', sa.Double(), nullable=False),
+    sa.Column('enrollment_count', sa.Integer(), nullable=False),
+    sa.Column('rating_sum', sa.Integer(), nullable=False),
+    sa.Column('rating_count', sa.Integer(), nullable=False),
+    sa.Column('rating_score', sa.Double(), nullable=False),
+    sa.Column('updated_at', sa.DateTime(), nullable=True),
+    sa.ForeignKeyConstraint(['course_id'], ['courses.id'], ),
+    sa.PrimaryKeyConstraint('course_id')
+    )
+    op.create_index('ix_course_rankings_category_popular', 'course_rankings', ['active', 'category', 'enrollment_count'], unique=False)
+    op.create_index('ix_course_rankings_category_top_rated', 'course_rankings', ['active', 'category', 'rating_score'], unique=False)
+    op.create_index('ix_course_rankings_category_trending', 'course_rankings', ['active', 'category', 'trending_score'], unique=False)
+    op.create_index('ix_course_rankings_popular', 'course_rankings', ['active', 'enrollment_count'], unique=False)
+    op.create_index('ix_course_rankings_top_rated', 'course_rankings', ['active', 'rating_score'], unique=False)
+    op.create_index('ix_course_rankings_trending', 'course_rankings', ['active', 'trending_score'], unique=False)
+
+
+def downgrade():
+    op.drop_index('ix_course_rankings_trending', table_name='course_rankings')
+    op.drop_index('ix_course_rankings_top_rated', table_name='course_rankings')
+    op.drop_index('ix_course_rankings_popular', table_name='course_rankings')
+    op.drop_index('ix_course_rankings_category_trending', table_name='course_rankings')
+    op.drop_index('ix_course_rankings_category_top_rated', table_name='course_rankings')
+    op.drop_index('ix_course_rankings_category_popular', table_name='course_rankings')
+    op.drop_table('course_rankings')
@@ -0,0 +1,34 @@
+"""Index the ordered module and resource lookups and the next-lecture search
+
+The outline and continue-learning queries walk modules by number and
+resources by order, and look for the first incomplete progress row.
+
+Revision ID: 5a9e3c2b7f48
+Revises: 1d6b0e4c7a21
+Create Date: 2026-10-19 12:39:11.000000
+
+"""
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision = '5a9e3c2b7f48'
+down_revision = '1d6b0e4c7a21'
+branch_labels = None
+depends_on = None
+
+
+def upgrade():
+    op.create_index('ix_course_modules_course_number', 'course_modules', ['course_id', 'number'], unique=False)
+    op.create_index('ix_lecture_resources_lecture_order', 'lecture_resources', ['lecture_id', 'status', 'order'], unique=False)
+    op.create_index('ix_progress_enrollment_completed', 'progress', ['enrollment_id', 'completed', 'status'], unique=False)
+
+
+def downgrade():
+    # On MySQL the composite indexes may be the ones backing the course_id and lecture_id foreign keys
+    op.create_index('ix_course_modules_course_id', 'course_modules', ['course_id'])
+    op.create_index('ix_lecture_resources_lecture_id', 'lecture_resources', ['lecture_id'])
+    op.drop_index('ix_progress_enrollment_completed', table_name='progress')
+    op.drop_index('ix_lecture_resources_lecture_order', table_name='lecture_resources')
+    op.drop_index('ix_course_modules_course_number', table_name='course_modules')
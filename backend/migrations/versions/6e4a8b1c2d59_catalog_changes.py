@@ -0,0 +1,34 @@
+"""Add the catalog change feed table
+
+Revision ID: 6e4a8b1c2d59
+Revises: 3f1c2a7d9b10
+Create Date: 2026-10-19 12:43:26.000000
+
+"""
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision = '6e4a8b1c2d59'
+down_revision = '3f1c2a7d9b10'
+branch_labels = None
+depends_on = None
+
+
+def upgrade():
+    op.create_table('catalog_changes',
+    sa.Column('id', sa.BigInteger().with_variant(sa.Integer(), 'sqlite'), nullable=False),
+    sa.Column('entity_type', sa.Enum('course', 'module', 'lecture_resource'), nullable=False),
+    sa.Column('entity_id', sa.Integer(), nullable=False),
+    sa.Column('course_id', sa.Integer(), nullable=True),
+    sa.Column('action', sa.Enum('create', 'update', 'publish', 'unpublish', 'delete'), nullable=False),
+    sa.Column('created_at', sa.DateTime(), nullable=False),
+    sa.PrimaryKeyConstraint('id')
+    )
+    op.create_index(op.f('ix_catalog_changes_course_id'), 'catalog_changes', ['course_id'], unique=False)
+
+
+def downgrade():
+    op.drop_index(op.f('ix_catalog_changes_course_id'), table_name='catalog_changes')
+    op.drop_table('catalog_changes')
@@ -0,0 +1,66 @@
+"""Add completion funnel rollups
+
+The refresh finds courses with new completions through progress.updated_at.
+
+Revision ID: 7d2b9f1e3a56
+Revises: a3e6d8b4c925
+Create Date: 2026-10-19 13:10:13.000000
+
+"""
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision = '7d2b9f1e3a56'
+down_revision = 'a3e6d8b4c925'
+branch_labels = None
+depends_on = None
+
+
+def upgrade():
+    op.create_table('course_completion_stats',
+    sa.Column('course_id', sa.Integer(), nullable=False),
+    sa.Column('learners', sa.Integer(), nullable=False),
+    sa.Column('completed_count', sa.Integer(), nullable=False),
+    sa.Column('computed_at', sa.DateTime(), nullable=False),
+    sa.ForeignKeyConstraint(['course_id'], ['courses.id'], ),
+    sa.PrimaryKeyConstraint('course_id')
+    )
+    op.create_index(op.f('ix_course_completion_stats_computed_at'), 'course_completion_stats', ['computed_at'], unique=False)
+    op.create_table('module_completion_stats',
+    sa.Column('module_id', sa.Integer(), nullable=False),
+    sa.Column('course_id', sa.Integer(), nullable=False),
+    sa.Column('started_count', sa.Integer(), nullable=False),
+    sa.Column('completed_count', sa.Integer(), nullable=False),
+    sa.Column('median_seconds', sa.Integer(), nullable=True),
+    sa.Column('computed_at', sa.DateTime(), nullable=False),
+    sa.ForeignKeyConstraint(['course_id'], ['courses.id'], ),
+    sa.ForeignKeyConstraint(['module_id'], ['course_modules.id'], ),
+    sa.PrimaryKeyConstraint('module_id')
+    )
+    op.create_index(op.f('ix_module_completion_stats_course_id'), 'module_completion_stats', ['course_id'], unique=False)
+    op.create_table('lecture_completion_stats',
+    sa.Column('lecture_resource_id', sa.Integer(), nullable=False),
+    sa.Column('course_id', sa.Integer(), nullable=False),
+    sa.Column('module_id', sa.Integer(), nullable=False),
+    sa.Column('completed_count', sa.Integer(), nullable=False),
+    sa.Column('median_seconds', sa.Integer(), nullable=True),
+    sa.Column('computed_at', sa.DateTime(), nullable=False),
+    sa.ForeignKeyConstraint(['course_id'], ['courses.id'], ),
+    sa.ForeignKeyConstraint(['lecture_resource_id'], ['lecture_resources.id'], ),
+    sa.ForeignKeyConstraint(['module_id'], ['course_modules.id'], ),
+    sa.PrimaryKeyConstraint('lecture_resource_id')
+    )
+    op.create_index(op.f('ix_lecture_completion_stats_course_id'), 'lecture_completion_stats', ['course_id'], unique=False)
+    op.create_index('ix_progress_updated_at', 'progress', ['updated_at'], unique=False)
+
+
+def downgrade():
+    op.drop_index('ix_progress_updated_at', table_name='progress')
+    op.drop_index(op.f('ix_lecture_completion_stats_course_id'), table_name='lecture_completion_stats')
+    op.drop_table('lecture_completion_stats')
+    op.drop_index(op.f('ix_module_completion_stats_course_id'), table_name='module_completion_stats')
+    op.drop_table('module_completion_stats')
+    op.drop_index(op.f('ix_course_completion_stats_computed_at'), table_name='course_completion_stats')
+    op.drop_table('course_completion_stats')
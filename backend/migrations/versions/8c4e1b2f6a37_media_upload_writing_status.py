@@ -0,0 +1,36 @@
+"""Add the 'writing' status of media uploads
+
+A chunk claims its offset by setting status to 'writing' before it is
+appended to the partial file.
+
+Revision ID: 8c4e1b2f6a37
+Revises: 2c8f4a6e1b37
+Create Date: 2026-10-19 16:00:00.000000
+
+"""
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision = '8c4e1b2f6a37'
+down_revision = '2c8f4a6e1b37'
+branch_labels = None
+depends_on = None
+
+OLD_STATUS = sa.Enum('uploading', 'complete')
+NEW_STATUS = sa.Enum('uploading', 'writing', 'complete')
+
+
+def upgrade():
+    with op.batch_alter_table('media_uploads') as batch_op:
+        batch_op.alter_column('status', existing_type=OLD_STATUS, type_=NEW_STATUS,
+                              existing_nullable=False, existing_server_default=None)
+
+
+def downgrade():
+    media_uploads = sa.table('media_uploads', sa.column('status', NEW_STATUS))
+    op.execute(media_uploads.update().where(media_uploads.c.status == 'writing').values(status='uploading'))
+    with op.batch_alter_table('media_uploads') as batch_op:
+        batch_op.alter_column('status', existing_type=NEW_STATUS, type_=OLD_STATUS,
+                              existing_nullable=False, existing_server_default=None)
@@ -0,0 +1,28 @@
+"""Add progress.updated_at for delta sync of completed lectures
+
+Existing rows keep NULL and are only returned by a full sync.
+
+Revision ID: 9b2f6d1a4c73
+Revises: 5a9e3c2b7f48
+Create Date: 2026-10-19 12:39:47.000000
+
+"""
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision = '9b2f6d1a4c73'
+down_revision = '5a9e3c2b7f48'
+branch_labels = None
+depends_on = None
+
+
+def upgrade():
+    op.add_column('progress', sa.Column('updated_at', sa.DateTime(), nullable=True))
+    op.create_index('ix_progress_enrollment_updated', 'progress', ['enrollment_id', 'updated_at'], unique=False)
+
+
+def downgrade():
+    op.drop_index('ix_progress_enrollment_updated', table_name='progress')
+    op.drop_column('progress', 'updated_at')
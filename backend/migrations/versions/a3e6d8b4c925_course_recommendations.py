@@ -0,0 +1,51 @@
+"""Add co-enrollment recommendations and track ranking enrollment changes
+
+course_rankings.enrollments_changed_at tells the incremental refresh which
+courses gained or lost learners.
+
+Revision ID: a3e6d8b4c925
+Revises: 4f9c2e7a6b10
+Create Date: 2026-10-19 13:06:19.000000
+
+"""
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision = 'a3e6d8b4c925'
+down_revision = '4f9c2e7a6b10'
+branch_labels = None
+depends_on = None
+
+
+def upgrade():
+    op.create_table('recommendation_runs',
+    sa.Column('id', sa.Integer(), nullable=False),
+    sa.Column('mode', sa.Enum('full', 'incremental'), nullable=False),
+    sa.Column('started_at', sa.DateTime(), nullable=False),
+    sa.Column('finished_at', sa.DateTime(), nullable=True),
+    sa.Column('courses_refreshed', sa.Integer(), nullable=False),
+    sa.PrimaryKeyConstraint('id')
+    )
+    op.create_table('course_recommendations',
+    sa.Column('course_id', sa.Integer(), nullable=False),
+    sa.Column('recommended_course_id', sa.Integer(), nullable=False),
+    sa.Column('score', sa.Double(), nullable=False),
+    sa.Column('co_enrollments', sa.Integer(), nullable=False),
+    sa.Column('computed_at', sa.DateTime(), nullable=False),
+    sa.ForeignKeyConstraint(['course_id'], ['courses.id'], ),
+    sa.ForeignKeyConstraint(['recommended_course_id'], ['courses.id'], ),
+    sa.PrimaryKeyConstraint('course_id', 'recommended_course_id')
+    )
+    op.create_index('ix_course_recommendations_course_score', 'course_recommendations', ['course_id', 'score'], unique=False)
+    op.add_column('course_rankings', sa.Column('enrollments_changed_at', sa.DateTime(), nullable=True))
+    op.create_index(op.f('ix_course_rankings_enrollments_changed_at'), 'course_rankings', ['enrollments_changed_at'], unique=False)
+
+
+def downgrade():
+    op.drop_index(op.f('ix_course_rankings_enrollments_changed_at'), table_name='course_rankings')
+    op.drop_column('course_rankings', 'enrollments_changed_at')
+    op.drop_index('ix_course_recommendations_course_score', table_name='course_recommendations')
+    op.drop_table('course_recommendations')
+    op.drop_table('recommendation_runs')
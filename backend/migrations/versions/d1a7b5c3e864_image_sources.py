@@ -0,0 +1,33 @@
+"""Add image sources and their generated derivatives
+
+Revision ID: d1a7b5c3e864
+Revises: 8c4e1b2f6a37
+Create Date: 2026-10-19 12:52:27.000000
+
+"""
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision = 'd1a7b5c3e864'
+down_revision = '8c4e1b2f6a37'
+branch_labels = None
+depends_on = None
+
+
+def upgrade():
+    op.create_table('image_sources',
+    sa.Column('url_hash', sa.String(length=40), nullable=False),
+    sa.Column('url', sa.String(length=500), nullable=False),
+    sa.Column('source_sha256', sa.String(length=64), nullable=True),
+    sa.Column('variants', sa.Text(), nullable=True),
+    sa.Column('status', sa.Enum('pending', 'ready', 'failed'), nullable=False),
+    sa.Column('error', sa.Text(), nullable=True),
+    sa.Column('updated_at', sa.DateTime(), nullable=True),
+    sa.PrimaryKeyConstraint('url_hash')
+    )
+
+
+def downgrade():
+    op.drop_table('image_sources')
@@ -1,6 +1,8 @@
 from datetime import datetime
+import hashlib
 from database import db
-from sqlalchemy import Numeric, func
+from sqlalchemy import Numeric, func, or_, select
+from sqlalchemy.orm import defer
 import json
 
 
@@ -41,6 +43,8 @@ class User(db.Model):
 class Course(db.Model):
     __tablename__ = 'courses'
     
+    IMAGE_PRESETS = ('card', 'thumbnail')  # derivatives generated for image
+    
     id = db.Column(db.Integer, primary_key=True)
     title = db.Column(db.String(200), nullable=False)
     description = db.Column(db.Text, nullable=False)
@@ -79,7 +83,98 @@ class Course(db.Model):
             Review.status == 'active'
         ).count()
     
-    def to_dict(self, include_instructor=False, include_modules=False, include_details=False, include_stats=False):
+    @staticmethod
+    def stats_statements(course_ids):
+        """The grouped (course_id, value) selects behind bulk_stats, by stat name"""
+        return {
+            'rating': select(Rating.course_id, func.avg(Rating.rating)).where(
+                Rating.course_id.in_(course_ids),
+                Rating.status == 'active'
+            ).group_by(Rating.course_id),
+            'total_students': select(Enrollment.course_id, func.count(Enrollment.id)).where(
+                Enrollment.course_id.in_(course_ids),
+                Enrollment.status.in_(['active', 'completed'])
+            ).group_by(Enrollment.course_id),
+            'total_reviews': select(Review.course_id, func.count(Review.id)).where(
+                Review.course_id.in_(course_ids),
+                Review.status == 'active'
+            ).group_by(Review.course_id)
+        }
+    
+    @staticmethod
+    def merge_stats(course_ids, results):
+        """Build the bulk_stats mapping from {stat: [(course_id, value)]}"""
+        stats = {course_id: {'rating': 0.0, 'total_students': 0, 'total_reviews': 0} for course_id in course_ids}
+        for course_id, avg in results.get('rating', []):
+            stats[course_id]['rating'] = round(float(avg), 1) if avg else 0.0
+        for name in ('total_students', 'total_reviews'):
+            for course_id, count in results.get(name, []):
+                stats[course_id][name] = count
+        return stats
+    
+    @staticmethod
+    def bulk_stats(course_ids):
+        """rating, total_students and total_reviews for many courses, one grouped query each for the uncached ones"""
+        from services.read_cache import course_stats_cache
+        
+        course_ids = list(set(course_ids))
+        if not course_ids:
+            return {}
+        stats, missing = course_stats_cache.get_many(course_ids)
+        if missing:
+            loaded = Course.merge_stats(missing, {
+                name: db.session.execute(statement).all()
+                for name, statement in Course.stats_statements(missing).items()
+            })
+            course_stats_cache.set_many(loaded)
+            stats.update(loaded)
+        return stats
+    
+    @staticmethod
+    def instructor_cards_statement(instructor_ids):
+        return select(User.id, User.name, Profile.bio, Profile.profile_picture).outerjoin(
+            Profile, (Profile.user_id == User.id) & (Profile.status == 'active')
+        ).where(User.id.in_(list(set(instructor_ids))))
+    
+    @staticmethod
+    def cards_from_rows(rows):
+        return {
+            user_id: {'instructor': name, 'instructor_bio': bio, 'instructor_image': image}
+            for user_id, name, bio, image in rows
+        }
+    
+    @staticmethod
+    def instructor_cards(instructor_ids):
+        """Instructor name, bio and image keyed by user id, in one join for the uncached ones"""
+        from services.read_cache import instructor_card_cache
+        
+        if not instructor_ids:
+            return {}
+        cards, missing = instructor_card_cache.get_many(set(instructor_ids))
+        if missing:
+            loaded = Course.cards_from_rows(db.session.execute(Course.instructor_cards_statement(missing)))
+            instructor_card_cache.set_many(loaded)
+            cards.update(loaded)
+        return cards
+    
+    @staticmethod
+    def bulk_to_dict(courses, include_instructor=False):
+        """Serialize many courses with set-based stats and instructor lookups"""
+        stats = Course.bulk_stats([course.id for course in courses])
+        cards = Course.instructor_cards([course.instructor_id for course in courses]) if include_instructor else {}
+        images = ImageSource.variants_for([course.image for course in courses], Course.IMAGE_PRESETS)
+        return [
+            course.to_dict(
+                include_instructor=include_instructor,
+                stats=stats[course.id],
+                instructor_card=cards.get(course.instructor_id, {}),
+                image_variants=images.get(course.image, {})
+            )
+            for course in courses
+        ]
+    
+    def to_dict(self, include_instructor=False, include_modules=False, include_details=False, include_stats=False,
+                stats=None, instructor_card=None, image_variants=None):
         data = {
             'id': self.id,
             'title': self.title,
@@ -95,25 +190,23 @@ class Course(db.Model):
             'created_at': self.created_at.isoformat() if self.created_at else None
         }
         
+        # Resized card/thumbnail renditions; None until the image pipeline has processed the image
+        if image_variants is None and self.image:
+            image_variants = ImageSource.variants_for([self.image], Course.IMAGE_PRESETS).get(self.image)
+        data['image_variants'] = image_variants or None
+        
         # Include stats by default for backwards compatibility
         if include_stats or True:
-            data['rating'] = self.rating
-            data['total_students'] = self.total_students
-            data['total_reviews'] = self.total_reviews
+            if stats is None:
+                stats = Course.bulk_stats([self.id])[self.id]
+            data.update(stats)
         
         
         if include_instructor:
-            instructor = User.query.get(self.instructor_id)
-            if instructor:
-                data['instructor'] = instructor.name
-                # Fetch instructor profile data
-                profile = Profile.query.filter_by(user_id=instructor.id, status='active').first()
-                if profile:
-                    data['instructor_bio'] = profile.bio
-                    data['instructor_image'] = profile.profile_picture
-                else:
-                    data['instructor_bio'] = None
-                    data['instructor_image'] = None
+            if instructor_card is None:
+                instructor_card = Course.instructor_cards([self.instructor_id]).get(self.instructor_id)
+            if instructor_card:
+                data.update(instructor_card)
         
         if include_modules:
             modules = CourseModule.query.filter_by(course_id=self.id).order_by(CourseModule.number).all()
@@ -133,15 +226,17 @@ class CourseModule(db.Model):
     duration = db.Column(db.String(50), nullable=True)
     status = db.Column(db.Enum('active', 'deleted'), default='active', nullable=False)
     
+    __table_args__ = (db.Index('ix_course_modules_course_number', 'course_id', 'number'),)
+    
     @property
     def resource_count(self):
-        """Get the number of resources for this lecture"""
+        """Get the number of active resources for this lecture"""
         from models import LectureResource
-        return LectureResource.query.filter_by(lecture_id=self.id).count()
+        return LectureResource.query.filter_by(lecture_id=self.id, status='active').count()
     
-    def to_dict(self):
+    def to_dict(self, resource_count=None):
         # Auto-calculate lessons based on resource count
-        actual_lessons = self.resource_count
+        actual_lessons = self.resource_count if resource_count is None else resource_count
         
         return {
             'id': self.id,
@@ -173,12 +268,71 @@ class Enrollment(db.Model):
         from models import Progress
         return Progress.calculate_course_progress(self.id)
     
-    def to_dict(self, include_course=False, include_next_lecture=False):
+    @staticmethod
+    def progress_statements(enrollments):
+        """(lectures per course, completed per enrollment) grouped selects behind bulk_progress"""
+        from models import Progress
+        totals = select(CourseModule.course_id, func.count(LectureResource.id)).join(
+            LectureResource, LectureResource.lecture_id == CourseModule.id
+        ).where(
+            CourseModule.course_id.in_({e.course_id for e in enrollments}),
+            LectureResource.status == 'active',
+            CourseModule.status == 'active'
+        ).group_by(CourseModule.course_id)
+        
+        completed = select(Progress.enrollment_id, func.count(Progress.id)).where(
+            Progress.enrollment_id.in_([e.id for e in enrollments]),
+            Progress.completed == True,
+            Progress.status == 'active'
+        ).group_by(Progress.enrollment_id)
+        return totals, completed
+    
+    @staticmethod
+    def merge_progress(enrollments, totals, completed):
+        totals, completed = dict(totals), dict(completed)
+        progress = {e.id: 0 for e in enrollments}
+        for e in enrollments:
+            total = totals.get(e.course_id, 0)
+            if total and e.status != 'deleted':
+                progress[e.id] = int((completed.get(e.id, 0) / total) * 100)
+        return progress
+    
+    @staticmethod
+    def bulk_progress(enrollments):
+        """Progress percentage for many enrollments with two grouped queries"""
+        live = [e for e in enrollments if e.status != 'deleted']
+        if not live:
+            return {e.id: 0 for e in enrollments}
+        totals, completed = Enrollment.progress_statements(live)
+        return Enrollment.merge_progress(enrollments, db.session.execute(totals).all(), db.session.execute(completed).all())
+    
+    @staticmethod
+    def bulk_to_dict(enrollments, include_course=False):
+        """Serialize many enrollments; query count depends on entity types, not rows"""
+        progress = Enrollment.bulk_progress(enrollments)
+        
+        courses = {}
+        if include_course and enrollments:
+            course_list = Course.query.filter(Course.id.in_({e.course_id for e in enrollments})).all()
+            courses = {
+                course.id: data
+                for course, data in zip(course_list, Course.bulk_to_dict(course_list, include_instructor=True))
+            }
+        
+        results = []
+        for enrollment in enrollments:
+            data = enrollment.to_dict(progress=progress[enrollment.id])
+            if enrollment.course_id in courses:
+                data['course'] = courses[enrollment.course_id]
+            results.append(data)
+        return results
+    
+    def to_dict(self, include_course=False, include_next_lecture=False, progress=None):
         data = {
             'id': self.id,
             'user_id': self.user_id,
             'course_id': self.course_id,
-            'progress': self.progress,  # Dynamically calculated
+            'progress': self.progress if progress is None else progress,  # Dynamically calculated
             'status': self.status,
             'enrolled_at': self.enrolled_at.isoformat() if self.enrolled_at else None,
             'completed_at': self.completed_at.isoformat() if self.completed_at else None
@@ -193,7 +347,7 @@ class Enrollment(db.Model):
             from models import Progress
             next_lecture = Progress.get_next_lecture(self.id)
             if next_lecture:
-                data['next_lecture'] = next_lecture.to_dict()
+                data['next_lecture'] = next_lecture.to_dict(include_content=False)
             else:
                 data['next_lecture'] = None
         
@@ -211,7 +365,9 @@ class Review(db.Model):
     created_at = db.Column(db.DateTime, default=datetime.utcnow)
     updated_at = db.Column(db.DateTime, default=datetime.utcnow, onupdate=datetime.utcnow)
     
-    def to_dict(self, include_user=False):
+    __table_args__ = (db.UniqueConstraint('user_id', 'course_id', name='unique_user_course_review'),)
+    
+    def to_dict(self, include_user=False, user_card=None):
         data = {
             'id': self.id,
             'course_id': self.course_id,
@@ -221,13 +377,18 @@ class Review(db.Model):
             'updated_at': self.updated_at.isoformat() if self.updated_at else None
         }
         
-        if include_user:
+        if include_user and user_card is not None:
+            data.update(user_card)
+        elif include_user:
             user = User.query.get(self.user_id)
             if user:
                 data['user_name'] = user.name
                 # Fetch user profile picture
                 profile = Profile.query.filter_by(user_id=user.id, status='active').first()
                 data['user_image'] = profile.profile_picture if profile else None
+                data['user_image_variants'] = ImageSource.variants_for(
+                    [data['user_image']], Profile.IMAGE_PRESETS
+                ).get(data['user_image']) if data['user_image'] else None
         
         return data
 
@@ -268,23 +429,30 @@ class LectureResource(db.Model):
     status = db.Column(db.Enum('active', 'deleted'), default='active', nullable=False)
     created_at = db.Column(db.DateTime, default=datetime.utcnow)
     
-    def to_dict(self):
-        return {
+    __table_args__ = (db.Index('ix_lecture_resources_lecture_order', 'lecture_id', 'status', 'order'),)
+    
+    def to_dict(self, include_content=True):
+        """Without include_content the (possibly deferred) content column is never touched"""
+        data = {
             'id': self.id,
             'lecture_id': self.lecture_id,
             'resource_type': self.resource_type,
             'title': self.title,
             'url': self.url,
-            'content': self.content,
             'duration': self.duration,
             'order': self.order,
             'created_at': self.created_at.isoformat() if self.created_at else None
         }
+        if include_content:
+            data['content'] = self.content
+        return data
 
 
 class Profile(db.Model):
     __tablename__ = 'profiles'
     
+    IMAGE_PRESETS = ('avatar',)  # derivatives generated for profile_picture
+    
     id = db.Column(db.Integer, primary_key=True)
     user_id = db.Column(db.Integer, db.ForeignKey('users.id'), nullable=False, unique=True)
     bio = db.Column(db.Text, nullable=True)
@@ -319,8 +487,15 @@ class Progress(db.Model):
     completed = db.Column(db.Boolean, default=False)
     completed_at = db.Column(db.DateTime, nullable=True)
     status = db.Column(db.Enum('active', 'deleted'), default='active', nullable=False)
+    updated_at = db.Column(db.DateTime, default=datetime.utcnow, onupdate=datetime.utcnow)
     
-    __table_args__ = (db.UniqueConstraint('enrollment_id', 'lecture_resource_id', name='unique_enrollment_lecture'),)
+    __table_args__ = (
+        db.UniqueConstraint('enrollment_id', 'lecture_resource_id', name='unique_enrollment_lecture'),
+        db.Index('ix_progress_enrollment_updated', 'enrollment_id', 'updated_at'),
+        db.Index('ix_progress_enrollment_completed', 'enrollment_id', 'completed', 'status'),
+        # Completion stat refreshes look up the courses with progress written since their last run
+        db.Index('ix_progress_updated_at', 'updated_at'),
+    )
 
     def to_dict(self):
         return {
@@ -329,7 +504,8 @@ class Progress(db.Model):
             'lecture_resource_id': self.lecture_resource_id,
             'completed': self.completed,
             'completed_at': self.completed_at.isoformat() if self.completed_at else None,
-            'status': self.status
+            'status': self.status,
+            'updated_at': self.updated_at.isoformat() if self.updated_at else None
         }
 
     @staticmethod
@@ -362,19 +538,412 @@ class Progress(db.Model):
     
     @staticmethod
     def get_next_lecture(enrollment_id):
-        """Get the next incomplete lecture resource for an enrollment"""
-        enrollment = Enrollment.query.get(enrollment_id)
-        if not enrollment:
-            return None
-        
-        # Find first incomplete lecture
-        incomplete_progress = Progress.query.filter_by(
-            enrollment_id=enrollment_id,
-            completed=False,
-            status='active'
+        """Get the next incomplete lecture resource for an enrollment, by module number and resource order.
+
+        Lectures without a progress row yet (materialized in the background) count as incomplete.
+        """
+        return db.session.query(LectureResource).options(defer(LectureResource.content)).join(
+            CourseModule, LectureResource.lecture_id == CourseModule.id
+        ).join(
+            Enrollment, Enrollment.course_id == CourseModule.course_id
+        ).outerjoin(
+            Progress,
+            (Progress.lecture_resource_id == LectureResource.id)
+            & (Progress.enrollment_id == Enrollment.id)
+            & (Progress.status == 'active')
+        ).filter(
+            Enrollment.id == enrollment_id,
+            or_(Progress.id.is_(None), Progress.completed == False),
+            LectureResource.status == 'active',
+            CourseModule.status == 'active'
+        ).order_by(
+            CourseModule.number, LectureResource.order, LectureResource.id
         ).first()
+    
+    @staticmethod
+    def get_next_lectures_for_user(user_id):
+        """Next incomplete lecture for every active enrollment of a user in one query.
+
+        Returns (enrollment, course title, next resource or None, module number, module title) rows.
+        """
+        ranked = db.session.query(
+            Enrollment.id.label('enrollment_id'),
+            LectureResource.id.label('lecture_resource_id'),
+            CourseModule.number.label('module_number'),
+            CourseModule.title.label('module_title'),
+            func.row_number().over(
+                partition_by=Enrollment.id,
+                order_by=(CourseModule.number, LectureResource.order, LectureResource.id)
+            ).label('position')
+        ).join(
+            CourseModule, CourseModule.course_id == Enrollment.course_id
+        ).join(
+            LectureResource, LectureResource.lecture_id == CourseModule.id
+        ).outerjoin(
+            Progress,
+            (Progress.lecture_resource_id == LectureResource.id)
+            & (Progress.enrollment_id == Enrollment.id)
+            & (Progress.status == 'active')
+        ).filter(
+            Enrollment.user_id == user_id,
+            Enrollment.status == 'active',
+            or_(Progress.id.is_(None), Progress.completed == False),
+            LectureResource.status == 'active',
+            CourseModule.status == 'active'
+        ).subquery()
         
-        if incomplete_progress:
-            return LectureResource.query.get(incomplete_progress.lecture_resource_id)
-        
-        return None
+        return db.session.query(
+            Enrollment,
+            Course.title,
+            LectureResource,
+            ranked.c.module_number,
+            ranked.c.module_title
+        ).options(defer(LectureResource.content)).join(
+            Course, Enrollment.course_id == Course.id
+        ).outerjoin(
+            ranked, (ranked.c.enrollment_id == Enrollment.id) & (ranked.c.position == 1)
+        ).outerjoin(
+            LectureResource, LectureResource.id == ranked.c.lecture_resource_id
+        ).filter(
+            Enrollment.user_id == user_id,
+            Enrollment.status == 'active',
+            Course.status == 'active'
+        ).order_by(Enrollment.enrolled_at.desc()).all()
+
+
+class CatalogChange(db.Model):
+    __tablename__ = 'catalog_changes'
+    
+    # The autoincrement id doubles as the change-feed cursor
+    id = db.Column(db.BigInteger().with_variant(db.Integer, 'sqlite'), primary_key=True)
+    entity_type = db.Column(db.Enum('course', 'module', 'lecture_resource'), nullable=False)
+    entity_id = db.Column(db.Integer, nullable=False)
+    course_id = db.Column(db.Integer, nullable=True, index=True)
+    action = db.Column(db.Enum('create', 'update', 'publish', 'unpublish', 'delete'), nullable=False)
+    created_at = db.Column(db.DateTime, default=datetime.utcnow, nullable=False)
+    
+    def to_dict(self):
+        return {
+            'cursor': str(self.id),
+            'entity_type': self.entity_type,
+            'entity_id': self.entity_id,
+            'course_id': self.course_id,
+            'action': self.action,
+            'created_at': self.created_at.isoformat() if self.created_at else None
+        }
+
+
+class BackgroundJob(db.Model):
+    __tablename__ = 'background_jobs'
+    
+    id = db.Column(db.BigInteger().with_variant(db.Integer, 'sqlite'), primary_key=True)
+    job_type = db.Column(db.String(50), nullable=False)
+    payload = db.Column(db.Text, nullable=False)  # JSON
+    status = db.Column(db.Enum('pending', 'running', 'failed'), default='pending', nullable=False)
+    attempts = db.Column(db.Integer, default=0, nullable=False)
+    last_error = db.Column(db.Text, nullable=True)
+    run_after = db.Column(db.DateTime, default=datetime.utcnow, nullable=False)
+    locked_at = db.Column(db.DateTime, nullable=True)
+    created_at = db.Column(db.DateTime, default=datetime.utcnow, nullable=False)
+    
+    __table_args__ = (
+        db.Index('ix_background_jobs_status_run_after', 'status', 'run_after'),
+    )
+    
+    def to_dict(self):
+        return {
+            'id': self.id,
+            'job_type': self.job_type,
+            'payload': json.loads(self.payload) if self.payload else None,
+            'status': self.status,
+            'attempts': self.attempts,
+            'last_error': self.last_error,
+            'run_after': self.run_after.isoformat() if self.run_after else None,
+            'created_at': self.created_at.isoformat() if self.created_at else None
+        }
+
+
+class MediaFile(db.Model):
+    __tablename__ = 'media_files'
+    
+    # Content-addressed: one row per distinct SHA-256, shared by every upload of the same bytes
+    sha256 = db.Column(db.String(64), primary_key=True)
+    size = db.Column(db.BigInteger, nullable=False)
+    mimetype = db.Column(db.String(100), nullable=False)
+    created_at = db.Column(db.DateTime, default=datetime.utcnow, nullable=False)
+    
+    @property
+    def url(self):
+        return f'/api/media/{self.sha256}'
+    
+    def to_dict(self):
+        return {
+            'sha256': self.sha256,
+            'size': self.size,
+            'mimetype': self.mimetype,
+            'url': self.url,
+            'created_at': self.created_at.isoformat() if self.created_at else None
+        }
+
+
+class MediaUpload(db.Model):
+    __tablename__ = 'media_uploads'
+    
+    id = db.Column(db.String(32), primary_key=True)
+    user_id = db.Column(db.Integer, db.ForeignKey('users.id'), nullable=False)
+    lecture_resource_id = db.Column(db.Integer, db.ForeignKey('lecture_resources.id'), nullable=True)
+    filename = db.Column(db.String(255), nullable=False)
+    mimetype = db.Column(db.String(100), nullable=False)
+    size = db.Column(db.BigInteger, nullable=False)
+    received = db.Column(db.BigInteger, default=0, nullable=False)
+    # 'writing' while one request appends a chunk; updated_at is then the claim's token
+    status = db.Column(db.Enum('uploading', 'writing', 'complete'), default='uploading', nullable=False)
+    sha256 = db.Column(db.String(64), db.ForeignKey('media_files.sha256'), nullable=True)
+    created_at = db.Column(db.DateTime, default=datetime.utcnow, nullable=False)
+    updated_at = db.Column(db.DateTime, default=datetime.utcnow, onupdate=datetime.utcnow)
+    
+    def to_dict(self):
+        return {
+            'id': self.id,
+            'lecture_resource_id': self.lecture_resource_id,
+            'filename': self.filename,
+            'mimetype': self.mimetype,
+            'size': self.size,
+            'offset': self.received,
+            'status': self.status,
+            'sha256': self.sha256,
+            'url': f'/api/media/{self.sha256}' if self.sha256 else None,
+            'created_at': self.created_at.isoformat() if self.created_at else None
+        }
+
+
+class ImageSource(db.Model):
+    __tablename__ = 'image_sources'
+    
+    IMAGE_URL_PREFIX = '/api/media/images/'
+    
+    url_hash = db.Column(db.String(40), primary_key=True)  # sha1 of url
+    url = db.Column(db.String(500), nullable=False)
+    source_sha256 = db.Column(db.String(64), nullable=True)
+    variants = db.Column(db.Text, nullable=True)  # JSON {preset: [widths]}
+    status = db.Column(db.Enum('pending', 'ready', 'failed'), default='pending', nullable=False)
+    error = db.Column(db.Text, nullable=True)
+    updated_at = db.Column(db.DateTime, default=datetime.utcnow, onupdate=datetime.utcnow)
+    
+    @staticmethod
+    def hash_url(url):
+        return hashlib.sha1(url.encode('utf-8')).hexdigest()
+    
+    @staticmethod
+    def derivative_name(source_sha256, preset, width, extension):
+        return f'{source_sha256}_{preset}_{width}.{extension}'
+    
+    def to_variants(self, presets=None):
+        """{preset: {src, srcset, type}} with a WebP srcset and a JPEG fallback, or None if not ready"""
+        if self.status != 'ready' or not self.variants:
+            return None
+        variants = {}
+        for preset, widths in json.loads(self.variants).items():
+            if presets and preset not in presets:
+                continue
+            widths = sorted(widths)
+            variants[preset] = {
+                'src': self.IMAGE_URL_PREFIX + ImageSource.derivative_name(self.source_sha256, preset, widths[-1], 'jpg'),
+                'srcset': ', '.join(
+                    f'{self.IMAGE_URL_PREFIX}{ImageSource.derivative_name(self.source_sha256, preset, width, "webp")} {width}w'
+                    for width in widths
+                ),
+                'type': 'image/webp'
+            }
+        return variants or None
+    
+    @staticmethod
+    def variants_statement(urls):
+        """Select ready sources for the given URLs; returns ({url_hash: url}, statement)"""
+        hashes = {ImageSource.hash_url(url): url for url in set(urls) if url}
+        return hashes, select(ImageSource).where(
+            ImageSource.url_hash.in_(list(hashes.keys())),
+            ImageSource.status == 'ready'
+        )
+    
+    @staticmethod
+    def variants_from_sources(hashes, sources, presets=None):
+        return {hashes[source.url_hash]: source.to_variants(presets) for source in sources}
+    
+    @staticmethod
+    def variants_for(urls, presets=None):
+        """{url: variants} for the given image URLs that have ready derivatives, in one query"""
+        hashes, statement = ImageSource.variants_statement(urls)
+        if not hashes:
+            return {}
+        return ImageSource.variants_from_sources(hashes, db.session.scalars(statement).all(), presets)
+
+
+class CourseRanking(db.Model):
+    __tablename__ = 'course_rankings'
+    
+    # Leaderboard counters kept up to date by services.rankings; one row per course
+    course_id = db.Column(db.Integer, db.ForeignKey('courses.id'), primary_key=True)
+    category = db.Column(db.String(50), nullable=False)
+    active = db.Column(db.Boolean, default=False, nullable=False)
+    # Sum of 2 ** (age of event in half-lives since the ranking epoch); see services.rankings
+    trending_score = db.Column(db.Double, default=0, nullable=False)
+    enrollment_count = db.Column(db.Integer, default=0, nullable=False)
+    rating_sum = db.Column(db.Integer, default=0, nullable=False)
+    rating_count = db.Column(db.Integer, default=0, nullable=False)
+    rating_score = db.Column(db.Double, default=0, nullable=False)  # Bayesian average
+    # Last enroll/unenroll, so recommendation refreshes know which courses changed
+    enrollments_changed_at = db.Column(db.DateTime, nullable=True, index=True)
+    updated_at = db.Column(db.DateTime, default=datetime.utcnow, onupdate=datetime.utcnow)
+    
+    RANKINGS = {
+        'trending': 'trending_score',
+        'popular': 'enrollment_count',
+        'top_rated': 'rating_score'
+    }
+    
+    # Every leaderboard is a top-K range scan, overall or within a category
+    __table_args__ = (
+        db.Index('ix_course_rankings_trending', 'active', 'trending_score'),
+        db.Index('ix_course_rankings_category_trending', 'active', 'category', 'trending_score'),
+        db.Index('ix_course_rankings_popular', 'active', 'enrollment_count'),
+        db.Index('ix_course_rankings_category_popular', 'active', 'category', 'enrollment_count'),
+        db.Index('ix_course_rankings_top_rated', 'active', 'rating_score'),
+        db.Index('ix_course_rankings_category_top_rated', 'active', 'category', 'rating_score'),
+    )
+
+
+class CourseRecommendation(db.Model):
+    __tablename__ = 'course_recommendations'
+    
+    # Top-N co-enrollment neighbours per course, written by the compute_course_recommendations job
+    course_id = db.Column(db.Integer, db.ForeignKey('courses.id'), primary_key=True)
+    recommended_course_id = db.Column(db.Integer, db.ForeignKey('courses.id'), primary_key=True)
+    score = db.Column(db.Double, nullable=False)  # cosine similarity of the two courses' learner sets
+    co_enrollments = db.Column(db.Integer, nullable=False)
+    computed_at = db.Column(db.DateTime, default=datetime.utcnow, nullable=False)
+    
+    __table_args__ = (
+        db.Index('ix_course_recommendations_course_score', 'course_id', 'score'),
+    )
+
+
+class RecommendationRun(db.Model):
+    __tablename__ = 'recommendation_runs'
+    
+    id = db.Column(db.Integer, primary_key=True)
+    mode = db.Column(db.Enum('full', 'incremental'), nullable=False)
+    started_at = db.Column(db.DateTime, nullable=False)
+    finished_at = db.Column(db.DateTime, nullable=True)
+    courses_refreshed = db.Column(db.Integer, default=0, nullable=False)
+    
+    def to_dict(self):
+        return {
+            'id': self.id,
+            'mode': self.mode,
+            'started_at': self.started_at.isoformat() if self.started_at else None,
+            'finished_at': self.finished_at.isoformat() if self.finished_at else None,
+            'courses_refreshed': self.courses_refreshed
+        }
+
+
+class CourseCompletionStats(db.Model):
+    __tablename__ = 'course_completion_stats'
+    
+    # Completion funnel rollups written by services.completion_stats; one row per course
+    course_id = db.Column(db.Integer, db.ForeignKey('courses.id'), primary_key=True)
+    learners = db.Column(db.Integer, default=0, nullable=False)  # active and completed enrollments
+    completed_count = db.Column(db.Integer, default=0, nullable=False)
+    computed_at = db.Column(db.DateTime, nullable=False, index=True)
+
+
+class ModuleCompletionStats(db.Model):
+    __tablename__ = 'module_completion_stats'
+    
+    module_id = db.Column(db.Integer, db.ForeignKey('course_modules.id'), primary_key=True)
+    course_id = db.Column(db.Integer, db.ForeignKey('courses.id'), nullable=False, index=True)
+    started_count = db.Column(db.Integer, default=0, nullable=False)  # learners with any resource done
+    completed_count = db.Column(db.Integer, default=0, nullable=False)  # learners with every resource done
+    # From enrollment to the last resource of the module, over learners who completed it
+    median_seconds = db.Column(db.Integer, nullable=True)
+    computed_at = db.Column(db.DateTime, nullable=False)
+
+
+class LectureCompletionStats(db.Model):
+    __tablename__ = 'lecture_completion_stats'
+    
+    lecture_resource_id = db.Column(db.Integer, db.ForeignKey('lecture_resources.id'), primary_key=True)
+    course_id = db.Column(db.Integer, db.ForeignKey('courses.id'), nullable=False, index=True)
+    module_id = db.Column(db.Integer, db.ForeignKey('course_modules.id'), nullable=False)
+    completed_count = db.Column(db.Integer, default=0, nullable=False)
+    median_seconds = db.Column(db.Integer, nullable=True)  # from enrollment to completion
+    computed_at = db.Column(db.DateTime, nullable=False)
+
+
+class ActivityEvent(db.Model):
+    __tablename__ = 'activity_events'
+    
+    # Append-only learner activity log, written by services.activity. Rows are kept
+    # narrow and carry no foreign keys or secondary indexes so inserts stay cheap;
+    # the autoincrement id is the rollup cursor and nothing else reads the table.
+    id = db.Column(db.BigInteger().with_variant(db.Integer, 'sqlite'), primary_key=True)
+    occurred_at = db.Column(db.DateTime, nullable=False)
+    user_id = db.Column(db.Integer, nullable=False)
+    course_id = db.Column(db.Integer, nullable=False)
+    event_type = db.Column(db.SmallInteger, nullable=False)  # services.activity.EVENT_TYPES
+    object_id = db.Column(db.Integer, nullable=True)  # lecture resource of progress events
+
+
+class UserActivityDay(db.Model):
+    __tablename__ = 'user_activity_days'
+    
+    # Activity per learner, course and UTC day, rolled up from activity_events
+    user_id = db.Column(db.Integer, db.ForeignKey('users.id'), primary_key=True)
+    day = db.Column(db.Date, primary_key=True)
+    course_id = db.Column(db.Integer, db.ForeignKey('courses.id'), primary_key=True)
+    events = db.Column(db.Integer, default=0, nullable=False)
+    lectures_completed = db.Column(db.Integer, default=0, nullable=False)
+    enrollments = db.Column(db.Integer, default=0, nullable=False)
+    reviews = db.Column(db.Integer, default=0, nullable=False)  # reviews and ratings
+    
+    # Active learners of a course per day are counted from here
+    __table_args__ = (
+        db.Index('ix_user_activity_days_course_day', 'course_id', 'day'),
+    )
+
+
+class CourseActivityDay(db.Model):
+    __tablename__ = 'course_activity_days'
+    
+    course_id = db.Column(db.Integer, db.ForeignKey('courses.id'), primary_key=True)
+    day = db.Column(db.Date, primary_key=True)
+    active_learners = db.Column(db.Integer, default=0, nullable=False)
+    events = db.Column(db.Integer, default=0, nullable=False)
+    lectures_completed = db.Column(db.Integer, default=0, nullable=False)
+    enrollments = db.Column(db.Integer, default=0, nullable=False)
+    reviews = db.Column(db.Integer, default=0, nullable=False)
+
+
+class ActivityRollupRun(db.Model):
+    __tablename__ = 'activity_rollup_runs'
+    
+    id = db.Column(db.Integer, primary_key=True)
+    # Two runs continuing from the same run cannot both insert their row, so events are never
+    # counted twice. The first run continues from 0: unique keys allow any number of NULLs.
+    previous_run_id = db.Column(db.Integer, default=0, nullable=False, unique=True)
+    started_at = db.Column(db.DateTime, nullable=False)
+    finished_at = db.Column(db.DateTime, nullable=True)
+    last_event_id = db.Column(db.BigInteger, default=0, nullable=False)  # events up to here are rolled up
+    observed_event_id = db.Column(db.BigInteger, default=0, nullable=False)  # newest event id at start
+    events = db.Column(db.Integer, default=0, nullable=False)
+    
+    def to_dict(self):
+        return {
+            'id': self.id,
+            'previous_run_id': self.previous_run_id,
+            'started_at': self.started_at.isoformat() if self.started_at else None,
+            'finished_at': self.finished_at.isoformat() if self.finished_at else None,
+            'last_event_id': self.last_event_id,
+            'observed_event_id': self.observed_event_id,
+            'events': self.events
+        }
@@ -12,6 +12,9 @@ from routes.reviews import reviews_bp
 from routes.ratings import ratings_bp
 from routes.progress import progress_bp
 from routes.dashboard import dashboard_bp
+from routes.admin import admin_bp
+from routes.changes import changes_bp
+from routes.media import media_bp
 
 api_bp.register_blueprint(users_bp)
 api_bp.register_blueprint(profiles_bp)
@@ -23,3 +26,6 @@ api_bp.register_blueprint(reviews_bp)
 api_bp.register_blueprint(ratings_bp)
 api_bp.register_blueprint(progress_bp)
 api_bp.register_blueprint(dashboard_bp)
+api_bp.register_blueprint(admin_bp)
+api_bp.register_blueprint(changes_bp)
+api_bp.register_blueprint(media_bp)
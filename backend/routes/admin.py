@@ -1,36 +1,27 @@
-from flask import Blueprint, jsonify, request
-from models import User
+from flask import Blueprint, jsonify, request, current_app
+from models import User, Course, Enrollment, ImageSource
 from database import db
+from middleware.auth import require_role
+from middleware.query_log import query_stats
+from services.jobs import enqueue, job_runner
+from services.rankings import record_enrollments
+from services.activity import record_activity
+from services.read_cache import invalidate_reads
+from sqlalchemy import insert
+from datetime import datetime
+import csv
+import io
 
 admin_bp = Blueprint('admin', __name__, url_prefix='/admin')
 
-# Middleware to check if user is admin
-def require_admin(user_id):
-    user = User.query.get(user_id)
-    if not user:
-        return {'error': 'User not found', 'status': 404}
-    if user.role != 'admin':
-        return {'error': 'Admin access required', 'status': 403}
-    return None
-
 # =====================================================
 # USER MANAGEMENT
 # =====================================================
 
 # Get All Users (Admin Only)
 @admin_bp.route('/users', methods=['GET'])
+@require_role('admin')
 def get_all_users():
-    admin_id = request.headers.get('X-User-Id')
-    if not admin_id:
-        return jsonify({
-            'success': False,
-            'error': 'Admin authentication required'
-        }), 401
-    
-    auth_check = require_admin(int(admin_id))
-    if auth_check:
-        return jsonify({'success': False, 'error': auth_check['error']}), auth_check['status']
-    
     status_filter = request.args.get('status', 'active')
     
     if status_filter == 'all':
@@ -45,4 +36,270 @@ def get_all_users():
 
 
 # User deletion is now handled by /users/<user_id> DELETE endpoint
-# which supports both self-deletion and admin deletion
\ No newline at end of file
+# which supports both self-deletion and admin deletion
+
+
+# =====================================================
+# ENROLLMENT MANAGEMENT
+# =====================================================
+
+MAX_BULK_ENROLLMENTS = 10000
+
+
+def read_bulk_user_ids():
+    """Read user IDs from a JSON body or a streamed CSV with a user_id column (or one ID per line)"""
+    if request.mimetype == 'text/csv':
+        reader = csv.reader(io.TextIOWrapper(request.stream, encoding='utf-8'))
+        column = 0
+        user_ids = []
+        for line_number, row in enumerate(reader):
+            if not row:
+                continue
+            if line_number == 0 and 'user_id' in [cell.strip() for cell in row]:
+                column = [cell.strip() for cell in row].index('user_id')
+                continue
+            user_ids.append(row[column].strip() if column < len(row) else '')
+            if len(user_ids) > MAX_BULK_ENROLLMENTS:
+                break
+        return user_ids
+    
+    data = request.get_json(silent=True) or {}
+    user_ids = data.get('user_ids')
+    return user_ids if isinstance(user_ids, list) else None
+
+
+# Bulk Enroll Users Into a Course (Admin Only)
+@admin_bp.route('/courses/<int:course_id>/enrollments', methods=['POST'])
+@require_role('admin')
+def bulk_enroll(course_id):
+    from routes.progress import materialize_progress
+    
+    course = Course.query.get(course_id)
+    if not course:
+        return jsonify({'success': False, 'error': 'Course not found'}), 404
+    
+    if course.status != 'active':
+        return jsonify({'success': False, 'error': 'Course is not available for enrollment'}), 400
+    
+    raw_ids = read_bulk_user_ids()
+    if not raw_ids:
+        return jsonify({
+            'success': False,
+            'error': 'user_ids (JSON list) or a CSV body with user IDs is required'
+        }), 400
+    
+    if len(raw_ids) > MAX_BULK_ENROLLMENTS:
+        return jsonify({
+            'success': False,
+            'error': f'At most {MAX_BULK_ENROLLMENTS} users can be enrolled per request'
+        }), 400
+    
+    # Outcomes keyed by user ID in input order; repeated IDs are reported once
+    results = {}
+    for raw_id in raw_ids:
+        try:
+            results.setdefault(int(raw_id), None)
+        except (TypeError, ValueError):
+            results.setdefault(str(raw_id), 'invalid_user_id')
+    user_ids = [user_id for user_id, outcome in results.items() if outcome is None]
+    
+    chunk_size = current_app.config.get('BULK_CHUNK_SIZE', 500)
+    
+    try:
+        users = {}
+        existing = {}
+        for start in range(0, len(user_ids), chunk_size):
+            chunk = user_ids[start:start + chunk_size]
+            users.update({
+                row.id: row for row in db.session.query(User.id, User.role, User.status).filter(User.id.in_(chunk))
+            })
+            existing.update({
+                row.user_id: row for row in db.session.query(Enrollment.id, Enrollment.user_id, Enrollment.status).filter(
+                    Enrollment.course_id == course_id,
+                    Enrollment.user_id.in_(chunk)
+                )
+            })
+        
+        now = datetime.utcnow()
+        new_user_ids = []
+        reenroll_ids = []
+        for user_id in user_ids:
+            user = users.get(user_id)
+            enrollment = existing.get(user_id)
+            if not user or user.status != 'active':
+                results[user_id] = 'user_not_found'
+            elif user.role == 'instructor':
+                results[user_id] = 'instructors_cannot_enroll'
+            elif enrollment and enrollment.status in ['active', 'completed']:
+                results[user_id] = 'already_enrolled'
+            elif enrollment:
+                results[user_id] = 're_enrolled'
+                reenroll_ids.append(enrollment.id)
+            else:
+                results[user_id] = 'enrolled'
+                new_user_ids.append(user_id)
+        
+        for start in range(0, len(reenroll_ids), chunk_size):
+            Enrollment.query.filter(Enrollment.id.in_(reenroll_ids[start:start + chunk_size])).update({
+                'status': 'active',
+                'enrolled_at': now,
+                'completed_at': None
+            }, synchronize_session=False)
+        
+        new_enrollment_ids = []
+        for start in range(0, len(new_user_ids), chunk_size):
+            chunk = new_user_ids[start:start + chunk_size]
+            db.session.execute(insert(Enrollment), [
+                {'user_id': user_id, 'course_id': course_id, 'status': 'active', 'enrolled_at': now}
+                for user_id in chunk
+            ])
+            new_enrollment_ids.extend(row.id for row in db.session.query(Enrollment.id).filter(
+                Enrollment.course_id == course_id,
+                Enrollment.user_id.in_(chunk)
+            ))
+        
+        progress_rows = materialize_progress(course_id, new_enrollment_ids + reenroll_ids)
+        record_enrollments(course_id, len(new_enrollment_ids) + len(reenroll_ids), at=now)
+        invalidate_reads(db.session, [course_id])
+        for user_id in new_user_ids + [user_id for user_id, outcome in results.items() if outcome == 're_enrolled']:
+            record_activity(user_id, course_id, 'enrolled', at=now)
+        db.session.commit()
+    except Exception as e:
+        db.session.rollback()
+        print(f"Error bulk enrolling: {str(e)}")
+        return jsonify({'success': False, 'error': f'Failed to enroll users: {str(e)}'}), 500
+    
+    summary = {}
+    for outcome in results.values():
+        summary[outcome] = summary.get(outcome, 0) + 1
+    
+    return jsonify({
+        'success': True,
+        'message': f'{len(new_user_ids) + len(reenroll_ids)} users enrolled',
+        'course_id': course_id,
+        'summary': summary,
+        'progress_rows_created': progress_rows,
+        'results': [{'user_id': user_id, 'status': results[user_id]} for user_id in results]
+    }), 200
+
+
+# =====================================================
+# DATABASE DIAGNOSTICS
+# =====================================================
+
+# Get Slow Query Offenders (Admin Only)
+@admin_bp.route('/slow-queries', methods=['GET'])
+@require_role('admin')
+def get_slow_queries():
+    limit = request.args.get('limit', 20, type=int)
+    sort = request.args.get('sort', 'total_ms')
+    if sort not in ['total_ms', 'max_ms', 'avg_ms', 'count', 'slow_count']:
+        return jsonify({'success': False, 'error': 'Invalid sort field'}), 400
+    slow_only = request.args.get('all', 'false').lower() != 'true'
+    
+    return jsonify({
+        'success': True,
+        'threshold_ms': current_app.config.get('SLOW_QUERY_THRESHOLD_MS'),
+        'total_db_ms': query_stats.total_ms(),
+        'queries': query_stats.top(limit=limit, sort=sort, slow_only=slow_only)
+    }), 200
+
+
+# Reset Query Statistics (Admin Only)
+@admin_bp.route('/slow-queries', methods=['DELETE'])
+@require_role('admin')
+def reset_slow_queries():
+    query_stats.reset()
+    return jsonify({'success': True, 'message': 'Query statistics reset'}), 200
+
+
+# Queue Image Derivatives For Existing Images (Admin Only)
+@admin_bp.route('/images/backfill', methods=['POST'])
+@require_role('admin')
+def backfill_image_derivatives():
+    from services.images import SOURCE_PRESETS, request_derivatives, Image
+    
+    if Image is None or not current_app.config.get('IMAGE_DERIVATIVES'):
+        return jsonify({'success': False, 'error': 'Image derivatives are disabled'}), 400
+    
+    ready = {row.url_hash for row in db.session.query(ImageSource.url_hash).filter(
+        ImageSource.status.in_(['pending', 'ready'])
+    )}
+    
+    queued = 0
+    for model, (attribute, presets) in SOURCE_PRESETS.items():
+        column = getattr(model, attribute)
+        for (url,) in db.session.query(column).filter(column.isnot(None), column != '').distinct():
+            if len(url) <= 500 and ImageSource.hash_url(url) not in ready:
+                request_derivatives(db.session, url, presets)
+                queued += 1
+    db.session.commit()
+    
+    return jsonify({'success': True, 'message': f'{queued} images queued', 'queued': queued}), 200
+
+
+# Recompute Course Leaderboards From Enrollments And Ratings (Admin Only)
+@admin_bp.route('/rankings/rebuild', methods=['POST'])
+@require_role('admin')
+def rebuild_rankings():
+    enqueue('rebuild_course_rankings', {})
+    db.session.commit()
+    job_runner.wake()
+    
+    return jsonify({'success': True, 'message': 'Ranking rebuild queued'}), 202
+
+
+# Recompute Completion Funnel Rollups (Admin Only)
+@admin_bp.route('/completion-stats/refresh', methods=['POST'])
+@require_role('admin')
+def refresh_completion_stats():
+    from services.completion_stats import schedule_refresh
+    
+    full = request.args.get('full', 'false').lower() == 'true'
+    queued = schedule_refresh(full=full)
+    db.session.commit()
+    job_runner.wake()
+    
+    if not queued:
+        return jsonify({'success': True, 'message': 'A completion stats refresh is already queued'}), 200
+    return jsonify({
+        'success': True,
+        'message': f'{"Full" if full else "Incremental"} completion stats refresh queued'
+    }), 202
+
+
+# Roll Up New Activity Events (Admin Only)
+@admin_bp.route('/activity/rollup', methods=['POST'])
+@require_role('admin')
+def rollup_activity():
+    from services.activity import schedule_rollup
+    
+    queued = schedule_rollup()
+    db.session.commit()
+    job_runner.wake()
+    
+    if not queued:
+        return jsonify({'success': True, 'message': 'An activity rollup is already queued or running'}), 200
+    return jsonify({'success': True, 'message': 'Activity rollup queued'}), 202
+
+
+# Recompute Co-Enrollment Recommendations (Admin Only)
+@admin_bp.route('/recommendations/refresh', methods=['POST'])
+@require_role('admin')
+def refresh_recommendations():
+    from services.recommendations import np, schedule_refresh
+    
+    if np is None:
+        return jsonify({'success': False, 'error': 'Recommendations need numpy and scipy'}), 400
+    
+    full = request.args.get('full', 'false').lower() == 'true'
+    queued = schedule_refresh(full=full)
+    db.session.commit()
+    job_runner.wake()
+    
+    if not queued:
+        return jsonify({'success': True, 'message': 'A recommendation refresh is already queued'}), 200
+    return jsonify({
+        'success': True,
+        'message': f'{"Full" if full else "Incremental"} recommendation refresh queued'
+    }), 202
@@ -0,0 +1,265 @@
+import math
+from flask import abort, current_app, jsonify, request
+from sqlalchemy import func, select
+from models import User, Course, CourseModule, LectureResource, Enrollment, Review, Profile, ImageSource
+from database import async_db
+from services.read_cache import catalog_cache, course_stats_cache, instructor_card_cache
+from services.facets import course_ratings, facet_cache, facet_statement, facets_from_rows, normalize_query, text_filter
+
+
+async def course_dicts(courses, include_instructor=False, **to_dict_kwargs):
+    """Async Course.bulk_to_dict: uncached stats and instructor cards and the image variants fetched together"""
+    course_ids = list({course.id for course in courses})
+    if not course_ids:
+        return []
+
+    stats, missing_stats = course_stats_cache.get_many(course_ids)
+    cards, missing_cards = instructor_card_cache.get_many(
+        {course.instructor_id for course in courses}
+    ) if include_instructor else ({}, [])
+    statements = Course.stats_statements(missing_stats) if missing_stats else {}
+    hashes, images_statement = ImageSource.variants_statement([course.image for course in courses])
+    lookups = [async_db.all(statement) for statement in statements.values()]
+    lookups.append(async_db.scalars(images_statement) if hashes else _nothing())
+    lookups.append(async_db.all(Course.instructor_cards_statement(missing_cards)) if missing_cards else _nothing())
+
+    *stat_rows, sources, card_rows = await async_db.gather(*lookups)
+
+    if missing_stats:
+        loaded = Course.merge_stats(missing_stats, dict(zip(statements.keys(), stat_rows)))
+        course_stats_cache.set_many(loaded)
+        stats.update(loaded)
+    loaded = Course.cards_from_rows(card_rows)
+    instructor_card_cache.set_many(loaded)
+    cards.update(loaded)
+    images = ImageSource.variants_from_sources(hashes, sources, Course.IMAGE_PRESETS)
+    return [
+        course.to_dict(
+            include_instructor=include_instructor,
+            stats=stats[course.id],
+            instructor_card=cards.get(course.instructor_id, {}),
+            image_variants=images.get(course.image, {}),
+            **to_dict_kwargs
+        )
+        for course in courses
+    ]
+
+
+async def _nothing():
+    return []
+
+
+async def get_all_courses():
+    category = request.args.get('category')
+    level = request.args.get('level')
+    instructor_id = request.args.get('instructor_id')
+    status = request.args.get('status')
+
+    statement = select(Course).where(Course.status != 'deleted')
+    if category:
+        statement = statement.where(Course.category == category)
+    if level:
+        statement = statement.where(Course.level == level)
+    if instructor_id:
+        statement = statement.where(Course.instructor_id == instructor_id)
+    statement = statement.where(Course.status == (status or 'active'))
+
+    key = (category, level, instructor_id, status)
+    courses = catalog_cache.get(key)
+    if courses is None:
+        courses = await course_dicts(await async_db.scalars(statement), include_instructor=True)
+        catalog_cache.set(key, courses)
+
+    return jsonify({
+        'success': True,
+        'courses': courses
+    }), 200
+
+
+async def search_courses():
+    q = normalize_query(request.args.get('q', ''))
+    category = request.args.get('category', '')
+    level = request.args.get('level', '')
+    instructor_id = request.args.get('instructor_id', type=int)
+    min_rating = request.args.get('min_rating', type=float)
+    sort = request.args.get('sort', 'created_at')
+    page = request.args.get('page', 1, type=int)
+    per_page = request.args.get('per_page', 10, type=int)
+
+    if page < 1 or per_page < 1:
+        abort(404)
+
+    statement = select(Course).join(User, Course.instructor_id == User.id).where(Course.status == 'active')
+
+    if q:
+        statement = statement.where(text_filter(q))
+    if category:
+        statement = statement.where(Course.category == category)
+    if level:
+        statement = statement.where(Course.level == level)
+    if instructor_id:
+        statement = statement.where(Course.instructor_id == instructor_id)
+    if min_rating:
+        ratings = course_ratings()
+        statement = statement.join(ratings, ratings.c.course_id == Course.id).where(ratings.c.rating >= min_rating)
+
+    ordered = statement.order_by(Course.title if sort == 'title' else Course.created_at.desc())
+
+    # The page, the total count and the facet rows do not depend on each other
+    rows = facet_cache.get(q)
+    courses, total, fetched = await async_db.gather(
+        async_db.scalars(ordered.limit(per_page).offset((page - 1) * per_page)),
+        async_db.scalar(select(func.count()).select_from(statement.subquery())),
+        async_db.all(facet_statement(q)) if rows is None else _nothing()
+    )
+    if rows is None:
+        rows = [tuple(row) for row in fetched]
+        facet_cache.set(q, rows, current_app.config.get('FACET_CACHE_TTL', 60))
+
+    # Same out-of-range behaviour as Query.paginate
+    if not courses and page != 1:
+        abort(404)
+
+    return jsonify({
+        'success': True,
+        'courses': await course_dicts(courses, include_instructor=True),
+        'total': total,
+        'pages': math.ceil(total / per_page) if total else 0,
+        'current_page': page,
+        'facets': facets_from_rows(rows, category, level, instructor_id or None, min_rating or None)
+    }), 200
+
+
+async def get_course(course_id):
+    course = await async_db.scalar(select(Course).where(Course.id == course_id))
+
+    if not course:
+        return jsonify({
+            'success': False,
+            'error': 'Course not found'
+        }), 404
+
+    modules_statement = select(CourseModule).where(CourseModule.course_id == course_id).order_by(CourseModule.number)
+    counts_statement = select(LectureResource.lecture_id, func.count(LectureResource.id)).join(
+        CourseModule, LectureResource.lecture_id == CourseModule.id
+    ).where(
+        CourseModule.course_id == course_id,
+        LectureResource.status == 'active'
+    ).group_by(LectureResource.lecture_id)
+
+    (data,), modules, counts = await async_db.gather(
+        course_dicts([course], include_instructor=True),
+        async_db.scalars(modules_statement),
+        async_db.all(counts_statement)
+    )
+
+    counts = dict(counts)
+    data['courses'] = [module.to_dict(resource_count=counts.get(module.id, 0)) for module in modules]
+
+    return jsonify({
+        'success': True,
+        'course': data
+    }), 200
+
+
+async def get_course_reviews(course_id):
+    rows = await async_db.all(
+        select(Review, User.name, Profile.profile_picture).outerjoin(
+            User, Review.user_id == User.id
+        ).outerjoin(
+            Profile, (Profile.user_id == User.id) & (Profile.status == 'active')
+        ).where(
+            Review.course_id == course_id,
+            Review.status == 'active'
+        ).order_by(Review.id)
+    )
+
+    hashes, images_statement = ImageSource.variants_statement([picture for _, _, picture in rows])
+    images = ImageSource.variants_from_sources(
+        hashes, await async_db.scalars(images_statement), Profile.IMAGE_PRESETS
+    ) if hashes else {}
+
+    return jsonify({
+        'success': True,
+        'reviews': [
+            review.to_dict(include_user=True, user_card={
+                'user_name': name,
+                'user_image': picture,
+                'user_image_variants': images.get(picture) if picture else None
+            } if name is not None else {})
+            for review, name, picture in rows
+        ]
+    }), 200
+
+
+async def get_student_dashboard(user_id):
+    user, rows = await async_db.gather(
+        async_db.scalar(select(User).where(User.id == user_id)),
+        async_db.all(
+            select(Enrollment, Course).join(
+                Course, Enrollment.course_id == Course.id
+            ).where(
+                Enrollment.user_id == user_id,
+                Enrollment.status.in_(['active', 'completed']),
+                Course.status == 'active'
+            ).order_by(Enrollment.id)
+        )
+    )
+
+    if not user:
+        return jsonify({'success': False, 'error': 'User not found'}), 404
+
+    if user.role != 'learner':
+        return jsonify({'success': False, 'error': 'User is not a student'}), 403
+
+    enrollments = [enrollment for enrollment, _ in rows]
+    progress = {}
+    courses = {}
+    if enrollments:
+        totals, completed = Enrollment.progress_statements(enrollments)
+        course_list, totals, completed = await async_db.gather(
+            course_dicts([course for _, course in rows], include_stats=True),
+            async_db.all(totals),
+            async_db.all(completed)
+        )
+        progress = Enrollment.merge_progress(enrollments, totals, completed)
+        courses = {data['id']: data for data in course_list}
+
+    courses_data = [{
+        'enrollment_id': enrollment.id,
+        'course': courses[course.id],
+        'progress_percentage': progress[enrollment.id],
+        'status': enrollment.status,
+        'enrolled_at': enrollment.enrolled_at.isoformat() if enrollment.enrolled_at else None
+    } for enrollment, course in rows]
+
+    return jsonify({
+        'success': True,
+        'courses': courses_data,
+        'total': len(courses_data)
+    }), 200
+
+
+# Endpoint -> async view that replaces the sync one in async mode
+ASYNC_VIEWS = {
+    'api.courses.get_all_courses': get_all_courses,
+    'api.courses.search_courses': search_courses,
+    'api.courses.get_course': get_course,
+    'api.reviews.get_course_reviews': get_course_reviews,
+    'api.dashboard.get_student_dashboard': get_student_dashboard
+}
+
+
+def init_async_views(app):
+    """Serve the read-heavy endpoints with the async views above.
+
+    They return the same payloads as the sync views they replace, but run
+    independent queries concurrently on the shared loop of async_db. Needs an
+    async driver (aiomysql, or aiosqlite for SQLite); see requirements-async.txt.
+    """
+    if not app.config.get('ASYNC_VIEWS'):
+        return
+
+    async_db.init_app(app)
+    for endpoint, view in ASYNC_VIEWS.items():
+        app.view_functions[endpoint] = view
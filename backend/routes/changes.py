@@ -0,0 +1,42 @@
+from flask import Blueprint, jsonify, request, current_app
+from models import CatalogChange
+from datetime import datetime, timedelta
+
+changes_bp = Blueprint('changes', __name__, url_prefix='/changes')
+
+MAX_CHANGES_PER_PAGE = 5000
+
+
+@changes_bp.route('/', methods=['GET'])
+def get_changes():
+    """Catalog change feed: every change after the ?since= cursor, oldest first"""
+    try:
+        since = int(request.args.get('since', 0))
+    except ValueError:
+        return jsonify({'success': False, 'error': 'since must be a cursor returned by this endpoint'}), 400
+    
+    limit = min(request.args.get('limit', 500, type=int), MAX_CHANGES_PER_PAGE)
+    
+    query = CatalogChange.query.filter(CatalogChange.id > since)
+    
+    entity_type = request.args.get('entity_type')
+    if entity_type:
+        query = query.filter(CatalogChange.entity_type == entity_type)
+    
+    # Ids are allocated right before COMMIT (services.catalog_feed), so a commit that is still
+    # in flight can land a lower id after a higher one. Holding back the newest changes
+    # briefly keeps cursors from skipping them.
+    settle_seconds = current_app.config.get('CHANGE_FEED_SETTLE_SECONDS', 1)
+    if settle_seconds:
+        query = query.filter(CatalogChange.created_at <= datetime.utcnow() - timedelta(seconds=settle_seconds))
+    
+    changes = query.order_by(CatalogChange.id).limit(limit + 1).all()
+    has_more = len(changes) > limit
+    changes = changes[:limit]
+    
+    return jsonify({
+        'success': True,
+        'changes': [change.to_dict() for change in changes],
+        'next_cursor': str(changes[-1].id) if changes else str(since),
+        'has_more': has_more
+    }), 200
@@ -1,6 +1,14 @@
-from flask import Blueprint, jsonify, request
-from models import Course, User
+from flask import Blueprint, jsonify, request, current_app
+from models import Course, User, CourseModule, LectureResource, CourseRanking, CourseRecommendation
 from database import db
+from sqlalchemy import insert, func
+from services.catalog_feed import record_changes
+from services.suggest import suggest_index
+from services.rankings import decayed_score, schedule_rebuild_if_incomplete
+from services.recommendations import schedule_if_stale as schedule_recommendations_if_stale
+from services.jobs import job_runner
+from services.read_cache import catalog_cache
+from services.facets import course_ratings, facet_cache, facet_statement, facets_from_rows, normalize_query, text_filter
 import json
 from datetime import datetime
 
@@ -64,6 +72,245 @@ def create_course():
         }), 500
 
 
+def read_ndjson_outline(stream):
+    """Assemble an outline from NDJSON lines typed course, module or resource.
+
+    Resource lines name their module by "module" (the module number or ref).
+    """
+    outline = None
+    modules = {}
+    errors = []
+    for line_number, line in enumerate(stream, start=1):
+        line = line.strip()
+        if not line:
+            continue
+        try:
+            record = json.loads(line)
+        except ValueError:
+            errors.append({'path': f'line {line_number}', 'error': 'Invalid JSON'})
+            continue
+        if not isinstance(record, dict):
+            errors.append({'path': f'line {line_number}', 'error': 'Each line must be a JSON object'})
+            continue
+        
+        record_type = record.pop('type', None)
+        if record_type == 'course':
+            if outline is not None:
+                errors.append({'path': f'line {line_number}', 'error': 'Only one course line is allowed'})
+                continue
+            outline = dict(record, modules=[])
+        elif record_type == 'module':
+            if outline is None:
+                errors.append({'path': f'line {line_number}', 'error': 'The course line must come first'})
+                continue
+            module = dict(record, resources=[])
+            outline['modules'].append(module)
+            for key in (module.get('number'), module.get('ref')):
+                if key is not None:
+                    modules[str(key)] = module
+        elif record_type == 'resource':
+            module = modules.get(str(record.pop('module', None)))
+            if module is None:
+                errors.append({'path': f'line {line_number}', 'error': 'Resource refers to an unknown module'})
+                continue
+            module['resources'].append(record)
+        else:
+            errors.append({'path': f'line {line_number}', 'error': 'type must be course, module or resource'})
+    
+    if outline is None and not errors:
+        errors.append({'path': 'course', 'error': 'A course line is required'})
+    return outline, errors
+
+
+def validate_course_outline(outline):
+    """Check a whole course -> modules -> resources outline before anything is written"""
+    errors = []
+    
+    def error(path, message):
+        errors.append({'path': path, 'error': message})
+    
+    if not isinstance(outline, dict):
+        error('course', 'Outline must be a JSON object')
+        return errors
+    
+    for field in ['title', 'description', 'instructor_id', 'category']:
+        if not outline.get(field):
+            error(f'course.{field}', 'is required')
+    if outline.get('level', 'Beginner') not in Course.level.type.enums:
+        error('course.level', f'must be one of {", ".join(Course.level.type.enums)}')
+    if outline.get('status', 'unpublished') not in ['active', 'unpublished']:
+        error('course.status', 'must be active or unpublished')
+    
+    if outline.get('instructor_id'):
+        instructor = User.query.get(outline['instructor_id'])
+        if not instructor:
+            error('course.instructor_id', 'Instructor not found')
+        elif instructor.role != 'instructor':
+            error('course.instructor_id', 'User is not an instructor')
+    
+    modules = outline.get('modules', [])
+    if not isinstance(modules, list):
+        error('course.modules', 'must be a list')
+        return errors
+    
+    numbers = set()
+    refs = set()
+    for i, module in enumerate(modules):
+        path = f'modules[{i}]'
+        if not isinstance(module, dict):
+            error(path, 'must be an object')
+            continue
+        if not module.get('title'):
+            error(f'{path}.title', 'is required')
+        number = module.get('number')
+        if not isinstance(number, int):
+            error(f'{path}.number', 'must be an integer')
+        elif number in numbers:
+            error(f'{path}.number', 'is duplicated')
+        numbers.add(number)
+        
+        resources = module.get('resources', [])
+        if not isinstance(resources, list):
+            error(f'{path}.resources', 'must be a list')
+            continue
+        for j, resource in enumerate(resources):
+            resource_path = f'{path}.resources[{j}]'
+            if not isinstance(resource, dict):
+                error(resource_path, 'must be an object')
+                continue
+            if not resource.get('title'):
+                error(f'{resource_path}.title', 'is required')
+            if resource.get('resource_type') not in LectureResource.resource_type.type.enums:
+                error(f'{resource_path}.resource_type',
+                      f'must be one of {", ".join(LectureResource.resource_type.type.enums)}')
+            if not isinstance(resource.get('order', j), int):
+                error(f'{resource_path}.order', 'must be an integer')
+        
+        for item_path, item in [(path, module)] + [(f'{path}.resources[{j}]', r) for j, r in enumerate(resources)]:
+            ref = item.get('ref') if isinstance(item, dict) else None
+            if ref is not None:
+                if ref in refs:
+                    error(f'{item_path}.ref', 'is duplicated')
+                refs.add(ref)
+    
+    return errors
+
+
+@courses_bp.route('/import', methods=['POST'])
+def import_course():
+    """Create a course with all its modules and resources in one transaction"""
+    if request.mimetype in ['application/x-ndjson', 'application/jsonl']:
+        outline, errors = read_ndjson_outline(request.stream)
+    else:
+        outline, errors = request.get_json(silent=True), []
+    
+    if not errors:
+        errors = validate_course_outline(outline)
+    if errors:
+        return jsonify({
+            'success': False,
+            'error': 'Course outline is invalid',
+            'errors': errors
+        }), 400
+    
+    chunk_size = current_app.config.get('BULK_CHUNK_SIZE', 500)
+    modules = outline.get('modules', [])
+    
+    try:
+        new_course = Course(
+            title=outline['title'],
+            description=outline['description'],
+            about=outline.get('about'),
+            instructor_id=outline['instructor_id'],
+            company=outline.get('company'),
+            category=outline['category'],
+            level=outline.get('level', 'Beginner'),
+            duration=outline.get('duration'),
+            image=outline.get('image'),
+            status=outline.get('status', 'unpublished'),
+            created_at=datetime.utcnow()
+        )
+        db.session.add(new_course)
+        db.session.flush()
+        
+        # Rows left behind by hard-deleted modules can point at a reused module id
+        last_resource_id = db.session.query(func.max(LectureResource.id)).scalar() or 0
+        
+        if modules:
+            db.session.execute(insert(CourseModule), [{
+                'course_id': new_course.id,
+                'number': module['number'],
+                'title': module['title'],
+                'lessons': len(module.get('resources', [])),
+                'duration': module.get('duration'),
+                'status': 'active'
+            } for module in modules])
+        module_ids = dict(db.session.query(CourseModule.number, CourseModule.id).filter(
+            CourseModule.course_id == new_course.id
+        ).all())
+        
+        resource_rows = [{
+            'lecture_id': module_ids[module['number']],
+            'resource_type': resource['resource_type'],
+            'title': resource['title'],
+            'url': resource.get('url'),
+            'content': resource.get('content'),
+            'duration': resource.get('duration'),
+            'order': resource.get('order', j),
+            'status': 'active',
+            'created_at': datetime.utcnow()
+        } for module in modules for j, resource in enumerate(module.get('resources', []))]
+        for start in range(0, len(resource_rows), chunk_size):
+            db.session.execute(insert(LectureResource), resource_rows[start:start + chunk_size])
+        
+        # Every resource of these new modules came from this import, so id order is outline order
+        resource_ids = {}
+        if module_ids:
+            for lecture_id, resource_id in db.session.query(LectureResource.lecture_id, LectureResource.id).filter(
+                LectureResource.lecture_id.in_(list(module_ids.values())),
+                LectureResource.id > last_resource_id
+            ).order_by(LectureResource.lecture_id, LectureResource.id):
+                resource_ids.setdefault(lecture_id, []).append(resource_id)
+        
+        # Core bulk inserts bypass the ORM flush hook, so log them explicitly
+        record_changes(db.session, [
+            ('module', module_id, new_course.id, 'create') for module_id in module_ids.values()
+        ] + [
+            ('lecture_resource', resource_id, new_course.id, 'create')
+            for ids in resource_ids.values() for resource_id in ids
+        ])
+        
+        db.session.commit()
+    except Exception as e:
+        db.session.rollback()
+        print(f"Error importing course: {str(e)}")
+        return jsonify({
+            'success': False,
+            'error': f'Failed to import course: {str(e)}'
+        }), 500
+    
+    mapping = {'course_id': new_course.id, 'modules': []}
+    for module in modules:
+        module_id = module_ids[module['number']]
+        mapping['modules'].append({
+            'ref': module.get('ref'),
+            'number': module['number'],
+            'id': module_id,
+            'resources': [{
+                'ref': resource.get('ref'),
+                'index': j,
+                'id': resource_id
+            } for j, (resource, resource_id) in enumerate(zip(module.get('resources', []), resource_ids.get(module_id, [])))]
+        })
+    
+    return jsonify({
+        'success': True,
+        'message': 'Course imported successfully',
+        'course': new_course.to_dict(),
+        'mapping': mapping
+    }), 201
+
+
 @courses_bp.route('/', methods=['GET'])
 def get_all_courses():
     category = request.args.get('category')
@@ -71,6 +318,19 @@ def get_all_courses():
     instructor_id = request.args.get('instructor_id')
     status = request.args.get('status')
     
+    key = (category, level, instructor_id, status)
+    courses = catalog_cache.get(key)
+    if courses is None:
+        courses = Course.bulk_to_dict(catalog_query(category, level, instructor_id, status).all(), include_instructor=True)
+        catalog_cache.set(key, courses)
+    
+    return jsonify({
+        'success': True,
+        'courses': courses
+    }), 200
+
+
+def catalog_query(category, level, instructor_id, status):
     # Default to showing only active courses for public
     query = Course.query.filter(Course.status != 'deleted')
     
@@ -85,13 +345,7 @@ def get_all_courses():
     else:
         # If no status specified, only show active courses
         query = query.filter_by(status='active')
-    
-    courses = query.all()
-    
-    return jsonify({
-        'success': True,
-        'courses': [course.to_dict(include_instructor=True) for course in courses]
-    }), 200
+    return query
 
 
 @courses_bp.route('/<int:course_id>', methods=['GET'])
@@ -112,6 +366,125 @@ def get_course(course_id):
     }), 200
 
 
+@courses_bp.route('/<int:course_id>/outline', methods=['GET'])
+def get_course_outline(course_id):
+    """Course with its active modules and resources, in two queries, for the learn page"""
+    row = db.session.query(Course, User.name).join(
+        User, Course.instructor_id == User.id
+    ).filter(
+        Course.id == course_id,
+        Course.status != 'deleted'
+    ).first()
+    
+    if not row:
+        return jsonify({
+            'success': False,
+            'error': 'Course not found'
+        }), 404
+    
+    course, instructor_name = row
+    
+    rows = db.session.query(
+        CourseModule.id,
+        CourseModule.number,
+        CourseModule.title,
+        CourseModule.duration,
+        LectureResource.id.label('resource_id'),
+        LectureResource.resource_type,
+        LectureResource.title.label('resource_title'),
+        LectureResource.url,
+        LectureResource.duration.label('resource_duration'),
+        LectureResource.order
+    ).outerjoin(
+        LectureResource,
+        (LectureResource.lecture_id == CourseModule.id) & (LectureResource.status == 'active')
+    ).filter(
+        CourseModule.course_id == course_id,
+        CourseModule.status == 'active'
+    ).order_by(
+        CourseModule.number, CourseModule.id, LectureResource.order, LectureResource.id
+    ).all()
+    
+    modules = {}
+    for r in rows:
+        module = modules.get(r.id)
+        if module is None:
+            module = modules[r.id] = {
+                'id': r.id,
+                'course_id': course_id,
+                'number': r.number,
+                'title': r.title,
+                'duration': r.duration,
+                'lessons': 0,
+                'resources': []
+            }
+        if r.resource_id is not None:
+            module['resources'].append({
+                'id': r.resource_id,
+                'lecture_id': r.id,
+                'resource_type': r.resource_type,
+                'title': r.resource_title,
+                'url': r.url,
+                'duration': r.resource_duration,
+                'order': r.order
+            })
+            module['lessons'] += 1
+    
+    return jsonify({
+        'success': True,
+        'course': {
+            'id': course.id,
+            'title': course.title,
+            'description': course.description,
+            'instructor_id': course.instructor_id,
+            'instructor': instructor_name,
+            'category': course.category,
+            'level': course.level,
+            'duration': course.duration,
+            'image': course.image,
+            'status': course.status,
+            'modules': list(modules.values())
+        }
+    }), 200
+
+
+@courses_bp.route('/<int:course_id>/recommendations', methods=['GET'])
+def get_course_recommendations(course_id):
+    """Students also enrolled in: precomputed co-enrollment neighbours, best first"""
+    try:
+        # The periodic refresh re-queues itself; the first read after a deploy starts it
+        if schedule_recommendations_if_stale():
+            db.session.commit()
+            job_runner.wake()
+    except Exception as e:
+        db.session.rollback()
+        print(f"Error scheduling recommendation refresh: {str(e)}")
+    
+    limit = request.args.get('limit', current_app.config.get('RECOMMENDATIONS_LIMIT', 6), type=int)
+    limit = max(1, min(limit, current_app.config.get('RECOMMENDATIONS_PER_COURSE', 10)))
+    
+    rows = db.session.query(Course, CourseRecommendation.score, CourseRecommendation.co_enrollments).join(
+        CourseRecommendation, CourseRecommendation.recommended_course_id == Course.id
+    ).filter(
+        CourseRecommendation.course_id == course_id,
+        Course.status == 'active'
+    ).order_by(
+        CourseRecommendation.score.desc(),
+        Course.id
+    ).limit(limit).all()
+    
+    courses = Course.bulk_to_dict([course for course, _, _ in rows], include_instructor=True)
+    for data, (_, score, together) in zip(courses, rows):
+        data['similarity'] = round(score, 4)
+        data['co_enrollments'] = together
+    
+    return jsonify({
+        'success': True,
+        'course_id': course_id,
+        'courses': courses
+    }), 200
+
+
 @courses_bp.route('/<int:course_id>', methods=['PUT'])
 def update_course(course_id):
     course = Course.query.get(course_id)
@@ -172,13 +545,85 @@ def delete_course(course_id):
     }), 200
 
 
+@courses_bp.route('/trending', methods=['GET'])
+def get_trending_courses():
+    """Top courses by trending (decayed recent enrollments), popular or top_rated, optionally per category"""
+    ranking = request.args.get('ranking', 'trending')
+    category = request.args.get('category', '')
+    limit = request.args.get('limit', current_app.config.get('TRENDING_LIMIT', 12), type=int)
+    limit = max(1, min(limit, current_app.config.get('TRENDING_MAX_LIMIT', 50)))
+    
+    if ranking not in CourseRanking.RANKINGS:
+        return jsonify({
+            'success': False,
+            'error': f'ranking must be one of {", ".join(CourseRanking.RANKINGS)}'
+        }), 400
+    
+    try:
+        # Fill in courses that predate the rankings (first reads after a deploy)
+        if schedule_rebuild_if_incomplete():
+            db.session.commit()
+            job_runner.wake()
+    except Exception as e:
+        db.session.rollback()
+        print(f"Error scheduling ranking rebuild: {str(e)}")
+    
+    column = getattr(CourseRanking, CourseRanking.RANKINGS[ranking])
+    query = db.session.query(Course, column).join(
+        CourseRanking, CourseRanking.course_id == Course.id
+    ).filter(CourseRanking.active == True)
+    
+    if category:
+        query = query.filter(CourseRanking.category == category)
+    
+    if ranking == 'top_rated':
+        query = query.filter(CourseRanking.rating_count > 0)
+    else:
+        query = query.filter(column > 0)
+    
+    # Same direction on both keys so the ranking index is read backwards without a sort
+    rows = query.order_by(column.desc(), CourseRanking.course_id.desc()).limit(limit).all()
+    
+    courses = Course.bulk_to_dict([course for course, _ in rows], include_instructor=True)
+    now = datetime.utcnow()
+    for data, (_, score) in zip(courses, rows):
+        if ranking == 'trending':
+            data['ranking_score'] = round(decayed_score(score, now), 3)
+        elif ranking == 'top_rated':
+            data['ranking_score'] = round(score, 2)
+        else:
+            data['ranking_score'] = score
+    
+    return jsonify({
+        'success': True,
+        'ranking': ranking,
+        'category': category or None,
+        'courses': courses
+    }), 200
+
+
+@courses_bp.route('/suggest', methods=['GET'])
+def suggest_courses():
+    """Typeahead: active courses whose title, category or instructor name has a word starting with prefix"""
+    prefix = request.args.get('prefix', '')
+    limit = request.args.get('limit', current_app.config.get('SUGGEST_LIMIT', 8), type=int)
+    limit = max(1, min(limit, current_app.config.get('SUGGEST_MAX_LIMIT', 20)))
+    
+    return jsonify({
+        'success': True,
+        'suggestions': suggest_index.suggest(prefix[:100], limit)
+    }), 200
+
+
 @courses_bp.route('/search', methods=['GET'])
 def search_courses():
     from models import User
     
-    q = request.args.get('q', '')
+    q = normalize_query(request.args.get('q', ''))
     category = request.args.get('category', '')
     level = request.args.get('level', '')
+    instructor_id = request.args.get('instructor_id', type=int)
+    min_rating = request.args.get('min_rating', type=float)
     sort = request.args.get('sort', 'created_at')
     page = request.args.get('page', 1, type=int)
     per_page = request.args.get('per_page', 10, type=int)
@@ -186,12 +631,7 @@ def search_courses():
     query = Course.query.join(User).filter(Course.status == 'active')
     
     if q:
-        pattern = f'%{q}%'
-        query = query.filter(
-            (Course.title.ilike(pattern)) |
-            (Course.description.ilike(pattern)) |
-            (User.name.ilike(pattern))
-        )
+        query = query.filter(text_filter(q))
     
     if category:
         query = query.filter(Course.category == category)
@@ -199,6 +639,13 @@ def search_courses():
     if level:
         query = query.filter(Course.level == level)
     
+    if instructor_id:
+        query = query.filter(Course.instructor_id == instructor_id)
+    
+    if min_rating:
+        ratings = course_ratings()
+        query = query.join(ratings, ratings.c.course_id == Course.id).filter(ratings.c.rating >= min_rating)
+    
     if sort == 'title':
         query = query.order_by(Course.title)
     else:
@@ -206,11 +653,17 @@ def search_courses():
     
     paginated = query.paginate(page=page, per_page=per_page)
     
+    rows = facet_cache.get(q)
+    if rows is None:
+        rows = [tuple(row) for row in db.session.execute(facet_statement(q))]
+        facet_cache.set(q, rows, current_app.config.get('FACET_CACHE_TTL', 60))
+    
     return jsonify({
         'success': True,
-        'courses': [course.to_dict(include_instructor=True) for course in paginated.items],
+        'courses': Course.bulk_to_dict(paginated.items, include_instructor=True),
         'total': paginated.total,
         'pages': paginated.pages,
-        'current_page': page
+        'current_page': page,
+        'facets': facets_from_rows(rows, category, level, instructor_id or None, min_rating or None)
     }), 200
 
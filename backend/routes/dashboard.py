@@ -1,6 +1,11 @@
-from flask import Blueprint, jsonify, request
-from models import User, Course, Enrollment, Progress
+from flask import Blueprint, jsonify, request, current_app, g
+from models import User, Course, Enrollment
 from database import db
+from middleware.auth import require_role
+from services.completion_stats import course_funnel, refresh_first_view, schedule_course_refresh, schedule_refresh
+from services.activity import course_activity, schedule_if_stale, streaks, user_activity
+from services.jobs import job_runner
+from datetime import datetime, timedelta
 
 dashboard_bp = Blueprint('dashboard', __name__, url_prefix='/dashboard')
 
@@ -18,6 +23,7 @@ def get_student_dashboard(user_id):
         Enrollment.status.in_(['active', 'completed'])
     ).all()
     
+    progress = Enrollment.bulk_progress(enrollments)
     courses_data = []
     for enrollment in enrollments:
         # Fetch course separately since relationship may not be defined
@@ -25,21 +31,8 @@ def get_student_dashboard(user_id):
         if not course or course.status != 'active':
             continue
         
-        # Calculate progress percentage
-        total_lectures = Progress.query.filter_by(
-            enrollment_id=enrollment.id,
-            status='active'
-        ).count()
-        
-        if total_lectures == 0:
-            progress_percentage = 0
-        else:
-            completed_lectures = Progress.query.filter_by(
-                enrollment_id=enrollment.id,
-                completed=True,
-                status='active'
-            ).count()
-            progress_percentage = int((completed_lectures / total_lectures) * 100)
+        # Against the course outline, so lectures without a progress row yet count as incomplete
+        progress_percentage = progress[enrollment.id]
         
         courses_data.append({
             'enrollment_id': enrollment.id,
@@ -101,22 +94,103 @@ def get_instructor_dashboard(user_id):
     }), 200
 
 
+@dashboard_bp.route('/instructor/courses/<int:course_id>/funnel', methods=['GET'])
+@require_role('instructor', 'admin')
+def get_course_funnel(course_id):
+    """Completion counts, rates and median time-to-complete per module and resource, from the rollups"""
+    course = db.session.get(Course, course_id)
+    if not course or course.status == 'deleted':
+        return jsonify({'success': False, 'error': 'Course not found'}), 404
+    if g.principal.role != 'admin' and course.instructor_id != g.principal.id:
+        return jsonify({'success': False, 'error': 'You can only view analytics for your own courses'}), 403
+    
+    try:
+        funnel = course_funnel(course_id)
+        if funnel is None and job_runner.running:
+            # First view of this course; its medians are computed in the background
+            if schedule_course_refresh(course_id):
+                db.session.commit()
+                job_runner.wake()
+            return jsonify({
+                'success': True,
+                'message': 'Course analytics are being computed; retry shortly',
+                'funnel': None
+            }), 202
+        elif funnel is None:
+            # Nothing would run the job in this process (BACKGROUND_JOBS off, flask run, CLI)
+            refresh_first_view(course_id)
+            db.session.commit()
+            funnel = course_funnel(course_id)
+        elif datetime.fromisoformat(funnel['computed_at']) < datetime.utcnow() - timedelta(
+                seconds=current_app.config.get('COMPLETION_STATS_REFRESH_INTERVAL', 300) * 2):
+            # The periodic refresh is not running; start it
+            if schedule_refresh():
+                db.session.commit()
+                job_runner.wake()
+    except Exception as e:
+        db.session.rollback()
+        print(f"Error computing course funnel: {str(e)}")
+        return jsonify({'success': False, 'error': f'Failed to compute course analytics: {str(e)}'}), 500
+    
+    return jsonify({'success': True, 'funnel': funnel}), 200
+
+
+def activity_since():
+    """First UTC day of the ?days= range, clamped to ACTIVITY_MAX_DAYS"""
+    days = request.args.get('days', current_app.config.get('ACTIVITY_DAYS', 365), type=int)
+    days = max(1, min(days, current_app.config.get('ACTIVITY_MAX_DAYS', 731)))
+    return datetime.utcnow().date() - timedelta(days=days - 1)
+
+
+def start_activity_rollup():
+    try:
+        if schedule_if_stale():
+            db.session.commit()
+            job_runner.wake()
+    except Exception as e:
+        db.session.rollback()
+        print(f"Error scheduling activity rollup: {str(e)}")
+
+
+@dashboard_bp.route('/student/<int:user_id>/activity', methods=['GET'])
+def get_student_activity(user_id):
+    """Daily activity heatmap and streaks from the activity rollups (UTC days)"""
+    user = User.query.get(user_id)
+    if not user:
+        return jsonify({'success': False, 'error': 'User not found'}), 404
+    
+    start_activity_rollup()
+    days = user_activity(user_id, activity_since())
+    current_streak, longest_streak = streaks(
+        [datetime.fromisoformat(day['date']).date() for day in days], datetime.utcnow().date()
+    )
+    
+    return jsonify({
+        'success': True,
+        'days': days,
+        'active_days': len(days),
+        'current_streak': current_streak,
+        'longest_streak': longest_streak  # within the requested range
+    }), 200
+
+
+@dashboard_bp.route('/instructor/courses/<int:course_id>/activity', methods=['GET'])
+@require_role('instructor', 'admin')
+def get_course_activity(course_id):
+    """Daily active learners, completions, enrollments and reviews of a course (UTC days)"""
+    course = db.session.get(Course, course_id)
+    if not course or course.status == 'deleted':
+        return jsonify({'success': False, 'error': 'Course not found'}), 404
+    if g.principal.role != 'admin' and course.instructor_id != g.principal.id:
+        return jsonify({'success': False, 'error': 'You can only view analytics for your own courses'}), 403
+    
+    start_activity_rollup()
+    return jsonify({'success': True, 'course_id': course_id, 'days': course_activity(course_id, activity_since())}), 200
+
+
 @dashboard_bp.route('/admin', methods=['GET'])
+@require_role('admin')
 def get_admin_dashboard():
-    admin_id = request.headers.get('X-User-Id')
-    if not admin_id:
-        return jsonify({
-            'success': False,
-            'error': 'Admin authentication required'
-        }), 401
-    
-    user = User.query.get(int(admin_id))
-    if not user or user.role != 'admin':
-        return jsonify({
-            'success': False,
-            'error': 'Admin access required'
-        }), 403
-    
     # Get total active students (learners)
     total_students = User.query.filter_by(role='learner', status='active').count()
     
@@ -2,14 +2,29 @@ from flask import Blueprint, jsonify, request
 from models import User, Course, Enrollment, Progress
 from database import db
 from datetime import datetime
+from services.progress_buffer import progress_buffer
+from services.jobs import enqueue, job_runner
+from routes.progress import initialize_progress_for_enrollment
+from services.rankings import record_enrollments, record_unenrollment
+from services.activity import record_activity
 
 enrollments_bp = Blueprint('enrollments', __name__, url_prefix='/enrollments')
 
 
+def materialize_progress_later(enrollment_id):
+    """Queue progress materialization for an enrollment. The caller commits.
+
+    Without a running job runner in this process (BACKGROUND_JOBS off, flask run,
+    CLI) nothing would pick the job up, so the rows are created right away.
+    """
+    if job_runner.running:
+        enqueue('materialize_progress', {'enrollment_id': enrollment_id})
+    else:
+        initialize_progress_for_enrollment(enrollment_id)
+
+
 @enrollments_bp.route('/', methods=['POST'])
 def enroll_in_course():
-    from routes.progress import initialize_progress_for_enrollment
-    
     data = request.get_json()
     
     if not data or 'user_id' not in data or 'course_id' not in data:
@@ -44,9 +59,12 @@ def enroll_in_course():
         if existing_enrollment.status in ['dropped', 'deleted']:
             existing_enrollment.status = 'active'
             existing_enrollment.enrolled_at = datetime.utcnow()
+            record_enrollments(course_id, at=existing_enrollment.enrolled_at)
+            record_activity(user_id, course_id, 'enrolled', at=existing_enrollment.enrolled_at)
+            # Progress rows are reactivated in the background, committed atomically with the job
+            materialize_progress_later(existing_enrollment.id)
             db.session.commit()
-            # Initialize progress rows again for re-enrollment
-            initialize_progress_for_enrollment(existing_enrollment.id)
+            job_runner.wake()
             
             return jsonify({
                 'success': True,
@@ -68,10 +86,14 @@ def enroll_in_course():
     )
     
     db.session.add(new_enrollment)
-    db.session.commit()
+    db.session.flush()
+    record_enrollments(course_id, at=new_enrollment.enrolled_at)
+    record_activity(user_id, course_id, 'enrolled', at=new_enrollment.enrolled_at)
     
-    # Automatically create progress rows for all lectures
-    initialize_progress_for_enrollment(new_enrollment.id)
+    # Progress rows for all lectures are created in the background, committed atomically with the job
+    materialize_progress_later(new_enrollment.id)
+    db.session.commit()
+    job_runner.wake()
     
     return jsonify({
         'success': True,
@@ -95,7 +117,7 @@ def get_all_enrollments():
         query = query.filter_by(status=status)
 
     enrollments = query.all()
-    return jsonify({'success': True, 'enrollments': [e.to_dict(include_course=True) for e in enrollments], 'total': len(enrollments)}), 200
+    return jsonify({'success': True, 'enrollments': Enrollment.bulk_to_dict(enrollments, include_course=True), 'total': len(enrollments)}), 200
 
 
 @enrollments_bp.route('/<int:enrollment_id>', methods=['GET'])
@@ -116,9 +138,14 @@ def unenroll_from_course(enrollment_id):
         if enrollment.status in ['deleted', 'dropped']:
             return jsonify({'success': False, 'error': 'Already unenrolled'}), 400
 
+        counted = enrollment.status in ['active', 'completed']
         enrollment.status = 'deleted'
-        Progress.query.filter_by(enrollment_id=enrollment.id).update({'status': 'deleted'}, synchronize_session=False)
-        db.session.commit()
+        if counted:
+            record_unenrollment(enrollment.course_id)
+            record_activity(enrollment.user_id, enrollment.course_id, 'unenrolled')
+        with progress_buffer.superseded_by(enrollment.id):
+            Progress.query.filter_by(enrollment_id=enrollment.id).update({'status': 'deleted'}, synchronize_session=False)
+            db.session.commit()
         return jsonify({'success': True, 'message': 'Unenrolled successfully'}), 200
     except Exception as e:
         db.session.rollback()
@@ -139,11 +166,37 @@ def get_user_enrollments(user_id):
 
     return jsonify({
         'success': True,
-        'enrollments': [e.to_dict(include_course=True) for e in enrollments],
+        'enrollments': Enrollment.bulk_to_dict(enrollments, include_course=True),
         'total': len(enrollments)
     }), 200
 
 
+@enrollments_bp.route('/user/<int:user_id>/continue', methods=['GET'])
+def get_continue_learning(user_id):
+    """Next lecture to resume for each active enrollment of a user"""
+    user = User.query.get(user_id)
+    if not user:
+        return jsonify({'success': False, 'error': 'User not found'}), 404
+
+    rows = Progress.get_next_lectures_for_user(user_id)
+
+    return jsonify({
+        'success': True,
+        'courses': [{
+            'enrollment_id': enrollment.id,
+            'course_id': enrollment.course_id,
+            'course_title': course_title,
+            'enrolled_at': enrollment.enrolled_at.isoformat() if enrollment.enrolled_at else None,
+            'next_lecture': dict(
+                lecture.to_dict(include_content=False),
+                module_number=module_number,
+                module_title=module_title
+            ) if lecture else None
+        } for enrollment, course_title, lecture, module_number, module_title in rows],
+        'total': len(rows)
+    }), 200
+
+
 @enrollments_bp.route('/check/<int:user_id>/<int:course_id>', methods=['GET'])
 def check_enrollment(user_id, course_id):
     enrollment = Enrollment.query.filter_by(
@@ -1,9 +1,15 @@
-from flask import Blueprint, jsonify, request
+import hashlib
+import io
+from flask import Blueprint, jsonify, request, send_file
 from models import LectureResource, CourseModule
 from database import db
+from sqlalchemy import func
+from sqlalchemy.orm import defer
 
 lecture_resources_bp = Blueprint('lecture_resources', __name__, url_prefix='/lecture-resources')
 
+CONTENT_PREVIEW_LENGTH = 150
+
 @lecture_resources_bp.route('/', methods=['POST'])
 def create_lecture_resource():
     try:
@@ -51,21 +57,30 @@ def create_lecture_resource():
 
 @lecture_resources_bp.route('/', methods=['GET'])
 def get_all_lecture_resources():
+    """List resources without their content; it is fetched from /<id>/content when opened"""
     lecture_id = request.args.get('lecture_id')
     
+    # Only a short prefix is read for previews; the full column stays deferred
+    preview = func.substr(LectureResource.content, 1, CONTENT_PREVIEW_LENGTH + 1)
+    query = db.session.query(LectureResource, preview).options(defer(LectureResource.content))
+    
     if lecture_id:
-        resources = LectureResource.query.filter_by(
-            lecture_id=lecture_id,
-            status='active'
+        resources = query.filter(
+            LectureResource.lecture_id == lecture_id,
+            LectureResource.status == 'active'
         ).order_by(LectureResource.order).all()
     else:
-        resources = LectureResource.query.filter_by(
-            status='active'
+        resources = query.filter(
+            LectureResource.status == 'active'
         ).order_by(LectureResource.lecture_id, LectureResource.order).all()
     
     return jsonify({
         'success': True,
-        'resources': [resource.to_dict() for resource in resources]
+        'resources': [dict(
+            resource.to_dict(include_content=False),
+            content_preview=content_preview[:CONTENT_PREVIEW_LENGTH] if content_preview else None,
+            content_truncated=bool(content_preview) and len(content_preview) > CONTENT_PREVIEW_LENGTH
+        ) for resource, content_preview in resources]
     }), 200
 
 
@@ -85,6 +100,43 @@ def get_lecture_resource(resource_id):
     }), 200
 
 
+@lecture_resources_bp.route('/<int:resource_id>/content', methods=['GET'])
+def get_lecture_resource_content(resource_id):
+    """Stream a resource's content with ETag revalidation and HTTP Range support"""
+    row = db.session.query(
+        LectureResource.resource_type,
+        LectureResource.status,
+        LectureResource.content
+    ).filter(LectureResource.id == resource_id).first()
+    
+    if not row or row.status == 'deleted':
+        return jsonify({
+            'success': False,
+            'error': 'Resource not found'
+        }), 404
+    
+    if not row.content:
+        return jsonify({
+            'success': False,
+            'error': 'Resource has no content'
+        }), 404
+    
+    body = row.content.encode('utf-8')
+    etag = hashlib.sha1(body).hexdigest()
+    mimetype = 'application/json' if row.resource_type == 'quiz' else 'text/plain'
+    
+    # send_file answers If-None-Match / If-Range / Range (206, 416) and streams in blocks
+    response = send_file(
+        io.BytesIO(body),
+        mimetype=mimetype,
+        etag=etag,
+        conditional=True,
+        max_age=0
+    )
+    response.cache_control.no_cache = True
+    return response
+
+
 @lecture_resources_bp.route('/<int:resource_id>', methods=['PUT'])
 def update_lecture_resource(resource_id):
     resource = LectureResource.query.get(resource_id)
@@ -0,0 +1,311 @@
+import re
+import uuid
+from datetime import datetime, timedelta
+from flask import Blueprint, jsonify, request, send_file, current_app, g
+from models import MediaFile, MediaUpload, LectureResource, CourseModule, Course
+from database import db, upsert
+from middleware.auth import require_role
+from services.jobs import enqueue, job_handler
+from services.storage import get_storage
+
+media_bp = Blueprint('media', __name__, url_prefix='/media')
+
+MEDIA_RESOURCE_TYPES = ('video', 'pdf', 'document')
+
+_CONTENT_RANGE = re.compile(r'^bytes (\d+)-(\d+)/(\d+)$')
+_SHA256 = re.compile(r'^[0-9a-f]{64}$')
+_DERIVATIVE = re.compile(r'^[0-9a-f]{64}_[a-z]+_\d+\.(webp|jpg)$')
+
+
+def find_upload(upload_id):
+    """The upload if it belongs to the requesting user (any upload for admins)"""
+    upload = MediaUpload.query.get(upload_id)
+    if not upload:
+        return None
+    if g.principal.role != 'admin' and upload.user_id != g.principal.id:
+        return None
+    return upload
+
+
+@job_handler('expire_media_upload')
+def expire_media_upload(payload):
+    """Drop an upload that was never completed, along with its partial file"""
+    upload = MediaUpload.query.get(payload['upload_id'])
+    if upload and upload.status in ('uploading', 'writing'):
+        get_storage().discard_upload(upload.id)
+        db.session.delete(upload)
+
+
+@media_bp.route('/uploads', methods=['POST'])
+@require_role('instructor', 'admin')
+def create_upload():
+    """Start a resumable upload; the bytes follow as PUT requests with Content-Range"""
+    data = request.get_json()
+
+    if not data or 'filename' not in data or 'mimetype' not in data or 'size' not in data:
+        return jsonify({
+            'success': False,
+            'error': 'filename, mimetype and size are required'
+        }), 400
+
+    mimetype = str(data['mimetype']).strip().lower()
+    if mimetype not in current_app.config.get('MEDIA_ALLOWED_MIMETYPES', ()):
+        return jsonify({'success': False, 'error': f'Files of type {mimetype[:100]} are not accepted'}), 415
+
+    size = data['size']
+    max_size = current_app.config.get('MEDIA_MAX_UPLOAD_SIZE')
+    if not isinstance(size, int) or size <= 0:
+        return jsonify({'success': False, 'error': 'size must be a positive integer'}), 400
+    if max_size and size > max_size:
+        return jsonify({'success': False, 'error': f'Uploads are limited to {max_size} bytes'}), 413
+
+    lecture_resource_id = data.get('lecture_resource_id')
+    if lecture_resource_id is not None:
+        row = db.session.query(LectureResource.resource_type, Course.instructor_id).join(
+            CourseModule, LectureResource.lecture_id == CourseModule.id
+        ).join(
+            Course, CourseModule.course_id == Course.id
+        ).filter(
+            LectureResource.id == lecture_resource_id,
+            LectureResource.status == 'active'
+        ).first()
+
+        if not row:
+            return jsonify({'success': False, 'error': 'Lecture resource not found'}), 404
+        if row.resource_type not in MEDIA_RESOURCE_TYPES:
+            return jsonify({
+                'success': False,
+                'error': f'Files can only be attached to {", ".join(MEDIA_RESOURCE_TYPES)} resources'
+            }), 400
+        if g.principal.role != 'admin' and row.instructor_id != g.principal.id:
+            return jsonify({'success': False, 'error': 'You can only upload files to your own courses'}), 403
+
+    upload = MediaUpload(
+        id=uuid.uuid4().hex,
+        user_id=g.principal.id,
+        lecture_resource_id=lecture_resource_id,
+        filename=str(data['filename'])[:255],
+        mimetype=mimetype,
+        size=size,
+        received=0,
+        status='uploading'
+    )
+    db.session.add(upload)
+    enqueue('expire_media_upload', {'upload_id': upload.id}, delay=current_app.config.get('MEDIA_UPLOAD_TTL', 86400))
+    db.session.commit()
+
+    return jsonify({'success': True, 'upload': upload.to_dict()}), 201
+
+
+@media_bp.route('/uploads/<upload_id>', methods=['GET'])
+@require_role('instructor', 'admin')
+def get_upload(upload_id):
+    """Current offset of an upload, so an interrupted client knows where to resume"""
+    upload = find_upload(upload_id)
+    if not upload:
+        return jsonify({'success': False, 'error': 'Upload not found'}), 404
+    return jsonify({'success': True, 'upload': upload.to_dict()}), 200
+
+
+@media_bp.route('/uploads/<upload_id>', methods=['PUT'])
+@require_role('instructor', 'admin')
+def upload_chunk(upload_id):
+    """Append one chunk. The body is streamed to disk, never buffered in memory.
+
+    The body is spooled to a file of its own first. Only then does the request
+    claim the offset (status 'writing', conditional on received) and append the
+    spooled bytes, so concurrent chunks cannot write into the upload together.
+    """
+    upload = find_upload(upload_id)
+    if not upload:
+        return jsonify({'success': False, 'error': 'Upload not found'}), 404
+
+    if upload.status == 'complete':
+        return jsonify({'success': False, 'error': 'Upload is already complete'}), 409
+
+    match = _CONTENT_RANGE.match(request.headers.get('Content-Range', ''))
+    if not match:
+        return jsonify({
+            'success': False,
+            'error': 'Content-Range: bytes <start>-<end>/<size> is required'
+        }), 400
+
+    start, end, total = (int(part) for part in match.groups())
+    if total != upload.size or end < start or end >= upload.size:
+        return jsonify({'success': False, 'error': 'Content-Range does not fit the upload size'}), 416
+
+    if start != upload.received:
+        return jsonify({
+            'success': False,
+            'error': 'Chunk does not start at the current offset',
+            'offset': upload.received
+        }), 409
+
+    expected = end - start + 1
+    if request.content_length != expected:
+        return jsonify({'success': False, 'error': 'Content-Length does not match Content-Range'}), 400
+
+    storage = get_storage()
+    chunk_id, written = storage.receive_chunk(
+        upload.id, request.stream, current_app.config.get('MEDIA_CHUNK_SIZE', 1024 * 1024)
+    )
+
+    # MySQL DATETIME keeps whole seconds; the claim is matched by this exact value
+    claimed_at = datetime.utcnow().replace(microsecond=0)
+    abandoned = claimed_at - timedelta(seconds=current_app.config.get('MEDIA_CHUNK_CLAIM_TIMEOUT', 60))
+    try:
+        # Conditional on the offset we started from, so only one chunk can take it
+        claimed = MediaUpload.query.filter(
+            MediaUpload.id == upload.id,
+            MediaUpload.received == start,
+            (MediaUpload.status == 'uploading') |
+            ((MediaUpload.status == 'writing') & (MediaUpload.updated_at < abandoned))
+        ).update({'status': 'writing', 'updated_at': claimed_at}, synchronize_session=False)
+        db.session.commit()
+
+        if not claimed:
+            return jsonify({'success': False, 'error': 'Upload was modified concurrently'}), 409
+
+        appended = False
+        try:
+            storage.append_chunk(upload.id, chunk_id, start)
+            appended = True
+        finally:
+            # Release the claim; a failed append leaves the offset where it was
+            released = MediaUpload.query.filter_by(
+                id=upload.id, status='writing', updated_at=claimed_at
+            ).update({
+                'status': 'uploading',
+                'received': start + written if appended else start
+            }, synchronize_session=False)
+            db.session.commit()
+    except Exception as e:
+        db.session.rollback()
+        print(f"Error writing upload chunk: {str(e)}")
+        return jsonify({'success': False, 'error': f'Failed to write chunk: {str(e)}'}), 500
+    finally:
+        storage.discard_chunk(upload.id, chunk_id)
+
+    if not released:
+        return jsonify({'success': False, 'error': 'Upload was modified concurrently'}), 409
+
+    if written != expected:
+        return jsonify({
+            'success': False,
+            'error': 'Incomplete chunk',
+            'offset': start + written
+        }), 400
+
+    return jsonify({'success': True, 'offset': start + written, 'size': upload.size}), 200
+
+
+@media_bp.route('/uploads/<upload_id>/complete', methods=['POST'])
+@require_role('instructor', 'admin')
+def complete_upload(upload_id):
+    """Hash the upload, store it content-addressed and attach it to its lecture resource"""
+    upload = find_upload(upload_id)
+    if not upload:
+        return jsonify({'success': False, 'error': 'Upload not found'}), 404
+
+    if upload.status == 'complete':
+        return jsonify({'success': True, 'upload': upload.to_dict()}), 200
+
+    if upload.status == 'writing' or upload.received != upload.size:
+        return jsonify({
+            'success': False,
+            'error': 'Upload is not finished',
+            'offset': upload.received
+        }), 409
+
+    upload_id, mimetype, lecture_resource_id = upload.id, upload.mimetype, upload.lecture_resource_id
+    # Claimed like a chunk, so only one request moves the file into place
+    claimed_at = datetime.utcnow().replace(microsecond=0)
+    claimed = MediaUpload.query.filter(
+        MediaUpload.id == upload_id,
+        MediaUpload.status == 'uploading',
+        MediaUpload.received == MediaUpload.size
+    ).update({'status': 'writing', 'updated_at': claimed_at}, synchronize_session=False)
+    db.session.commit()
+    if not claimed:
+        return jsonify({'success': False, 'error': 'Upload is being completed by another request'}), 409
+
+    try:
+        sha256, size = get_storage().commit_upload(upload_id)
+
+        # A file with the same bytes may already exist; it is reused as-is
+        upsert(MediaFile, [{'sha256': sha256, 'size': size, 'mimetype': mimetype}], ['sha256'], [])
+
+        MediaUpload.query.filter_by(id=upload_id, status='writing', updated_at=claimed_at).update({
+            'status': 'complete',
+            'sha256': sha256
+        }, synchronize_session=False)
+        if lecture_resource_id:
+            resource = LectureResource.query.get(lecture_resource_id)
+            if resource and resource.status == 'active':
+                resource.url = f'/api/media/{sha256}'
+
+        db.session.commit()
+    except Exception as e:
+        db.session.rollback()
+        MediaUpload.query.filter_by(id=upload_id, status='writing', updated_at=claimed_at).update(
+            {'status': 'uploading'}, synchronize_session=False
+        )
+        db.session.commit()
+        print(f"Error completing upload: {str(e)}")
+        return jsonify({'success': False, 'error': f'Failed to complete upload: {str(e)}'}), 500
+
+    return jsonify({'success': True, 'upload': db.session.get(MediaUpload, upload_id).to_dict()}), 200
+
+
+@media_bp.route('/<sha256>', methods=['GET'])
+def get_media(sha256):
+    """Serve a stored file with Range support and immutable caching.
+
+    Local files are handed to the WSGI server's file wrapper (sendfile under
+    gunicorn) or to the front-end server when USE_X_SENDFILE is set.
+    """
+    if not _SHA256.match(sha256):
+        return jsonify({'success': False, 'error': 'Media not found'}), 404
+
+    media = MediaFile.query.get(sha256)
+    storage = get_storage()
+    if not media or not storage.exists(sha256):
+        return jsonify({'success': False, 'error': 'Media not found'}), 404
+
+    path = storage.local_path(sha256)
+    response = send_file(
+        path or storage.open(sha256),
+        mimetype=media.mimetype,
+        # Uploaded bytes share the API origin: only images are shown in place, the rest is downloaded
+        as_attachment=media.mimetype not in current_app.config.get('MEDIA_INLINE_MIMETYPES', ()),
+        download_name=sha256,
+        etag=sha256,
+        conditional=True,
+        max_age=current_app.config.get('MEDIA_CACHE_MAX_AGE', 31536000)
+    )
+    # The URL is the content hash, so the bytes behind it can never change
+    response.cache_control.public = True
+    response.cache_control.immutable = True
+    response.headers['X-Content-Type-Options'] = 'nosniff'
+    return response
+
+
+@media_bp.route('/images/<name>', methods=['GET'])
+def get_image_derivative(name):
+    """Serve a resized image rendition; names are content-addressed, so caching is immutable"""
+    match = _DERIVATIVE.match(name)
+    storage = get_storage()
+    if not match or not storage.exists(name):
+        return jsonify({'success': False, 'error': 'Image not found'}), 404
+
+    response = send_file(
+        storage.local_path(name) or storage.open(name),
+        mimetype='image/webp' if match.group(1) == 'webp' else 'image/jpeg',
+        etag=name,
+        conditional=True,
+        max_age=current_app.config.get('MEDIA_CACHE_MAX_AGE', 31536000)
+    )
+    response.cache_control.public = True
+    response.cache_control.immutable = True
+    response.headers['X-Content-Type-Options'] = 'nosniff'
+    return response
@@ -1,45 +1,119 @@
-from flask import Blueprint, jsonify, request
-from models import Enrollment, Progress, LectureResource, CourseModule
-from database import db
-from datetime import datetime
+from flask import Blueprint, jsonify, request, current_app
+from models import CatalogChange, Enrollment, Progress, LectureResource, CourseModule
+from database import db, upsert, retry_on_deadlock, is_retryable
+from datetime import datetime, timedelta
+from sqlalchemy import case, func, select
+from services.progress_buffer import progress_buffer
+from services.jobs import job_handler
+from services.activity import record_activity
 
 progress_bp = Blueprint('progress', __name__, url_prefix='/progress')
 
+MAX_BATCH_SIZE = 1000
+
 
 def initialize_progress_for_enrollment(enrollment_id):
-    """Create Progress rows for all lectures for a new enrollment"""
+    """Create Progress rows for all lectures for a new enrollment. The caller commits."""
     enrollment = Enrollment.query.get(enrollment_id)
     if not enrollment or enrollment.status in ['deleted', 'dropped']:
         return
     
-    lectures = db.session.query(LectureResource).join(
+    materialize_progress(enrollment.course_id, [enrollment.id])
+
+
+@job_handler('materialize_progress')
+def materialize_progress_job(payload):
+    """Background half of enrollment; until it runs, reads treat missing rows as incomplete"""
+    initialize_progress_for_enrollment(payload['enrollment_id'])
+
+
+def materialize_progress(course_id, enrollment_ids):
+    """Make sure every enrollment has an active Progress row per active lecture of the course.
+
+    Rows soft-deleted by an earlier unenroll are reactivated and missing rows are
+    inserted with multi-row INSERTs in chunks of BULK_CHUNK_SIZE. The caller commits.
+    """
+    if not enrollment_ids:
+        return 0
+    
+    chunk_size = current_app.config.get('BULK_CHUNK_SIZE', 500)
+    
+    lecture_ids = [row.id for row in db.session.query(LectureResource.id).join(
         CourseModule, LectureResource.lecture_id == CourseModule.id
     ).filter(
-        CourseModule.course_id == enrollment.course_id,
+        CourseModule.course_id == course_id,
         LectureResource.status == 'active',
         CourseModule.status == 'active'
-    ).all()
+    )]
+    if not lecture_ids:
+        return 0
     
-    for lecture in lectures:
-        existing = Progress.query.filter_by(
-            enrollment_id=enrollment.id,
-            lecture_resource_id=lecture.id
-        ).first()
-        if not existing:
-            progress = Progress(
-                enrollment_id=enrollment.id,
-                lecture_resource_id=lecture.id,
-                completed=False,
-                status='active'
-            )
-            db.session.add(progress)
-    db.session.commit()
+    created = 0
+    for start in range(0, len(enrollment_ids), chunk_size):
+        chunk = enrollment_ids[start:start + chunk_size]
+        
+        Progress.query.filter(
+            Progress.enrollment_id.in_(chunk),
+            Progress.lecture_resource_id.in_(lecture_ids),
+            Progress.status == 'deleted'
+        ).update({'status': 'active'}, synchronize_session=False)
+        
+        existing = set(db.session.query(Progress.enrollment_id, Progress.lecture_resource_id).filter(
+            Progress.enrollment_id.in_(chunk)
+        ).all())
+        
+        rows = [
+            {
+                'enrollment_id': enrollment_id,
+                'lecture_resource_id': lecture_id,
+                'completed': False,
+                'status': 'active'
+            }
+            for enrollment_id in chunk
+            for lecture_id in lecture_ids
+            if (enrollment_id, lecture_id) not in existing
+        ]
+        # Insert-or-ignore so a concurrent materialization of the same rows is harmless
+        for row_start in range(0, len(rows), chunk_size):
+            upsert(Progress, rows[row_start:row_start + chunk_size], ['enrollment_id', 'lecture_resource_id'], [])
+        created += len(rows)
+    
+    return created
 
 
-@progress_bp.route('/toggle', methods=['POST'])
-def toggle_lecture_completion():
-    data = request.get_json()
+def apply_progress_states(enrollment_id, states, completed_at=None):
+    """Write {lecture_resource_id: completed} for one enrollment as a single UPDATE.
+
+    Rows that are already complete keep their original completed_at unless an
+    explicit {lecture_resource_id: completed_at} mapping is given.
+    """
+    if not states:
+        return
+    
+    now = datetime.utcnow()
+    completed_ids = [rid for rid, completed in states.items() if completed]
+    completed_at_value = func.coalesce(Progress.completed_at, now)
+    if completed_at:
+        completed_at_value = case(completed_at, value=Progress.lecture_resource_id, else_=completed_at_value)
     
+    Progress.query.filter(
+        Progress.enrollment_id == enrollment_id,
+        Progress.lecture_resource_id.in_(list(states.keys())),
+        Progress.status == 'active'
+    ).update({
+        Progress.completed: case(states, value=Progress.lecture_resource_id),
+        Progress.completed_at: case(
+            (Progress.lecture_resource_id.in_(completed_ids), completed_at_value),
+            else_=None
+        )
+    }, synchronize_session=False)
+
+
+def resolve_enrollment(data):
+    """Find the enrollment referenced by enrollment_id or (course_id, user_id).
+
+    Returns (enrollment, None) or (None, error_response).
+    """
     enrollment_id = data.get('enrollment_id')
     
     if not enrollment_id:
@@ -47,10 +121,10 @@ def toggle_lecture_completion():
         user_id = data.get('user_id')
         
         if not course_id or not user_id:
-            return jsonify({
+            return None, (jsonify({
                 'success': False,
                 'error': 'Either enrollment_id or (course_id and user_id) are required'
-            }), 400
+            }), 400)
         
         enrollment = Enrollment.query.filter_by(
             course_id=course_id,
@@ -60,13 +134,86 @@ def toggle_lecture_completion():
         ).first()
         
         if not enrollment:
-            return jsonify({'success': False, 'error': 'Enrollment not found'}), 404
-        
-        enrollment_id = enrollment.id
+            return None, (jsonify({'success': False, 'error': 'Enrollment not found'}), 404)
     else:
         enrollment = Enrollment.query.get(enrollment_id)
         if not enrollment or enrollment.status in ['deleted', 'dropped']:
-            return jsonify({'success': False, 'error': 'Enrollment not found'}), 404
+            return None, (jsonify({'success': False, 'error': 'Enrollment not found'}), 404)
+    
+    return enrollment, None
+
+
+def count_progress(enrollment_id):
+    """Return (total active lectures, completed lectures) for an enrollment in one query.
+
+    The total comes from the course outline rather than the progress rows, so
+    lectures whose rows are not materialized yet count as incomplete.
+    """
+    course_id = db.session.query(Enrollment.course_id).filter(
+        Enrollment.id == enrollment_id
+    ).scalar_subquery()
+    total = db.session.query(func.count(LectureResource.id)).join(
+        CourseModule, LectureResource.lecture_id == CourseModule.id
+    ).filter(
+        CourseModule.course_id == course_id,
+        LectureResource.status == 'active',
+        CourseModule.status == 'active'
+    ).scalar_subquery()
+    completed = db.session.query(func.count(Progress.id)).join(
+        LectureResource, Progress.lecture_resource_id == LectureResource.id
+    ).join(
+        CourseModule, LectureResource.lecture_id == CourseModule.id
+    ).filter(
+        Progress.enrollment_id == enrollment_id,
+        Progress.completed == True,
+        Progress.status == 'active',
+        LectureResource.status == 'active',
+        CourseModule.status == 'active'
+    ).scalar_subquery()
+    
+    total, completed = db.session.query(total, completed).one()
+    return total or 0, completed or 0
+
+
+def count_progress_with_pending(enrollment_id):
+    """count_progress with unflushed write-behind events merged in"""
+    total, completed = count_progress(enrollment_id)
+    pending = progress_buffer.pending_for(enrollment_id)
+    if pending:
+        stored = db.session.query(Progress.lecture_resource_id, Progress.completed).filter(
+            Progress.enrollment_id == enrollment_id,
+            Progress.lecture_resource_id.in_(list(pending.keys())),
+            Progress.status == 'active'
+        ).all()
+        for resource_id, was_completed in stored:
+            completed += int(pending[resource_id][0]) - int(bool(was_completed))
+    return total, completed
+
+
+def update_enrollment_completion(enrollment, total_lectures, completed_lectures):
+    """Set the enrollment status from its progress counts and return the percentage"""
+    course_progress = int((completed_lectures / total_lectures) * 100) if total_lectures else 0
+
+    if course_progress >= 100:
+        if enrollment.status != 'completed':
+            enrollment.status = 'completed'
+            enrollment.completed_at = datetime.utcnow()
+    elif enrollment.status != 'active' or enrollment.completed_at is not None:
+        enrollment.status = 'active'
+        enrollment.completed_at = None
+
+    return course_progress
+
+
+@progress_bp.route('/toggle', methods=['POST'])
+@retry_on_deadlock()
+def toggle_lecture_completion():
+    data = request.get_json()
+    
+    enrollment, error = resolve_enrollment(data)
+    if error:
+        return error
+    enrollment_id = enrollment.id
     
     if 'lecture_resource_id' not in data:
         return jsonify({'success': False, 'error': 'lecture_resource_id is required'}), 400
@@ -80,7 +227,42 @@ def toggle_lecture_completion():
         lecture_resource_id=lecture_resource.id,
         status='active'
     ).first()
+    
+    if not progress and db.session.query(CourseModule.id).filter(
+        CourseModule.id == lecture_resource.lecture_id,
+        CourseModule.course_id == enrollment.course_id
+    ).first():
+        # Enrollment's rows not materialized yet by the background job; do it now
+        materialize_progress(enrollment.course_id, [enrollment_id])
+        progress = Progress.query.filter_by(
+            enrollment_id=enrollment_id,
+            lecture_resource_id=lecture_resource.id,
+            status='active'
+        ).first()
 
+    if progress and progress_buffer.enabled:
+        # Write-behind: queue the new state; the flusher writes it and the enrollment status
+        progress_id = progress.id
+        db.session.commit()  # rows materialized just now
+        
+        def stored_completed():
+            db.session.rollback()  # a fresh snapshot, which sees rows a flush committed meanwhile
+            return bool(db.session.query(Progress.completed).filter(Progress.id == progress_id).scalar())
+        
+        completed = progress_buffer.toggle(enrollment_id, lecture_resource.id, stored_completed)
+        
+        total_lectures, completed_lectures = count_progress_with_pending(enrollment_id)
+        return jsonify({
+            'success': True,
+            'message': 'Lecture marked as complete' if completed else 'Lecture marked as incomplete',
+            'progress': {
+                'lecture_resource_id': lecture_resource.id,
+                'completed': completed,
+                'course_progress': int((completed_lectures / total_lectures) * 100) if total_lectures else 0,
+                'enrollment_id': enrollment_id
+            }
+        }), 200
+    
     if progress:
         if progress.completed:
             progress.completed = False
@@ -92,19 +274,16 @@ def toggle_lecture_completion():
             message = 'Lecture marked as complete'
         
         db.session.add(progress)
+        record_activity(
+            enrollment.user_id, enrollment.course_id,
+            'lecture_completed' if progress.completed else 'lecture_reopened',
+            lecture_resource.id, progress.completed_at
+        )
     else:
         return jsonify({'success': False, 'error': 'Progress record not found'}), 404
 
-    total_lectures = Progress.query.filter_by(enrollment_id=enrollment_id, status='active').count()
-    completed_lectures = Progress.query.filter_by(enrollment_id=enrollment_id, completed=True, status='active').count()
-    course_progress = int((completed_lectures / total_lectures) * 100) if total_lectures else 0
-
-    if course_progress >= 100:
-        enrollment.status = 'completed'
-        enrollment.completed_at = datetime.utcnow()
-    else:
-        enrollment.status = 'active'
-        enrollment.completed_at = None
+    db.session.flush()
+    course_progress = update_enrollment_completion(enrollment, *count_progress(enrollment_id))
 
     db.session.commit()
 
@@ -120,15 +299,126 @@ def toggle_lecture_completion():
     }), 200
 
 
+@progress_bp.route('/batch', methods=['POST'])
+@retry_on_deadlock()
+def batch_update_progress():
+    """Apply many completion changes for one enrollment in a single transaction"""
+    data = request.get_json()
+    if not data:
+        return jsonify({'success': False, 'error': 'Request body is required'}), 400
+    
+    updates = data.get('updates')
+    if not isinstance(updates, list) or not updates:
+        return jsonify({'success': False, 'error': 'updates must be a non-empty list'}), 400
+    
+    if len(updates) > MAX_BATCH_SIZE:
+        return jsonify({
+            'success': False,
+            'error': f'At most {MAX_BATCH_SIZE} updates are allowed per batch'
+        }), 400
+    
+    # Later entries for the same resource win, as if they were sent one by one
+    states = {}
+    for item in updates:
+        if not isinstance(item, dict) or not isinstance(item.get('lecture_resource_id'), int) \
+                or not isinstance(item.get('completed'), bool):
+            return jsonify({
+                'success': False,
+                'error': 'Each update needs an integer lecture_resource_id and a boolean completed'
+            }), 400
+        states[item['lecture_resource_id']] = item['completed']
+    
+    enrollment, error = resolve_enrollment(data)
+    if error:
+        return error
+    
+    resource_ids = list(states.keys())
+    
+    def find_missing():
+        known_ids = {row.lecture_resource_id for row in db.session.query(Progress.lecture_resource_id).join(
+            LectureResource, Progress.lecture_resource_id == LectureResource.id
+        ).filter(
+            Progress.enrollment_id == enrollment.id,
+            Progress.lecture_resource_id.in_(resource_ids),
+            Progress.status == 'active',
+            LectureResource.status == 'active'
+        )}
+        return [rid for rid in resource_ids if rid not in known_ids]
+    
+    try:
+        # This batch supersedes any queued toggles for the same resources, once it commits
+        with progress_buffer.superseded_by(enrollment.id, set(resource_ids)):
+            missing = find_missing()
+            if missing:
+                # Rows may just not be materialized yet by the background job
+                materialize_progress(enrollment.course_id, [enrollment.id])
+                missing = find_missing()
+            if missing:
+                return jsonify({
+                    'success': False,
+                    'error': 'Progress record not found',
+                    'missing_lecture_resource_ids': missing
+                }), 404
+            
+            # Only actual changes are activity; re-sending the current state is not
+            before = dict(db.session.query(Progress.lecture_resource_id, Progress.completed).filter(
+                Progress.enrollment_id == enrollment.id,
+                Progress.lecture_resource_id.in_(resource_ids),
+                Progress.status == 'active'
+            ).all())
+            apply_progress_states(enrollment.id, states)
+            for resource_id, completed in states.items():
+                if bool(before.get(resource_id)) != completed:
+                    record_activity(
+                        enrollment.user_id, enrollment.course_id,
+                        'lecture_completed' if completed else 'lecture_reopened', resource_id
+                    )
+            course_progress = update_enrollment_completion(enrollment, *count_progress(enrollment.id))
+            
+            rows = db.session.query(
+                Progress.lecture_resource_id, Progress.completed, Progress.completed_at
+            ).filter(
+                Progress.enrollment_id == enrollment.id,
+                Progress.lecture_resource_id.in_(resource_ids),
+                Progress.status == 'active'
+            ).all()
+            
+            db.session.commit()
+    except Exception as e:
+        db.session.rollback()
+        if is_retryable(e):
+            raise
+        print(f"Error applying progress batch: {str(e)}")
+        return jsonify({'success': False, 'error': f'Failed to update progress: {str(e)}'}), 500
+    
+    return jsonify({
+        'success': True,
+        'message': f'{len(rows)} lectures updated',
+        'progress': {
+            'enrollment_id': enrollment.id,
+            'course_progress': course_progress,
+            'status': enrollment.status,
+            'lectures': [{
+                'lecture_resource_id': row.lecture_resource_id,
+                'completed': bool(row.completed),
+                'completed_at': row.completed_at.isoformat() if row.completed_at else None
+            } for row in rows]
+        }
+    }), 200
+
+
 @progress_bp.route('/course/<int:enrollment_id>', methods=['GET'])
 def get_course_progress(enrollment_id):
     enrollment = Enrollment.query.get(enrollment_id)
     if not enrollment or enrollment.status in ['deleted', 'dropped']:
         return jsonify({'success': False, 'error': 'Enrollment not found'}), 404
 
-    total_lectures = Progress.query.filter_by(enrollment_id=enrollment.id, status='active').count()
-    completed_lectures = Progress.query.filter_by(enrollment_id=enrollment.id, completed=True, status='active').count()
+    total_lectures, completed_lectures = count_progress_with_pending(enrollment.id)
     progress_percentage = int((completed_lectures / total_lectures) * 100) if total_lectures else 0
+    
+    status = enrollment.status
+    if progress_buffer.pending_for(enrollment.id):
+        status = 'completed' if progress_percentage >= 100 else 'active'
 
     return jsonify({
         'success': True,
@@ -137,13 +427,28 @@ def get_course_progress(enrollment_id):
             'course_id': enrollment.course_id,
             'user_id': enrollment.user_id,
             'progress_percentage': progress_percentage,
-            'status': enrollment.status
+            'status': status
         }
     }), 200
 
 
 @progress_bp.route('/completed/<int:enrollment_id>', methods=['GET'])
 def get_completed_lectures(enrollment_id):
+    """Completed lectures of an enrollment, from one join.
+
+    With ?since=<synced_at from a previous response> only rows changed since then
+    are returned, plus the IDs of lectures that are no longer complete, including
+    lectures whose resource or module was removed. synced_at trails the clock by
+    PROGRESS_SYNC_SETTLE_SECONDS, so consecutive syncs overlap and some rows come
+    back again; clients apply them idempotently.
+    """
+    since = request.args.get('since')
+    if since:
+        try:
+            since = datetime.fromisoformat(since)
+        except ValueError:
+            return jsonify({'success': False, 'error': 'since must be an ISO 8601 timestamp'}), 400
+    
     enrollment = Enrollment.query.get(enrollment_id)
     if not enrollment:
         return jsonify({
@@ -159,17 +464,73 @@ def get_completed_lectures(enrollment_id):
             'completed_lectures': []
         }), 200
 
-    completed = Progress.query.filter_by(enrollment_id=enrollment.id, completed=True, status='active').all()
+    # updated_at is stamped before the write commits and may be truncated to whole seconds, so a
+    # row can become visible with a timestamp older than a cursor handed out meanwhile. A cursor
+    # from the past makes the next sync read such rows again.
+    synced_at = datetime.utcnow() - timedelta(seconds=current_app.config.get('PROGRESS_SYNC_SETTLE_SECONDS', 5))
+    pending = progress_buffer.pending_for(enrollment.id)
+    
+    if since:
+        catalog_changes = select(CatalogChange.entity_id).where(
+            CatalogChange.course_id == enrollment.course_id,
+            CatalogChange.created_at >= since
+        )
+        changed = (
+            (Progress.updated_at >= since)
+            # Resources or modules removed (or restored) since; their rows themselves are unchanged
+            | Progress.lecture_resource_id.in_(catalog_changes.where(CatalogChange.entity_type == 'lecture_resource'))
+            | LectureResource.lecture_id.in_(catalog_changes.where(CatalogChange.entity_type == 'module'))
+        )
+    else:
+        changed = (Progress.completed == True) & (Progress.status == 'active') & \
+            (LectureResource.status == 'active') & (CourseModule.status == 'active')
+    if pending:
+        changed = changed | Progress.lecture_resource_id.in_(list(pending.keys()))
+    
+    rows = db.session.query(
+        Progress.lecture_resource_id,
+        Progress.completed,
+        Progress.completed_at,
+        Progress.status,
+        LectureResource.title,
+        LectureResource.resource_type,
+        LectureResource.status.label('resource_status'),
+        CourseModule.status.label('module_status')
+    ).join(
+        LectureResource, Progress.lecture_resource_id == LectureResource.id
+    ).join(
+        CourseModule, LectureResource.lecture_id == CourseModule.id
+    ).filter(
+        Progress.enrollment_id == enrollment.id,
+        changed
+    ).all()
+    
     completed_list = []
-    for p in completed:
-        lecture = LectureResource.query.get(p.lecture_resource_id)
-        if lecture:
+    removed_ids = []
+    for row in rows:
+        completed, completed_at = row.completed, row.completed_at
+        # Merge unflushed write-behind events so learners see their own toggles
+        if row.lecture_resource_id in pending:
+            pending_completed, pending_completed_at = pending[row.lecture_resource_id]
+            completed_at = (completed_at if completed else pending_completed_at) if pending_completed else None
+            completed = pending_completed
+        
+        if completed and row.status == 'active' and row.resource_status == 'active' and row.module_status == 'active':
             completed_list.append({
-                'lecture_resource_id': lecture.id,
-                'title': lecture.title,
-                'resource_type': lecture.resource_type,
-                'completed_at': p.completed_at.isoformat() if p.completed_at else None
+                'lecture_resource_id': row.lecture_resource_id,
+                'title': row.title,
+                'resource_type': row.resource_type,
+                'completed_at': completed_at.isoformat() if completed_at else None
             })
+        else:
+            removed_ids.append(row.lecture_resource_id)
 
-    return jsonify({'success': True, 'completed_lectures': completed_list}), 200
-
+    response = {
+        'success': True,
+        'completed_lectures': completed_list,
+        'synced_at': synced_at.isoformat()
+    }
+    if since:
+        response['since'] = since.isoformat()
+        response['removed_lecture_resource_ids'] = removed_ids
+    return jsonify(response), 200
@@ -1,10 +1,15 @@
 from flask import Blueprint, jsonify, request
-from database import db
+from database import db, upsert, upsert_created, retry_on_deadlock
 from models import Rating
+from services.rankings import refresh_ratings
+from services.activity import record_activity
+from services.read_cache import invalidate_reads
+from datetime import datetime
 
 ratings_bp = Blueprint('ratings', __name__, url_prefix='/ratings')
 
 @ratings_bp.route('/', methods=['POST'])
+@retry_on_deadlock()
 def create_rating():
     data = request.get_json()
     
@@ -21,31 +26,34 @@ def create_rating():
             'error': 'Rating must be between 1 and 5'
         }), 400
     
-    existing_rating = Rating.query.filter_by(user_id=data['user_id'], course_id=data['course_id']).first()
+    # One upsert on unique_user_course_rating, so concurrent submits cannot race;
+    # a deleted rating is revived
+    now = datetime.utcnow()
+    result = upsert(Rating, [{
+        'course_id': data['course_id'],
+        'user_id': data['user_id'],
+        'rating': rating_value,
+        'status': 'active',
+        'created_at': now
+    }], ['user_id', 'course_id'], ['rating', 'status'])
+    refresh_ratings(data['course_id'])
+    invalidate_reads(db.session, [data['course_id']])
+    record_activity(data['user_id'], data['course_id'], 'rated', at=now)
+    db.session.commit()
+    
+    rating = Rating.query.filter_by(user_id=data['user_id'], course_id=data['course_id']).first()
     
-    if existing_rating:
-        existing_rating.rating = rating_value
-        db.session.commit()
-        
+    if not upsert_created(result, rating, now):
         return jsonify({
             'success': True,
             'message': 'Rating updated successfully',
-            'rating': existing_rating.to_dict()
+            'rating': rating.to_dict()
         }), 200
     
-    new_rating = Rating(
-        course_id=data['course_id'],
-        user_id=data['user_id'],
-        rating=rating_value
-    )
-    
-    db.session.add(new_rating)
-    db.session.commit()
-    
     return jsonify({
         'success': True,
         'message': 'Rating created successfully',
-        'rating': new_rating.to_dict()
+        'rating': rating.to_dict()
     }), 201
 
 @ratings_bp.route('/user/<int:user_id>', methods=['GET'])
@@ -115,6 +123,7 @@ def delete_rating(rating_id):
         }), 404
     
     rating.status = 'deleted'
+    refresh_ratings(rating.course_id)
     db.session.commit()
     
     return jsonify({
@@ -1,10 +1,14 @@
 from flask import Blueprint, jsonify, request
-from database import db
+from database import db, upsert, upsert_created, retry_on_deadlock
 from models import Review, User, Course
+from services.activity import record_activity
+from services.read_cache import invalidate_reads
+from datetime import datetime
 
 reviews_bp = Blueprint('reviews', __name__, url_prefix='/reviews')
 
 @reviews_bp.route('/', methods=['POST'])
+@retry_on_deadlock()
 def create_review():
     data = request.get_json()
     
@@ -35,37 +39,33 @@ def create_review():
             'error': 'Instructors cannot submit reviews'
         }), 403
     
-    existing_review = Review.query.filter_by(
-        course_id=data['course_id'],
-        user_id=data['user_id'],
-        status='active'
-    ).first()
-    
-    if existing_review:
-        existing_review.comment = data['comment']
-        from datetime import datetime
-        existing_review.updated_at = datetime.utcnow()
-        db.session.commit()
-        
+    # One upsert on unique_user_course_review; a deleted review is revived
+    now = datetime.utcnow()
+    result = upsert(Review, [{
+        'course_id': data['course_id'],
+        'user_id': data['user_id'],
+        'comment': data['comment'],
+        'status': 'active',
+        'created_at': now,
+        'updated_at': now
+    }], ['user_id', 'course_id'], ['comment', 'status', 'updated_at'])
+    record_activity(data['user_id'], data['course_id'], 'reviewed', at=now)
+    invalidate_reads(db.session, [data['course_id']])
+    db.session.commit()
+    
+    review = Review.query.filter_by(course_id=data['course_id'], user_id=data['user_id']).first()
+    
+    if not upsert_created(result, review, now):
         return jsonify({
             'success': True,
             'message': 'Review updated successfully',
-            'review': existing_review.to_dict(include_user=True)
+            'review': review.to_dict(include_user=True)
         }), 200
     
-    new_review = Review(
-        course_id=data['course_id'],
-        user_id=data['user_id'],
-        comment=data['comment']
-    )
-    
-    db.session.add(new_review)
-    db.session.commit()
-    
     return jsonify({
         'success': True,
         'message': 'Review created successfully',
-        'review': new_review.to_dict(include_user=True)
+        'review': review.to_dict(include_user=True)
     }), 201
 
 
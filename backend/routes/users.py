@@ -1,4 +1,4 @@
-from flask import Blueprint, jsonify, request
+from flask import Blueprint, jsonify, request, g
 from models import User
 from database import db
 from middleware.auth import require_owner
@@ -60,12 +60,11 @@ def login():
 @users_bp.route('/', methods=['GET'])
 def get_all_users():
     # Check if request is from admin with status filter
-    admin_id = request.headers.get('X-User-Id')
+    principal = g.principal
     status_filter = request.args.get('status')
     
-    if status_filter and admin_id:
-        admin = User.query.get(int(admin_id))
-        if admin and admin.role == 'admin':
+    if status_filter and principal:
+        if principal.role == 'admin':
             if status_filter == 'all':
                 users = User.query.all()
             else:
@@ -104,7 +103,7 @@ def delete_user(user_id):
     if not requester_id:
         return jsonify({'success': False, 'error': 'Authentication required'}), 401
     
-    requester = User.query.get(int(requester_id))
+    requester = g.principal
     if not requester:
         return jsonify({'success': False, 'error': 'Requester not found'}), 404
     
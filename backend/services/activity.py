@@ -0,0 +1,261 @@
+from collections import Counter, defaultdict
+from datetime import date, datetime, timedelta
+
+from flask import current_app
+from sqlalchemy import delete, event, func, insert
+from sqlalchemy.exc import IntegrityError
+from sqlalchemy.orm import Session
+
+from database import db, upsert
+from models import ActivityEvent, ActivityRollupRun, CourseActivityDay, UserActivityDay
+from services.jobs import enqueue, job_handler
+
+# Stored as small integers to keep activity_events rows narrow; never renumber
+EVENT_TYPES = {
+    'lecture_completed': 1,
+    'lecture_reopened': 2,
+    'enrolled': 3,
+    'unenrolled': 4,
+    'reviewed': 5,
+    'rated': 6
+}
+
+# Rollup counter fed by each event type, besides the total in 'events'
+EVENT_COUNTERS = {
+    EVENT_TYPES['lecture_completed']: 'lectures_completed',
+    EVENT_TYPES['enrolled']: 'enrollments',
+    EVENT_TYPES['reviewed']: 'reviews',
+    EVENT_TYPES['rated']: 'reviews'
+}
+COUNTER_COLUMNS = ('events', 'lectures_completed', 'enrollments', 'reviews')
+
+
+def record_activity(user_id, course_id, event_type, object_id=None, at=None):
+    """Queue an activity event on the current session.
+
+    Events are inserted just before the transaction commits, all of them in one
+    multi-row INSERT, and are dropped if it rolls back.
+    """
+    db.session.info.setdefault('activity_events', []).append({
+        'occurred_at': at or datetime.utcnow(),
+        'user_id': user_id,
+        'course_id': course_id,
+        'event_type': EVENT_TYPES[event_type],
+        'object_id': object_id
+    })
+
+
+def write_activity_events(session):
+    """before_commit hook: insert the events queued by record_activity"""
+    rows = session.info.pop('activity_events', None)
+    if not rows:
+        return
+    chunk_size = current_app.config.get('BULK_CHUNK_SIZE', 500)
+    for start in range(0, len(rows), chunk_size):
+        session.execute(insert(ActivityEvent), rows[start:start + chunk_size])
+
+
+def discard_activity_events(session):
+    session.info.pop('activity_events', None)
+
+
+def as_date(value):
+    """func.date() result as a date; SQLite returns it as text"""
+    return value if isinstance(value, date) else date.fromisoformat(str(value))
+
+
+def latest_run():
+    return ActivityRollupRun.query.order_by(ActivityRollupRun.id.desc()).first()
+
+
+@job_handler('rollup_activity')
+def rollup_activity(payload):
+    """Fold new activity events into the per-day learner and course rollups.
+
+    Each run continues after the previous run's last event, and stops at the
+    newest id the previous run saw. Events are inserted by a transaction's last
+    statements (write_activity_events), so this assumes no COMMIT takes longer
+    than ACTIVITY_ROLLUP_SETTLE_SECONDS: a run starting sooner after the
+    previous one re-queues itself for later, and an event whose commit stalls
+    past that is skipped. Counters are added with incrementing upserts; active
+    learners, which are not additive, are recounted for the course days that
+    were touched.
+
+    The first run has no earlier observation to stop at; it only records the
+    newest id and queues the next run for once that id has settled.
+
+    Runs can overlap (an admin trigger, the periodic re-queue, a job put back
+    after JOB_LOCK_TIMEOUT). A run first inserts its own row continuing from
+    the previous one; previous_run_id is unique, so a second run from the same
+    checkpoint waits for the first and gives up before counting anything.
+    """
+    config = current_app.config
+    started_at = datetime.utcnow()
+    settle = timedelta(seconds=config.get('ACTIVITY_ROLLUP_SETTLE_SECONDS', 5))
+    previous = latest_run()
+    # A batch-limited run's continuation stops at an older observation, which has settled
+    if previous and previous.started_at > started_at - settle and payload.get('after_run') != previous.id:
+        queue_rollup(delay=(previous.started_at + settle - started_at).total_seconds())
+        return
+    run = ActivityRollupRun(previous_run_id=previous.id if previous else 0, started_at=started_at)
+    try:
+        with db.session.begin_nested():
+            db.session.add(run)
+    except IntegrityError:
+        print(f"Skipping activity rollup: run {run.previous_run_id} was already continued")
+        return
+
+    after = previous.last_event_id if previous else 0
+    settled = previous.observed_event_id if previous else 0
+    upto = max(after, min(settled, after + config.get('ACTIVITY_ROLLUP_BATCH', 100000)))
+    observed = db.session.query(func.max(ActivityEvent.id)).scalar() or 0
+
+    learner_days = defaultdict(Counter)
+    if upto > after:
+        day = func.date(ActivityEvent.occurred_at)
+        for user_id, course_id, event_day, event_type, count in db.session.query(
+            ActivityEvent.user_id, ActivityEvent.course_id, day, ActivityEvent.event_type, func.count()
+        ).filter(
+            ActivityEvent.id > after,
+            ActivityEvent.id <= upto
+        ).group_by(ActivityEvent.user_id, ActivityEvent.course_id, day, ActivityEvent.event_type):
+            counters = learner_days[(user_id, course_id, as_date(event_day))]
+            counters['events'] += count
+            if event_type in EVENT_COUNTERS:
+                counters[EVENT_COUNTERS[event_type]] += count
+
+    chunk_size = config.get('BULK_CHUNK_SIZE', 500)
+    rows = [
+        {'user_id': user_id, 'course_id': course_id, 'day': day,
+         **{column: counters[column] for column in COUNTER_COLUMNS}}
+        for (user_id, course_id, day), counters in learner_days.items()
+    ]
+    for start in range(0, len(rows), chunk_size):
+        upsert(UserActivityDay, rows[start:start + chunk_size], ['user_id', 'day', 'course_id'], [], COUNTER_COLUMNS)
+
+    course_days = defaultdict(Counter)
+    for (_, course_id, day), counters in learner_days.items():
+        course_days[(course_id, day)].update(counters)
+
+    active_learners = {}
+    course_ids = sorted({course_id for course_id, _ in course_days})
+    days = sorted({day for _, day in course_days})
+    for start in range(0, len(course_ids), chunk_size):
+        for course_id, day, count in db.session.query(
+            UserActivityDay.course_id, UserActivityDay.day, func.count()
+        ).filter(
+            UserActivityDay.course_id.in_(course_ids[start:start + chunk_size]),
+            UserActivityDay.day.in_(days)
+        ).group_by(UserActivityDay.course_id, UserActivityDay.day):
+            active_learners[(course_id, as_date(day))] = count
+
+    rows = [
+        {'course_id': course_id, 'day': day, 'active_learners': active_learners.get((course_id, day), 0),
+         **{column: counters[column] for column in COUNTER_COLUMNS}}
+        for (course_id, day), counters in course_days.items()
+    ]
+    for start in range(0, len(rows), chunk_size):
+        upsert(CourseActivityDay, rows[start:start + chunk_size], ['course_id', 'day'], ['active_learners'],
+               COUNTER_COLUMNS)
+
+    db.session.execute(delete(ActivityRollupRun).where(
+        ActivityRollupRun.started_at < started_at - timedelta(days=1),
+        ActivityRollupRun.id != run.id
+    ))
+    run.finished_at = datetime.utcnow()
+    run.last_event_id = upto
+    run.events = sum(counters['events'] for counters in learner_days.values())
+
+    # This job is still 'running', so re-queue without schedule_rollup's check
+    if upto < settled:
+        # More settled events than one batch: continue right away, up to the same observation
+        run.observed_event_id = settled
+        queue_rollup(payload={'after_run': run.id})
+    else:
+        run.observed_event_id = max(observed, upto)
+        if previous is None:
+            queue_rollup(delay=settle.total_seconds())
+        elif config.get('ACTIVITY_ROLLUP_INTERVAL', 0):
+            queue_rollup(delay=config['ACTIVITY_ROLLUP_INTERVAL'])
+
+
+def queue_rollup(delay=0, statuses=('pending',), payload=None):
+    """Queue a rollup run unless a rollup job in one of statuses exists"""
+    from models import BackgroundJob
+    if BackgroundJob.query.filter(
+        BackgroundJob.job_type == 'rollup_activity',
+        BackgroundJob.status.in_(statuses)
+    ).first():
+        return None
+    return enqueue('rollup_activity', payload or {}, delay=delay)
+
+
+def schedule_rollup(delay=0):
+    """Queue a rollup run unless one is already waiting or running"""
+    return queue_rollup(delay, statuses=('pending', 'running'))
+
+
+def schedule_if_stale():
+    """Start the periodic rollup when no run finished recently (first use, or the chain broke)"""
+    interval = current_app.config.get('ACTIVITY_ROLLUP_INTERVAL', 0)
+    if not interval:
+        return None
+    latest = db.session.query(func.max(ActivityRollupRun.finished_at)).scalar()
+    if latest and latest > datetime.utcnow() - timedelta(seconds=interval * 2):
+        return None
+    return schedule_rollup()
+
+
+def streaks(days, today):
+    """(current, longest) runs of consecutive active days. The current streak
+    still counts when the last active day was yesterday."""
+    current = longest = 0
+    previous = None
+    for day in sorted(set(days)):
+        current = current + 1 if previous and day - previous == timedelta(days=1) else 1
+        longest = max(longest, current)
+        previous = day
+    if previous is None or (today - previous).days > 1:
+        current = 0
+    return current, longest
+
+
+def user_activity(user_id, since):
+    """Per-day activity of a learner across their courses, oldest first"""
+    return [{
+        'date': as_date(day).isoformat(),
+        'events': int(events),
+        'lectures_completed': int(lectures_completed),
+        'enrollments': int(enrollments),
+        'reviews': int(reviews)
+    } for day, events, lectures_completed, enrollments, reviews in db.session.query(
+        UserActivityDay.day,
+        func.sum(UserActivityDay.events),
+        func.sum(UserActivityDay.lectures_completed),
+        func.sum(UserActivityDay.enrollments),
+        func.sum(UserActivityDay.reviews)
+    ).filter(
+        UserActivityDay.user_id == user_id,
+        UserActivityDay.day >= since
+    ).group_by(UserActivityDay.day).order_by(UserActivityDay.day)]
+
+
+def course_activity(course_id, since):
+    """Per-day activity of a course, oldest first"""
+    return [{
+        'date': as_date(row.day).isoformat(),
+        'active_learners': row.active_learners,
+        'events': row.events,
+        'lectures_completed': row.lectures_completed,
+        'enrollments': row.enrollments,
+        'reviews': row.reviews
+    } for row in CourseActivityDay.query.filter(
+        CourseActivityDay.course_id == course_id,
+        CourseActivityDay.day >= since
+    ).order_by(CourseActivityDay.day)]
+
+
+def init_activity(app):
+    if not event.contains(Session, 'before_commit', write_activity_events):
+        event.listen(Session, 'before_commit', write_activity_events)
+        event.listen(Session, 'after_rollback', discard_activity_events)
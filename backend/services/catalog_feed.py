@@ -0,0 +1,101 @@
+from datetime import datetime
+
+from sqlalchemy import event, insert, inspect, select
+from sqlalchemy.orm import Session
+
+from models import CatalogChange, Course, CourseModule, LectureResource
+
+ENTITY_TYPES = {
+    Course: 'course',
+    CourseModule: 'module',
+    LectureResource: 'lecture_resource'
+}
+
+
+def _status_action(obj):
+    """Classify a dirty catalog object by its status transition, or None if nothing changed"""
+    history = inspect(obj).attrs.status.history
+    if history.has_changes():
+        old = history.deleted[0] if history.deleted else None
+        if obj.status == 'deleted':
+            return 'delete'
+        if isinstance(obj, Course) and obj.status == 'active' and old != 'active':
+            return 'publish'
+        if isinstance(obj, Course) and old == 'active':
+            return 'unpublish'
+    return 'update'
+
+
+def record_changes(session, changes):
+    """Queue (entity_type, entity_id, course_id, action) tuples for the change log of this transaction"""
+    session.info.setdefault('catalog_changes', []).extend(changes)
+
+
+def write_catalog_changes(session):
+    """before_commit hook: insert the queued changes as the transaction's last statements.
+
+    The cursor is the autoincrement id, so ids are allocated only now rather
+    than at the first flush: a long transaction (a course import) cannot hold
+    a low id while later ones commit higher ids. What is left is the moment
+    between this insert and the COMMIT, which CHANGE_FEED_SETTLE_SECONDS covers.
+    """
+    session.flush()  # capture_catalog_changes sees the final flush too
+    changes = session.info.pop('catalog_changes', None)
+    if not changes:
+        return
+    now = datetime.utcnow()
+    session.execute(insert(CatalogChange), [{
+        'entity_type': entity_type,
+        'entity_id': entity_id,
+        'course_id': course_id,
+        'action': action,
+        'created_at': now
+    } for entity_type, entity_id, course_id, action in changes])
+
+
+def discard_catalog_changes(session):
+    session.info.pop('catalog_changes', None)
+
+
+def capture_catalog_changes(session, flush_context):
+    """Queue ORM writes to courses, modules and lecture resources for the change log"""
+    pending = []
+    for obj in session.new:
+        if type(obj) in ENTITY_TYPES:
+            pending.append((obj, 'create'))
+    for obj in session.dirty:
+        if type(obj) in ENTITY_TYPES and session.is_modified(obj, include_collections=False):
+            pending.append((obj, _status_action(obj)))
+    for obj in session.deleted:
+        if type(obj) in ENTITY_TYPES:
+            pending.append((obj, 'delete'))
+    if not pending:
+        return
+    
+    connection = session.connection()
+    
+    lecture_ids = {obj.lecture_id for obj, _ in pending if isinstance(obj, LectureResource)}
+    module_courses = {}
+    if lecture_ids:
+        module_courses = dict(connection.execute(
+            select(CourseModule.id, CourseModule.course_id).where(CourseModule.id.in_(lecture_ids))
+        ).all())
+    
+    changes = []
+    for obj, action in pending:
+        if isinstance(obj, Course):
+            course_id = obj.id
+        elif isinstance(obj, CourseModule):
+            course_id = obj.course_id
+        else:
+            course_id = module_courses.get(obj.lecture_id)
+        changes.append((ENTITY_TYPES[type(obj)], obj.id, course_id, action))
+    
+    record_changes(session, changes)
+
+
+def init_catalog_feed(app):
+    if not event.contains(Session, 'after_flush', capture_catalog_changes):
+        event.listen(Session, 'after_flush', capture_catalog_changes)
+        event.listen(Session, 'before_commit', write_catalog_changes)
+        event.listen(Session, 'after_rollback', discard_catalog_changes)
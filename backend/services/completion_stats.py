@@ -0,0 +1,323 @@
+import json
+from datetime import datetime, timedelta
+
+from flask import current_app
+from sqlalchemy import Integer, case, cast, delete, func, literal_column, select
+
+from database import db, upsert
+from models import (
+    CourseCompletionStats, CourseModule, CourseRanking, Enrollment, LectureCompletionStats,
+    LectureResource, ModuleCompletionStats, Progress
+)
+from services.jobs import enqueue, job_handler
+
+COUNTED_STATUSES = ('active', 'completed')
+
+
+def elapsed_seconds(dialect, start, end):
+    """Whole seconds from start to end as a SQL expression"""
+    if dialect == 'mysql':
+        return func.timestampdiff(literal_column('SECOND'), start, end)
+    if dialect == 'postgresql':
+        return cast(func.extract('epoch', end - start), Integer)
+    return cast(func.round((func.julianday(end) - func.julianday(start)) * 86400), Integer)
+
+
+def median_statement(values):
+    """(key, count, median) per key of a (key, value) subquery, in one pass with window functions.
+
+    Rows are numbered within their key by value; the median is the average of
+    the one or two rows with 2 * position in [count, count + 2].
+    """
+    ranked = select(
+        values.c.key,
+        values.c.value,
+        func.row_number().over(partition_by=values.c.key, order_by=values.c.value).label('position'),
+        func.count().over(partition_by=values.c.key).label('total')
+    ).subquery()
+    middle = (ranked.c.position * 2 >= ranked.c.total) & (ranked.c.position * 2 <= ranked.c.total + 2)
+    return select(
+        ranked.c.key, func.max(ranked.c.total), func.avg(case((middle, ranked.c.value)))
+    ).group_by(ranked.c.key)
+
+
+def completions(course_id, *columns):
+    """Select of columns over the completed, active progress rows of a course's current learners"""
+    return select(*columns).select_from(Progress).join(
+        Enrollment, Progress.enrollment_id == Enrollment.id
+    ).join(
+        LectureResource, Progress.lecture_resource_id == LectureResource.id
+    ).join(
+        CourseModule, LectureResource.lecture_id == CourseModule.id
+    ).where(
+        Enrollment.course_id == course_id,
+        Enrollment.status.in_(COUNTED_STATUSES),
+        Progress.completed == True,
+        Progress.completed_at.isnot(None),
+        Progress.status == 'active',
+        LectureResource.status == 'active',
+        CourseModule.status == 'active'
+    )
+
+
+def compute_course_stats(course_id):
+    """Funnel numbers of one course from grouped queries; no progress rows are loaded.
+
+    Returns (learners, completed, {module_id: (started, completed, median)},
+    {lecture_resource_id: (module_id, completed, median)}).
+    """
+    seconds = elapsed_seconds(db.session.get_bind().dialect.name, Enrollment.enrolled_at, Progress.completed_at)
+    # Completions dated before a re-enrollment count as immediate
+    seconds = case((seconds < 0, 0), else_=seconds)
+
+    learners, completed = db.session.query(
+        func.count(Enrollment.id),
+        func.coalesce(func.sum(case((Enrollment.status == 'completed', 1), else_=0)), 0)
+    ).filter(
+        Enrollment.course_id == course_id,
+        Enrollment.status.in_(COUNTED_STATUSES)
+    ).one()
+
+    outline = db.session.query(LectureResource.id, LectureResource.lecture_id).join(
+        CourseModule, LectureResource.lecture_id == CourseModule.id
+    ).filter(
+        CourseModule.course_id == course_id,
+        LectureResource.status == 'active',
+        CourseModule.status == 'active'
+    ).all()
+    module_sizes = {}
+    for _, module_id in outline:
+        module_sizes[module_id] = module_sizes.get(module_id, 0) + 1
+
+    per_resource = {
+        resource_id: (count, median)
+        for resource_id, count, median in db.session.execute(median_statement(completions(
+            course_id, Progress.lecture_resource_id.label('key'), seconds.label('value')
+        ).subquery()))
+    }
+
+    # One row per (module, learner): resources done and when the last of them was
+    per_learner = completions(
+        course_id,
+        LectureResource.lecture_id.label('module_id'),
+        func.count(Progress.id).label('done'),
+        func.max(seconds).label('last')
+    ).group_by(LectureResource.lecture_id, Progress.enrollment_id).subquery()
+    sizes = select(
+        LectureResource.lecture_id.label('module_id'), func.count(LectureResource.id).label('size')
+    ).join(
+        CourseModule, LectureResource.lecture_id == CourseModule.id
+    ).where(
+        CourseModule.course_id == course_id,
+        LectureResource.status == 'active',
+        CourseModule.status == 'active'
+    ).group_by(LectureResource.lecture_id).subquery()
+
+    started = dict(db.session.execute(
+        select(per_learner.c.module_id, func.count()).group_by(per_learner.c.module_id)
+    ).all())
+    finished = {
+        module_id: (count, median)
+        for module_id, count, median in db.session.execute(median_statement(select(
+            per_learner.c.module_id.label('key'), per_learner.c.last.label('value')
+        ).join(
+            sizes, sizes.c.module_id == per_learner.c.module_id
+        ).where(per_learner.c.done >= sizes.c.size).subquery()))
+    }
+
+    def seconds_or_none(median):
+        return int(round(float(median))) if median is not None else None
+
+    modules = {
+        module_id: (
+            started.get(module_id, 0),
+            finished.get(module_id, (0, None))[0],
+            seconds_or_none(finished.get(module_id, (0, None))[1])
+        ) for module_id in module_sizes
+    }
+    resources = {
+        resource_id: (
+            module_id,
+            per_resource.get(resource_id, (0, None))[0],
+            seconds_or_none(per_resource.get(resource_id, (0, None))[1])
+        ) for resource_id, module_id in outline
+    }
+    return learners, int(completed), modules, resources
+
+
+def refresh_course(course_id, computed_at=None):
+    """Rewrite one course's rollup rows. Upserts, so concurrent refreshes of a course are harmless."""
+    computed_at = computed_at or datetime.utcnow()
+    learners, completed, modules, resources = compute_course_stats(course_id)
+
+    db.session.execute(delete(ModuleCompletionStats).where(
+        ModuleCompletionStats.course_id == course_id,
+        ModuleCompletionStats.module_id.notin_(list(modules))
+    ))
+    db.session.execute(delete(LectureCompletionStats).where(
+        LectureCompletionStats.course_id == course_id,
+        LectureCompletionStats.lecture_resource_id.notin_(list(resources))
+    ))
+
+    chunk_size = current_app.config.get('BULK_CHUNK_SIZE', 500)
+    module_rows = [{
+        'module_id': module_id,
+        'course_id': course_id,
+        'started_count': started,
+        'completed_count': finished,
+        'median_seconds': median,
+        'computed_at': computed_at
+    } for module_id, (started, finished, median) in modules.items()]
+    resource_rows = [{
+        'lecture_resource_id': resource_id,
+        'course_id': course_id,
+        'module_id': module_id,
+        'completed_count': finished,
+        'median_seconds': median,
+        'computed_at': computed_at
+    } for resource_id, (module_id, finished, median) in resources.items()]
+    for model, key, rows in ((ModuleCompletionStats, 'module_id', module_rows),
+                             (LectureCompletionStats, 'lecture_resource_id', resource_rows)):
+        columns = [column for column in rows[0] if column != key] if rows else []
+        for start in range(0, len(rows), chunk_size):
+            upsert(model, rows[start:start + chunk_size], [key], columns)
+
+    upsert(CourseCompletionStats, [{
+        'course_id': course_id,
+        'learners': learners,
+        'completed_count': completed,
+        'computed_at': computed_at
+    }], ['course_id'], ['learners', 'completed_count', 'computed_at'])
+
+
+def changed_courses(since):
+    """Courses with progress written or enrollments changed after since"""
+    progress = db.session.query(Enrollment.course_id).join(
+        Progress, Progress.enrollment_id == Enrollment.id
+    ).filter(Progress.updated_at >= since).distinct()
+    enrollments = db.session.query(CourseRanking.course_id).filter(CourseRanking.enrollments_changed_at >= since)
+    return {row.course_id for row in progress} | {row.course_id for row in enrollments}
+
+
+@job_handler('refresh_completion_stats')
+def refresh_completion_stats(payload):
+    """Refresh the completion funnel rollups.
+
+    An incremental run only recomputes courses with progress or enrollment
+    writes since the newest rollup row; a full run (or the first one)
+    recomputes every course with learners. Outline edits alone do not mark a
+    course changed; its next progress write or a full run picks them up. A
+    course_id payload computes a single course on its first view.
+    """
+    config = current_app.config
+    if payload.get('course_id'):
+        refresh_first_view(payload['course_id'])
+        return
+    started_at = datetime.utcnow()
+    last_run = db.session.query(func.max(CourseCompletionStats.computed_at)).scalar()
+
+    if payload.get('full') or last_run is None:
+        course_ids = {row.course_id for row in db.session.query(Enrollment.course_id).filter(
+            Enrollment.status.in_(COUNTED_STATUSES)
+        ).distinct()}
+    else:
+        # Overlap with the previous run so writes committed while it ran are not missed
+        course_ids = changed_courses(last_run - timedelta(seconds=config.get('COMPLETION_STATS_SETTLE_SECONDS', 60)))
+
+    for course_id in sorted(course_ids):
+        refresh_course(course_id, started_at)
+
+    interval = config.get('COMPLETION_STATS_REFRESH_INTERVAL', 0)
+    if interval:
+        schedule_refresh(delay=interval)
+
+
+def refresh_first_view(course_id):
+    """Compute the rollups of a course that has none yet.
+
+    The newest computed_at is the incremental refresh's checkpoint, so the rows
+    are stamped no later than it; stamping them now would make the next run
+    skip other courses' writes made since the last periodic run.
+    """
+    last_run = db.session.query(func.max(CourseCompletionStats.computed_at)).scalar()
+    now = datetime.utcnow()
+    refresh_course(course_id, min(last_run, now) if last_run else now)
+
+
+def schedule_course_refresh(course_id):
+    """Queue refresh_first_view for a course unless it is already queued or running"""
+    from models import BackgroundJob
+    for (payload,) in db.session.query(BackgroundJob.payload).filter(
+        BackgroundJob.job_type == 'refresh_completion_stats',
+        BackgroundJob.status.in_(['pending', 'running'])
+    ):
+        if json.loads(payload).get('course_id') == course_id:
+            return None
+    return enqueue('refresh_completion_stats', {'course_id': course_id})
+
+
+def schedule_refresh(full=False, delay=0):
+    """Queue a rollup refresh. Periodic runs re-queue themselves, so an
+    incremental run is skipped while any run is already waiting."""
+    from models import BackgroundJob
+    if not full and BackgroundJob.query.filter(
+        BackgroundJob.job_type == 'refresh_completion_stats',
+        BackgroundJob.status == 'pending'
+    ).first():
+        return None
+    return enqueue('refresh_completion_stats', {'full': full}, delay=delay)
+
+
+def course_funnel(course_id):
+    """The stored funnel of a course, modules and resources in outline order; None if never computed"""
+    course = db.session.get(CourseCompletionStats, course_id)
+    if course is None:
+        return None
+
+    def rate(count):
+        return round(count / course.learners, 4) if course.learners else 0.0
+
+    resources = {}
+    for stats, title, resource_type, order in db.session.query(
+        LectureCompletionStats, LectureResource.title, LectureResource.resource_type, LectureResource.order
+    ).join(
+        LectureResource, LectureCompletionStats.lecture_resource_id == LectureResource.id
+    ).filter(
+        LectureCompletionStats.course_id == course_id
+    ).order_by(LectureResource.order, LectureResource.id):
+        resources.setdefault(stats.module_id, []).append({
+            'lecture_resource_id': stats.lecture_resource_id,
+            'title': title,
+            'resource_type': resource_type,
+            'order': order,
+            'completed_count': stats.completed_count,
+            'completion_rate': rate(stats.completed_count),
+            'median_seconds': stats.median_seconds
+        })
+
+    modules = [{
+        'module_id': stats.module_id,
+        'number': number,
+        'title': title,
+        'started_count': stats.started_count,
+        'start_rate': rate(stats.started_count),
+        'completed_count': stats.completed_count,
+        'completion_rate': rate(stats.completed_count),
+        'median_seconds': stats.median_seconds,
+        'resources': resources.get(stats.module_id, [])
+    } for stats, number, title in db.session.query(
+        ModuleCompletionStats, CourseModule.number, CourseModule.title
+    ).join(
+        CourseModule, ModuleCompletionStats.module_id == CourseModule.id
+    ).filter(
+        ModuleCompletionStats.course_id == course_id
+    ).order_by(CourseModule.number, CourseModule.id)]
+
+    return {
+        'course_id': course_id,
+        'learners': course.learners,
+        'completed_count': course.completed_count,
+        'completion_rate': rate(course.completed_count),
+        'computed_at': course.computed_at.isoformat(),
+        'modules': modules
+    }
@@ -0,0 +1,126 @@
+import threading
+import time
+from collections import Counter, OrderedDict
+
+from sqlalchemy import func, select
+
+from models import Course, Rating, User
+
+# "4.5 & up" style rating buckets, highest first
+RATING_BUCKETS = (4.5, 4.0, 3.5, 3.0)
+
+
+def normalize_query(q):
+    """The text query as it is matched and cached: trimmed, single-spaced, case-folded"""
+    return ' '.join((q or '').split()).casefold()
+
+
+def course_ratings():
+    """Subquery of (course_id, rating) with the average rating rounded as Course.to_dict shows it"""
+    return select(
+        Rating.course_id,
+        func.round(func.avg(Rating.rating), 1).label('rating')
+    ).where(Rating.status == 'active').group_by(Rating.course_id).subquery()
+
+
+def text_filter(q):
+    """Condition for the search text on title, description and instructor name (User must be joined)"""
+    pattern = f'%{q}%'
+    return Course.title.ilike(pattern) | Course.description.ilike(pattern) | User.name.ilike(pattern)
+
+
+def facet_statement(q):
+    """Every active course matching q, counted per (category, level, instructor, rating).
+
+    One grouped pass; the counts for any combination of filters are derived
+    from its rows by facets_from_rows, so the rows only depend on q. Rows keep
+    the rounded rating rather than its bucket, so a min_rating between bucket
+    boundaries filters the counts exactly as it filters the results.
+    """
+    ratings = course_ratings()
+    statement = select(
+        Course.category, Course.level, Course.instructor_id, User.name, ratings.c.rating, func.count(Course.id)
+    ).join(
+        User, Course.instructor_id == User.id
+    ).outerjoin(
+        ratings, ratings.c.course_id == Course.id
+    ).where(Course.status == 'active')
+    if q:
+        statement = statement.where(text_filter(q))
+    return statement.group_by(Course.category, Course.level, Course.instructor_id, User.name, ratings.c.rating)
+
+
+def facets_from_rows(rows, category='', level='', instructor_id=None, min_rating=None, instructor_limit=20):
+    """Counts per facet value. Each facet ignores its own filter, so the counts
+    show what choosing another value of that facet would return."""
+    categories, levels, instructors, ratings = Counter(), Counter(), Counter(), Counter()
+    names = {}
+
+    for row_category, row_level, row_instructor, name, rating, count in rows:
+        rating = float(rating) if rating is not None else None
+        matches = {
+            'category': not category or row_category == category,
+            'level': not level or row_level == level,
+            'instructor': instructor_id is None or row_instructor == instructor_id,
+            'rating': min_rating is None or (rating is not None and rating >= min_rating)
+        }
+
+        def others(facet):
+            return all(ok for other, ok in matches.items() if other != facet)
+
+        if others('category'):
+            categories[row_category] += count
+        if others('level'):
+            levels[row_level] += count
+        if others('instructor'):
+            instructors[row_instructor] += count
+            names[row_instructor] = name
+        if others('rating') and rating is not None:
+            for threshold in RATING_BUCKETS:
+                if rating >= threshold:
+                    ratings[threshold] += count
+
+    def ranked(counter):
+        return sorted(counter.items(), key=lambda item: (-item[1], str(item[0])))
+
+    return {
+        'category': [{'value': value, 'count': count} for value, count in ranked(categories) if value],
+        'level': [{'value': value, 'count': count} for value, count in ranked(levels) if value],
+        'instructor': [
+            {'value': value, 'label': names[value], 'count': count}
+            for value, count in ranked(instructors)[:instructor_limit]
+        ],
+        'rating': [{'value': threshold, 'count': ratings[threshold]} for threshold in RATING_BUCKETS]
+    }
+
+
+class FacetCache:
+    """Process-wide TTL cache of facet_statement rows keyed by normalized query"""
+
+    def __init__(self, max_entries=1024):
+        self._lock = threading.Lock()
+        self._entries = OrderedDict()
+        self._max_entries = max_entries
+
+    def get(self, q):
+        with self._lock:
+            entry = self._entries.get(q)
+            if entry and entry[0] > time.monotonic():
+                self._entries.move_to_end(q)
+                return entry[1]
+            self._entries.pop(q, None)
+            return None
+
+    def set(self, q, rows, ttl):
+        with self._lock:
+            self._entries[q] = (time.monotonic() + ttl, rows)
+            self._entries.move_to_end(q)
+            while len(self._entries) > self._max_entries:
+                self._entries.popitem(last=False)
+
+    def clear(self):
+        with self._lock:
+            self._entries.clear()
+
+
+facet_cache = FacetCache()
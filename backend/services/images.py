@@ -0,0 +1,264 @@
+import hashlib
+import http.client
+import io
+import ipaddress
+import json
+import re
+import socket
+import urllib.error
+import urllib.request
+from urllib.parse import urlparse
+
+from flask import current_app
+from sqlalchemy import event, inspect
+from sqlalchemy.orm import Session
+
+from database import db, upsert
+from models import Course, ImageSource, Profile
+from services.jobs import enqueue, job_handler
+from services.storage import get_storage
+
+try:
+    from PIL import Image, ImageOps
+except ImportError:  # Pillow is optional; without it no derivatives are generated
+    Image = None
+
+# (width, height) renditions per preset; every width is written as WebP, the largest also as JPEG
+IMAGE_PRESETS = {
+    'card': [(400, 225), (800, 450)],
+    'thumbnail': [(160, 90), (320, 180)],
+    'avatar': [(64, 64), (128, 128), (256, 256)]
+}
+
+SOURCE_PRESETS = {
+    Course: ('image', list(Course.IMAGE_PRESETS)),
+    Profile: ('profile_picture', list(Profile.IMAGE_PRESETS))
+}
+
+_LOCAL_MEDIA = re.compile(r'^/api/media/([0-9a-f]{64})$')
+
+# Remote answers worth another attempt; the job runner retries with backoff up to JOB_MAX_ATTEMPTS
+RETRYABLE_HTTP_STATUSES = {408, 429, 500, 502, 503, 504}
+
+
+class ImageSourceError(Exception):
+    """The source cannot be turned into derivatives; retrying will not help"""
+
+
+def is_public_address(address):
+    """False for private, loopback, link-local, reserved and other non-routable addresses"""
+    ip = ipaddress.ip_address(address)
+    if ip.version == 6 and ip.ipv4_mapped:
+        ip = ip.ipv4_mapped
+    return not (ip.is_private or ip.is_loopback or ip.is_link_local or ip.is_reserved
+                or ip.is_multicast or ip.is_unspecified)
+
+
+def check_remote_url(url):
+    """Raise ImageSourceError unless url is http(s) on an IMAGE_REMOTE_HOSTS host"""
+    parsed = urlparse(url)
+    allowed_hosts = current_app.config.get('IMAGE_REMOTE_HOSTS', [])
+    if parsed.scheme not in ('http', 'https') or parsed.hostname not in allowed_hosts:
+        raise ImageSourceError(f'Images from {parsed.hostname or url} are not processed')
+
+
+def connect_public(address, *args, **kwargs):
+    """socket.create_connection that refuses non-public peers.
+
+    The check runs on the address actually connected to, after DNS, so a
+    host name resolving (or re-resolving) to an internal address is caught.
+    """
+    sock = socket.create_connection(address, *args, **kwargs)
+    peer = sock.getpeername()[0]
+    if not is_public_address(peer):
+        sock.close()
+        raise ImageSourceError(f'{address[0]} resolves to the non-public address {peer}')
+    return sock
+
+
+class PublicHTTPConnection(http.client.HTTPConnection):
+    def __init__(self, *args, **kwargs):
+        super().__init__(*args, **kwargs)
+        self._create_connection = connect_public
+
+
+class PublicHTTPSConnection(http.client.HTTPSConnection):
+    def __init__(self, *args, **kwargs):
+        super().__init__(*args, **kwargs)
+        self._create_connection = connect_public
+
+
+class PublicHTTPHandler(urllib.request.HTTPHandler):
+    def http_open(self, req):
+        return self.do_open(PublicHTTPConnection, req)
+
+
+class PublicHTTPSHandler(urllib.request.HTTPSHandler):
+    def https_open(self, req):
+        return self.do_open(PublicHTTPSConnection, req, context=self._context)
+
+
+class AllowListRedirectHandler(urllib.request.HTTPRedirectHandler):
+    """Follow a redirect only to another allow-listed http(s) host"""
+
+    def redirect_request(self, req, fp, code, msg, headers, newurl):
+        try:
+            check_remote_url(newurl)
+        except ImageSourceError:
+            fp.close()
+            raise
+        return super().redirect_request(req, fp, code, msg, headers, newurl)
+
+
+# No environment proxies: the peer check must see the image host, not a proxy
+_opener = urllib.request.build_opener(
+    urllib.request.ProxyHandler({}), PublicHTTPHandler, PublicHTTPSHandler, AllowListRedirectHandler
+)
+
+
+def request_derivatives(session, url, presets):
+    """Queue derivative generation for an image URL.
+
+    Ready derivatives keep being served meanwhile; the job only re-encodes if
+    the source bytes changed or a preset is missing.
+    """
+    source = session.get(ImageSource, ImageSource.hash_url(url))
+    if source is None:
+        source = ImageSource(url_hash=ImageSource.hash_url(url), url=url)
+        session.add(source)
+    if source.status != 'ready':
+        source.status = 'pending'
+    enqueue('generate_image_derivatives', {'url': url, 'presets': presets})
+
+
+def queue_changed_images(session, flush_context, instances):
+    """before_flush hook: new or changed course images and profile pictures get derivatives"""
+    if Image is None:
+        return
+    with session.no_autoflush:
+        for obj in list(session.new) + list(session.dirty):
+            if type(obj) not in SOURCE_PRESETS:
+                continue
+            attribute, presets = SOURCE_PRESETS[type(obj)]
+            url = getattr(obj, attribute)
+            if not url or len(url) > 500:
+                continue
+            if obj in session.new or inspect(obj).attrs[attribute].history.has_changes():
+                request_derivatives(session, url, presets)
+
+
+def read_source(url):
+    """Bytes of an uploaded (/api/media/<sha256>) or allow-listed remote image.
+
+    Raises ImageSourceError for sources that will never work. Timeouts,
+    connection errors and RETRYABLE_HTTP_STATUSES propagate so the job is
+    retried.
+    """
+    max_bytes = current_app.config.get('IMAGE_MAX_SOURCE_BYTES', 20 * 1024 * 1024)
+
+    local = _LOCAL_MEDIA.match(url)
+    if local:
+        storage = get_storage()
+        if not storage.exists(local.group(1)):
+            raise ImageSourceError('Uploaded image not found')
+        with storage.open(local.group(1)) as source:
+            return source.read(max_bytes + 1)
+
+    check_remote_url(url)
+    request = urllib.request.Request(url, headers={'User-Agent': 'wpl-image-pipeline'})
+    try:
+        with _opener.open(request, timeout=current_app.config.get('IMAGE_FETCH_TIMEOUT', 10)) as response:
+            return response.read(max_bytes + 1)
+    except urllib.error.HTTPError as e:
+        if e.code in RETRYABLE_HTTP_STATUSES:
+            raise
+        raise ImageSourceError(f'Image request failed with HTTP {e.code}')
+
+
+def render_preset(image, source_sha256, preset, storage):
+    """Write the renditions of one preset that are not stored yet; returns the widths"""
+    quality = current_app.config.get('IMAGE_QUALITY', 80)
+    sizes = IMAGE_PRESETS[preset]
+    # Never upscale, except that the smallest rendition always exists
+    kept = [size for size in sizes if size[0] <= image.width] or sizes[:1]
+
+    for width, height in kept:
+        fallback = (width, height) == kept[-1]
+        names = {
+            'webp': ImageSource.derivative_name(source_sha256, preset, width, 'webp'),
+            'jpg': ImageSource.derivative_name(source_sha256, preset, width, 'jpg') if fallback else None
+        }
+        if all(storage.exists(name) for name in names.values() if name):
+            continue
+
+        rendition = ImageOps.fit(image, (width, height), Image.LANCZOS)
+        for extension, name in names.items():
+            if not name:
+                continue
+            buffer = io.BytesIO()
+            if extension == 'webp':
+                rendition.save(buffer, 'WEBP', quality=quality, method=4)
+            else:
+                flat = rendition
+                if rendition.mode == 'RGBA':
+                    flat = Image.new('RGB', rendition.size, (255, 255, 255))
+                    flat.paste(rendition, mask=rendition.getchannel('A'))
+                flat.save(buffer, 'JPEG', quality=quality, optimize=True, progressive=True)
+            storage.put(name, buffer.getvalue())
+
+    return [width for width, _ in kept]
+
+
+@job_handler('generate_image_derivatives')
+def generate_image_derivatives(payload):
+    """Render the requested presets. Nothing is re-encoded while the source bytes are unchanged."""
+    url = payload['url']
+    upsert(ImageSource, [{'url_hash': ImageSource.hash_url(url), 'url': url, 'status': 'pending'}], ['url_hash'], [])
+    source = db.session.get(ImageSource, ImageSource.hash_url(url))
+
+    try:
+        if Image is None:
+            raise ImageSourceError('Pillow is not installed')
+        data = read_source(url)
+        if len(data) > current_app.config.get('IMAGE_MAX_SOURCE_BYTES', 20 * 1024 * 1024):
+            raise ImageSourceError('Image is too large')
+        source_sha256 = hashlib.sha256(data).hexdigest()
+
+        variants = json.loads(source.variants) if source.variants and source.source_sha256 == source_sha256 else {}
+        presets = set(payload.get('presets', [])) | set(variants)
+
+        storage = get_storage()
+        try:
+            image = Image.open(io.BytesIO(data))
+            image = ImageOps.exif_transpose(image)
+            if image.mode not in ('RGB', 'RGBA'):
+                image = image.convert('RGBA' if 'A' in image.getbands() else 'RGB')
+            for preset in sorted(presets):
+                variants[preset] = render_preset(image, source_sha256, preset, storage)
+        except (OSError, Image.DecompressionBombError) as e:
+            raise ImageSourceError(f'Not a usable image: {e}')
+    except ImageSourceError as e:
+        # Permanent for this source; the job itself succeeds so it is not retried
+        source.status = 'failed'
+        source.error = str(e)[:2000]
+        return
+
+    # Another job for the same URL (other presets) may have finished meanwhile; merge, don't overwrite
+    db.session.refresh(source, with_for_update=True)
+    if source.variants and source.source_sha256 == source_sha256:
+        variants = dict(json.loads(source.variants), **variants)
+    source.source_sha256 = source_sha256
+    source.variants = json.dumps(variants, sort_keys=True)
+    source.status = 'ready'
+    source.error = None
+
+
+def init_image_pipeline(app):
+    """Generate derivatives whenever a course image or profile picture is set"""
+    if not app.config.get('IMAGE_DERIVATIVES'):
+        return
+    if Image is None:
+        app.logger.warning('IMAGE_DERIVATIVES is enabled but Pillow is not installed')
+        return
+    if not event.contains(Session, 'before_flush', queue_changed_images):
+        event.listen(Session, 'before_flush', queue_changed_images)
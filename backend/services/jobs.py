@@ -0,0 +1,225 @@
+import atexit
+import json
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+from datetime import datetime, timedelta
+
+from database import db
+
+HANDLERS = {}
+
+
+def job_handler(job_type):
+    """Register fn(payload) as the handler for a job type.
+
+    The handler runs inside an app context and must not commit; its writes are
+    committed together with the removal of the job row, so a crash mid-job
+    leaves the job pending. Handlers still need to be idempotent because a job
+    whose worker died is picked up again once its lock is JOB_LOCK_TIMEOUT old.
+    """
+    def decorator(fn):
+        HANDLERS[job_type] = fn
+        return fn
+    return decorator
+
+
+def enqueue(job_type, payload, delay=0):
+    """Add a job to the current session; workers see it once the caller commits"""
+    from models import BackgroundJob
+    job = BackgroundJob(
+        job_type=job_type,
+        payload=json.dumps(payload),
+        status='pending',
+        run_after=datetime.utcnow() + timedelta(seconds=delay)
+    )
+    db.session.add(job)
+    return job
+
+
+class JobRunner:
+    """Runs jobs from the background_jobs table on an in-process thread pool.
+
+    A dispatcher thread claims due jobs with a conditional UPDATE, so several
+    processes can share the table, and hands them to the pool. Jobs stay in the
+    table until they succeed, which is what makes them survive a restart.
+    While a job runs the dispatcher keeps refreshing its locked_at, so only
+    jobs of a process that is gone are taken back, however long a job takes.
+
+    Nothing starts in init_app: servers call start() (see app.start_background_threads),
+    so CLI commands such as flask db upgrade do not run jobs.
+    """
+
+    def __init__(self):
+        self._app = None
+        self._executor = None
+        self._workers = 2
+        self._poll_interval = 1.0
+        self._lock_timeout = 300
+        self._max_attempts = 5
+        self._inflight = 0
+        self._running = set()
+        self._heartbeat_at = 0.0
+        self._lock = threading.Lock()
+        self._wake = threading.Event()
+        self._stop = threading.Event()
+        self._thread = None
+
+    @property
+    def enabled(self):
+        return self._app is not None
+
+    @property
+    def running(self):
+        """Whether this process has started its dispatcher, i.e. enqueued jobs get run here"""
+        return self._thread is not None and not self._stop.is_set()
+
+    def init_app(self, app):
+        if not app.config.get('BACKGROUND_JOBS'):
+            self._app = None
+            return
+
+        self._app = app
+        self._workers = max(1, app.config.get('JOB_WORKERS', 2))
+        self._poll_interval = app.config.get('JOB_POLL_INTERVAL', 1.0)
+        self._lock_timeout = app.config.get('JOB_LOCK_TIMEOUT', 300)
+        self._max_attempts = app.config.get('JOB_MAX_ATTEMPTS', 5)
+
+    def start(self):
+        """Start the dispatcher and pool. Pre-fork servers call this in each worker."""
+        if not self.enabled or self._thread is not None:
+            return
+        self._executor = ThreadPoolExecutor(max_workers=self._workers, thread_name_prefix='job-worker')
+        self._thread = threading.Thread(target=self._run, name='job-dispatcher', daemon=True)
+        self._thread.start()
+        atexit.register(self.shutdown)
+
+    def wake(self):
+        """Skip the rest of the poll interval, e.g. right after enqueueing"""
+        self._wake.set()
+
+    def shutdown(self):
+        if self._executor is None or self._stop.is_set():
+            return
+        self._stop.set()
+        self._wake.set()
+        # Running jobs finish; unclaimed ones stay pending in the table for the next start
+        self._executor.shutdown(wait=True)
+
+    def _run(self):
+        while not self._stop.is_set():
+            with self._lock:
+                free = self._workers - self._inflight
+
+            claimed = []
+            with self._app.app_context():
+                try:
+                    self._heartbeat()
+                    if free > 0:
+                        self._requeue_stale()
+                        claimed = self._claim(free)
+                except Exception as e:
+                    db.session.rollback()
+                    print(f"Error claiming background jobs: {str(e)}")
+                finally:
+                    db.session.remove()
+
+            for job_id in claimed:
+                with self._lock:
+                    self._inflight += 1
+                    self._running.add(job_id)
+                self._executor.submit(self._execute, job_id)
+
+            if len(claimed) < free or free <= 0:
+                self._wake.wait(self._poll_interval)
+                self._wake.clear()
+
+    def _heartbeat(self):
+        """Refresh locked_at of the jobs this process is running, a few times per JOB_LOCK_TIMEOUT"""
+        from models import BackgroundJob
+        with self._lock:
+            running = list(self._running)
+        if not running or time.monotonic() - self._heartbeat_at < self._lock_timeout / 3:
+            return
+        self._heartbeat_at = time.monotonic()
+        BackgroundJob.query.filter(
+            BackgroundJob.id.in_(running),
+            BackgroundJob.status == 'running'
+        ).update({'locked_at': datetime.utcnow()}, synchronize_session=False)
+        db.session.commit()
+
+    def _requeue_stale(self):
+        """Put back jobs whose worker died (crash, kill, restart) while running them.
+        Live workers refresh locked_at well within the timeout."""
+        from models import BackgroundJob
+        cutoff = datetime.utcnow() - timedelta(seconds=self._lock_timeout)
+        BackgroundJob.query.filter(
+            BackgroundJob.status == 'running',
+            BackgroundJob.locked_at < cutoff
+        ).update({'status': 'pending', 'locked_at': None}, synchronize_session=False)
+        db.session.commit()
+
+    def _claim(self, limit):
+        from models import BackgroundJob
+        now = datetime.utcnow()
+        candidates = [row.id for row in db.session.query(BackgroundJob.id).filter(
+            BackgroundJob.status == 'pending',
+            BackgroundJob.run_after <= now
+        ).order_by(BackgroundJob.id).limit(limit)]
+
+        claimed = []
+        for job_id in candidates:
+            # Only one process wins the pending -> running transition
+            won = BackgroundJob.query.filter(
+                BackgroundJob.id == job_id,
+                BackgroundJob.status == 'pending'
+            ).update({
+                'status': 'running',
+                'locked_at': now,
+                'attempts': BackgroundJob.attempts + 1
+            }, synchronize_session=False)
+            if won:
+                claimed.append(job_id)
+        db.session.commit()
+        return claimed
+
+    def _execute(self, job_id):
+        from models import BackgroundJob
+        try:
+            with self._app.app_context():
+                job = db.session.get(BackgroundJob, job_id)
+                if job is None:
+                    return
+                job_type, attempts = job.job_type, job.attempts
+                try:
+                    handler = HANDLERS.get(job_type)
+                    if handler is None:
+                        raise LookupError(f'No handler registered for job type {job_type}')
+                    handler(json.loads(job.payload))
+                    db.session.delete(job)
+                    db.session.commit()
+                except Exception as e:
+                    db.session.rollback()
+                    print(f"Error running background job {job_id} ({job_type}): {str(e)}")
+                    self._record_failure(job_id, attempts, e)
+                finally:
+                    db.session.remove()
+        finally:
+            with self._lock:
+                self._inflight -= 1
+                self._running.discard(job_id)
+            self._wake.set()
+
+    def _record_failure(self, job_id, attempts, error):
+        from models import BackgroundJob
+        retry = attempts < self._max_attempts
+        BackgroundJob.query.filter_by(id=job_id).update({
+            'status': 'pending' if retry else 'failed',
+            'run_after': datetime.utcnow() + timedelta(seconds=2 ** attempts),
+            'locked_at': None,
+            'last_error': str(error)[:2000]
+        }, synchronize_session=False)
+        db.session.commit()
+
+
+job_runner = JobRunner()
@@ -0,0 +1,337 @@
+import atexit
+import glob
+import json
+import os
+import threading
+from collections import defaultdict
+from contextlib import contextmanager
+from datetime import datetime
+
+from sqlalchemy import event
+from sqlalchemy.orm import Session
+
+from database import db
+
+
+class ProgressWriteBuffer:
+    """Write-behind buffer for progress toggles.
+
+    Events are coalesced per (enrollment_id, lecture_resource_id) so only the
+    latest state is written, and flushed in bulk on a short interval. Each
+    event is also kept as it happened and written to the activity log by the
+    same flush. When a journal path is configured every event is appended to
+    it first, and the journal is replayed on startup so unflushed events
+    survive a restart. Pending state is per process; reads merge it in
+    through pending_for(), including the batch a flush is still writing, so a
+    toggle stays visible until its row is committed.
+
+    Every event gets a sequence number, so a direct write (see superseded_by)
+    drops only the events recorded before it started.
+    """
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._pending = {}
+        self._pending_seq = {}  # sequence number of each pending state
+        self._flushing = {}  # batch taken by the running flush, until it commits
+        self._flush_lock = threading.Lock()
+        self._events = []  # (seq, event)
+        self._seq = 0
+        self._generation = 0  # bumped whenever stored progress may have changed under pending state
+        self._app = None
+        self._journal = None
+        self._journal_path = None
+        self._interval = 1.0
+        self._stop = threading.Event()
+        self._thread = None
+
+    @property
+    def enabled(self):
+        return self._app is not None
+
+    def init_app(self, app):
+        if not app.config.get('PROGRESS_WRITE_BEHIND'):
+            return
+
+        self._app = app
+        self._interval = app.config.get('PROGRESS_FLUSH_INTERVAL', 1.0)
+        self._journal_path = app.config.get('PROGRESS_JOURNAL_PATH')
+        if not event.contains(Session, 'after_commit', discard_superseded_progress):
+            event.listen(Session, 'after_commit', discard_superseded_progress)
+            event.listen(Session, 'after_rollback', keep_superseded_progress)
+
+    def start(self):
+        """Replay the journal and start flushing. Pre-fork servers call this in each worker."""
+        if not self.enabled or self._thread is not None:
+            return
+
+        if self._journal_path:
+            adopted = []
+            if self._app.config.get('PROGRESS_JOURNAL_PER_PROCESS'):
+                base = self._journal_path
+                self._journal_path = f'{base}.{os.getpid()}'
+                adopted = self._adopt_orphaned_journals(base)
+            self._replay_journal()
+            self._journal = open(self._journal_path, 'a', encoding='utf-8')
+            if adopted:
+                # Adopted events are safe in our own journal before the old files go away
+                with self._lock:
+                    self._compact_journal()
+                for path in adopted:
+                    os.remove(path)
+
+        self._thread = threading.Thread(target=self._run, name='progress-flush', daemon=True)
+        self._thread.start()
+        atexit.register(self.shutdown)
+
+    def record(self, enrollment_id, lecture_resource_id, completed, completed_at=None, at=None):
+        with self._lock:
+            self._record((enrollment_id, lecture_resource_id, completed, completed_at, at or datetime.utcnow()))
+
+    def toggle(self, enrollment_id, lecture_resource_id, read_stored):
+        """Flip a lecture's completion and record the new state, which is returned.
+
+        The current state is the pending one, or read_stored() if there is none.
+        Looking it up and recording happen under the buffer lock, and the stored
+        state is read again if a flush or direct write committed meanwhile, so
+        concurrent toggles of one lecture each flip it once.
+        """
+        key = (enrollment_id, lecture_resource_id)
+        while True:
+            with self._lock:
+                generation = self._generation
+                state = self._state(key)
+                if state is not None:
+                    return self._record_toggle(key, not state[0])
+            stored = read_stored()
+            with self._lock:
+                if generation != self._generation:
+                    continue
+                state = self._state(key)
+                return self._record_toggle(key, not (state[0] if state is not None else stored))
+
+    def _state(self, key):
+        return self._pending.get(key) or self._flushing.get(key)
+
+    def _record_toggle(self, key, completed):
+        now = datetime.utcnow()
+        self._record((*key, completed, now if completed else None, now))
+        return completed
+
+    def _record(self, event):
+        """Queue one event. Caller holds the lock."""
+        self._seq += 1
+        key = event[:2]
+        self._pending[key] = event[2:4]
+        self._pending_seq[key] = self._seq
+        self._events.append((self._seq, event))
+        if self._journal:
+            self._journal.write(self._encode(*event))
+            self._journal.flush()
+
+    def pending_for(self, enrollment_id):
+        """Unflushed {lecture_resource_id: (completed, completed_at)} for one enrollment"""
+        with self._lock:
+            return {
+                resource_id: state
+                for source in (self._flushing, self._pending)
+                for (e_id, resource_id), state in source.items()
+                if e_id == enrollment_id
+            }
+
+    @contextmanager
+    def superseded_by(self, enrollment_id, lecture_resource_ids=None):
+        """Wrap a request that writes an enrollment's progress rows directly.
+
+        Flushes wait until it is done, so an in-flight flush cannot commit older
+        states over it. If its transaction commits, the events it supersedes
+        (those recorded before it started) are dropped; a rejected or rolled
+        back request leaves them queued.
+        """
+        if not self.enabled:
+            yield
+            return
+        with self._flush_lock:
+            with self._lock:
+                write = (enrollment_id, lecture_resource_ids, self._seq)
+            uncommitted = db.session.info.setdefault('superseded_progress', [])
+            uncommitted.append(write)
+            try:
+                yield
+            finally:
+                if write in uncommitted:
+                    uncommitted.remove(write)
+
+    def discard(self, enrollment_id, lecture_resource_ids=None, upto=None):
+        """Drop unflushed events (recorded up to sequence number upto) superseded by a direct write"""
+        def superseded(key, seq):
+            return key[0] == enrollment_id and (lecture_resource_ids is None or key[1] in lecture_resource_ids) \
+                and (upto is None or seq <= upto)
+
+        with self._lock:
+            self._generation += 1
+            stale = [key for key in self._pending if superseded(key, self._pending_seq[key])]
+            for key in stale:
+                del self._pending[key]
+                del self._pending_seq[key]
+            events = [(seq, event) for seq, event in self._events if not superseded(event[:2], seq)]
+            if len(events) != len(self._events):
+                self._events = events
+                self._compact_journal()
+
+    def flush(self):
+        """Write all pending events, one bulk UPDATE and one recount per enrollment"""
+        with self._flush_lock:
+            return self._flush()
+
+    def _flush(self):
+        from routes.progress import apply_progress_states, count_progress, update_enrollment_completion
+        from models import Enrollment
+        from services.activity import record_activity
+
+        with self._lock:
+            batch, self._pending = self._pending, {}
+            batch_seq, self._pending_seq = self._pending_seq, {}
+            events, self._events = self._events, []
+            self._flushing = dict(batch)
+        if not batch:
+            return 0
+
+        by_enrollment = defaultdict(dict)
+        for (enrollment_id, resource_id), state in batch.items():
+            by_enrollment[enrollment_id][resource_id] = state
+        events_by_enrollment = defaultdict(list)
+        for _, event in events:
+            events_by_enrollment[event[0]].append(event)
+
+        try:
+            for enrollment_id, states in by_enrollment.items():
+                apply_progress_states(
+                    enrollment_id,
+                    {rid: completed for rid, (completed, _) in states.items()},
+                    completed_at={rid: at for rid, (completed, at) in states.items() if completed and at}
+                )
+                enrollment = Enrollment.query.get(enrollment_id)
+                if enrollment and enrollment.status in ['active', 'completed']:
+                    update_enrollment_completion(enrollment, *count_progress(enrollment_id))
+                    for _, resource_id, completed, _, at in events_by_enrollment[enrollment_id]:
+                        record_activity(
+                            enrollment.user_id, enrollment.course_id,
+                            'lecture_completed' if completed else 'lecture_reopened', resource_id, at
+                        )
+            db.session.commit()
+        except Exception as e:
+            db.session.rollback()
+            with self._lock:
+                # Keep the events for the next attempt unless newer ones arrived meanwhile
+                for key, state in batch.items():
+                    if key not in self._pending:
+                        self._pending[key] = state
+                        self._pending_seq[key] = batch_seq[key]
+                self._events = events + self._events
+                self._flushing = {}
+            print(f"Error flushing progress buffer: {str(e)}")
+            return 0
+
+        with self._lock:
+            self._flushing = {}
+            self._generation += 1
+            self._compact_journal()
+        return len(batch)
+
+    def shutdown(self):
+        if self._thread is None:
+            return
+        self._stop.set()
+        with self._app.app_context():
+            self.flush()
+
+    def _run(self):
+        while not self._stop.wait(self._interval):
+            with self._app.app_context():
+                self.flush()
+                db.session.remove()
+
+    @staticmethod
+    def _encode(enrollment_id, lecture_resource_id, completed, completed_at, at):
+        return json.dumps({
+            'e': enrollment_id,
+            'r': lecture_resource_id,
+            'c': completed,
+            't': completed_at.isoformat() if completed_at else None,
+            'a': at.isoformat()
+        }) + '\n'
+
+    def _adopt_orphaned_journals(self, base):
+        """Take over journals of worker processes that are gone, so their events are not lost.
+
+        Files are <base> (single-process mode) or <base>.<pid>[.adopting.<n>]. Each
+        orphan is renamed before it is replayed, so only one worker can claim it.
+        """
+        adopted = []
+        for path in [base] + glob.glob(glob.escape(base) + '.*'):
+            owner = path[len(base) + 1:].split('.')[0]
+            if path.endswith('.tmp') or not os.path.exists(path):
+                continue
+            if path != base and (not owner.isdigit() or int(owner) == os.getpid() or _process_alive(int(owner))):
+                continue
+            claimed = f'{self._journal_path}.adopting.{len(adopted)}'
+            try:
+                os.rename(path, claimed)
+            except FileNotFoundError:
+                continue  # another worker claimed it first
+            self._replay_journal(claimed)
+            adopted.append(claimed)
+        return adopted
+
+    def _replay_journal(self, path=None):
+        path = path or self._journal_path
+        if not os.path.exists(path):
+            return
+        with open(path, encoding='utf-8') as journal:
+            for line in journal:
+                try:
+                    event = json.loads(line)
+                except ValueError:
+                    continue  # torn final line from a crash mid-write
+                completed_at = datetime.fromisoformat(event['t']) if event['t'] else None
+                self._record((event['e'], event['r'], event['c'], completed_at, datetime.fromisoformat(event['a'])))
+
+    def _compact_journal(self):
+        """Rewrite the journal so it only holds still-pending events. Caller holds the lock.
+
+        Events are kept in order rather than coalesced; replaying them rebuilds
+        the same pending state and the same activity history.
+        """
+        if not self._journal:
+            return
+        tmp_path = self._journal_path + '.tmp'
+        with open(tmp_path, 'w', encoding='utf-8') as tmp:
+            for _, event in self._events:
+                tmp.write(self._encode(*event))
+        self._journal.close()
+        os.replace(tmp_path, self._journal_path)
+        self._journal = open(self._journal_path, 'a', encoding='utf-8')
+
+
+def discard_superseded_progress(session):
+    """after_commit hook: the direct writes of the transaction are in, drop the events they replace"""
+    for enrollment_id, lecture_resource_ids, upto in session.info.pop('superseded_progress', ()):
+        progress_buffer.discard(enrollment_id, lecture_resource_ids, upto)
+
+
+def keep_superseded_progress(session):
+    session.info.pop('superseded_progress', None)
+
+
+def _process_alive(pid):
+    try:
+        os.kill(pid, 0)
+    except ProcessLookupError:
+        return False
+    except PermissionError:
+        return True
+    return True
+
+
+progress_buffer = ProgressWriteBuffer()
@@ -0,0 +1,202 @@
+from collections import Counter, defaultdict
+from datetime import datetime
+
+from flask import current_app
+from sqlalchemy import case, event, func, inspect, select, update
+from sqlalchemy.orm import Session
+
+from database import db, upsert, upsert_statement
+from models import Course, CourseRanking, Enrollment, Rating
+from services.jobs import enqueue, job_handler
+
+# Trending scores are stored relative to this instant; see trending_weight
+RANKING_EPOCH = datetime(2024, 1, 1)
+COUNTED_STATUSES = ('active', 'completed')
+
+_rankings_complete = False  # every course has a ranking row; see schedule_rebuild_if_incomplete
+
+
+def trending_weight(at):
+    """Weight of an enrollment at time at: 2 ** (half-lives elapsed since RANKING_EPOCH).
+
+    An event's decayed contribution at time now is trending_weight(at) /
+    trending_weight(now). The divisor is the same for every course, so
+    ordering by the stored sum orders by decayed score and rows never need
+    rewriting as time passes. With a 7 day half-life the weights stay within
+    double range for about 19 years after the epoch.
+    """
+    half_life = current_app.config.get('TRENDING_HALF_LIFE_DAYS', 7) * 86400
+    return 2.0 ** ((at - RANKING_EPOCH).total_seconds() / half_life)
+
+
+def decayed_score(trending_score, now=None):
+    """Stored trending score as decayed enrollments at now"""
+    return trending_score / trending_weight(now or datetime.utcnow())
+
+
+def bayesian_rating(rating_sum, rating_count):
+    """Average rating pulled towards a prior, so one 5-star rating does not top the board"""
+    prior_mean = current_app.config.get('TOP_RATED_PRIOR_MEAN', 3.5)
+    prior_count = current_app.config.get('TOP_RATED_PRIOR_COUNT', 5)
+    return (prior_mean * prior_count + rating_sum) / (prior_count + rating_count)
+
+
+def _aggregate_rows(course_ids=None):
+    """Ranking rows computed from enrollments and ratings, for course_ids or every course"""
+    enrollments = db.session.query(Enrollment.course_id, Enrollment.enrolled_at).filter(
+        Enrollment.status.in_(COUNTED_STATUSES)
+    )
+    ratings = db.session.query(
+        Rating.course_id, func.sum(Rating.rating), func.count(Rating.id)
+    ).filter(Rating.status == 'active')
+    courses = select(Course.id, Course.category, Course.status)
+    if course_ids is not None:
+        enrollments = enrollments.filter(Enrollment.course_id.in_(course_ids))
+        ratings = ratings.filter(Rating.course_id.in_(course_ids))
+        courses = courses.where(Course.id.in_(course_ids))
+
+    scores = defaultdict(float)
+    counts = Counter()
+    for course_id, enrolled_at in enrollments.execution_options(yield_per=5000):
+        counts[course_id] += 1
+        scores[course_id] += trending_weight(enrolled_at or RANKING_EPOCH)
+
+    ratings = {
+        course_id: (int(rating_sum), rating_count)
+        for course_id, rating_sum, rating_count in ratings.group_by(Rating.course_id)
+    }
+
+    rows = []
+    for course_id, category, status in db.session.execute(courses):
+        rating_sum, rating_count = ratings.get(course_id, (0, 0))
+        rows.append({
+            'course_id': course_id,
+            'category': category,
+            'active': status == 'active',
+            'trending_score': scores[course_id],
+            'enrollment_count': counts[course_id],
+            'rating_sum': rating_sum,
+            'rating_count': rating_count,
+            'rating_score': bayesian_rating(rating_sum, rating_count),
+            'updated_at': datetime.utcnow()
+        })
+    return rows
+
+
+def _ensure_rows(course_ids):
+    """Create missing ranking rows (courses that predate the rankings, or a never-run rebuild),
+    seeded from the course's enrollments and ratings as this transaction sees them"""
+    upsert(CourseRanking, _aggregate_rows(course_ids), ['course_id'], [])
+
+
+def _update_ranking(course_id, values):
+    """Apply values to a course's ranking row. A missing row is seeded from the
+    aggregates instead, which already include the caller's (flushed) change."""
+    statement = update(CourseRanking).where(CourseRanking.course_id == course_id)
+    if db.session.execute(statement.values(values), execution_options={'synchronize_session': False}).rowcount == 0:
+        _ensure_rows([course_id])
+        if 'enrollments_changed_at' in values:
+            db.session.execute(statement.values(enrollments_changed_at=values['enrollments_changed_at']),
+                               execution_options={'synchronize_session': False})
+
+
+def record_enrollments(course_id, count=1, at=None):
+    """Count new or renewed enrollments; call in the transaction that writes them, after the write"""
+    if count <= 0:
+        return
+    _update_ranking(course_id, {
+        'trending_score': CourseRanking.trending_score + count * trending_weight(at or datetime.utcnow()),
+        'enrollment_count': CourseRanking.enrollment_count + count,
+        'enrollments_changed_at': datetime.utcnow()
+    })
+
+
+def record_unenrollment(course_id, count=1):
+    """Take enrollments back out of the all-time count, after changing their status;
+    their trending contribution decays on its own"""
+    _update_ranking(course_id, {
+        'enrollment_count': case(
+            (CourseRanking.enrollment_count > count, CourseRanking.enrollment_count - count), else_=0
+        ),
+        'enrollments_changed_at': datetime.utcnow()
+    })
+
+
+def refresh_ratings(course_id):
+    """Recount one course's ratings. Ratings are upserted in SQL, so there is no old value to diff against."""
+    rating_sum, rating_count = db.session.query(
+        func.coalesce(func.sum(Rating.rating), 0), func.count(Rating.id)
+    ).filter(
+        Rating.course_id == course_id,
+        Rating.status == 'active'
+    ).one()
+    _update_ranking(course_id, {
+        'rating_sum': int(rating_sum),
+        'rating_count': rating_count,
+        'rating_score': bayesian_rating(int(rating_sum), rating_count)
+    })
+
+
+def sync_course_rankings(session, flush_context):
+    """after_flush hook: ranking rows follow course category and status changes"""
+    rows = []
+    for obj in list(session.new) + list(session.dirty) + list(session.deleted):
+        if not isinstance(obj, Course):
+            continue
+        state = inspect(obj)
+        if obj in session.new or obj in session.deleted \
+                or state.attrs.category.history.has_changes() or state.attrs.status.history.has_changes():
+            rows.append({
+                'course_id': obj.id,
+                'category': obj.category,
+                'active': obj.status == 'active' and obj not in session.deleted
+            })
+    if rows:
+        connection = session.connection()
+        connection.execute(upsert_statement(
+            connection.dialect.name, CourseRanking, rows, ['course_id'], ['category', 'active']
+        ))
+
+
+@job_handler('rebuild_course_rankings')
+def rebuild_course_rankings(payload):
+    """Recompute every ranking row from enrollments and ratings.
+
+    Fills the table the first time, and repairs drift from writes that bypass
+    the incremental updates (bulk SQL, manual fixes).
+    """
+    rows = _aggregate_rows()
+
+    chunk_size = current_app.config.get('BULK_CHUNK_SIZE', 500)
+    columns = [column for column in rows[0] if column != 'course_id'] if rows else []
+    for start in range(0, len(rows), chunk_size):
+        upsert(CourseRanking, rows[start:start + chunk_size], ['course_id'], columns)
+
+
+def schedule_rebuild_if_incomplete():
+    """Queue a full rebuild when some course has no ranking row yet (e.g. right after deploy).
+
+    Returns the queued job, if any. Once every course has a row, new courses get
+    theirs from sync_course_rankings and the check is skipped for the process.
+    """
+    global _rankings_complete
+    if _rankings_complete:
+        return None
+    from models import BackgroundJob
+    missing = db.session.query(Course.id).outerjoin(
+        CourseRanking, CourseRanking.course_id == Course.id
+    ).filter(CourseRanking.course_id.is_(None)).first()
+    if missing is None:
+        _rankings_complete = True
+        return None
+    if BackgroundJob.query.filter(
+        BackgroundJob.job_type == 'rebuild_course_rankings',
+        BackgroundJob.status.in_(('pending', 'running'))
+    ).first():
+        return None
+    return enqueue('rebuild_course_rankings', {})
+
+
+def init_rankings(app):
+    if not event.contains(Session, 'after_flush', sync_course_rankings):
+        event.listen(Session, 'after_flush', sync_course_rankings)
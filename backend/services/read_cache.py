@@ -0,0 +1,120 @@
+import threading
+import time
+from collections import OrderedDict
+
+from sqlalchemy import event
+from sqlalchemy.orm import Session
+
+from models import Course, Enrollment, Profile, Rating, Review, User
+
+
+class ReadCache:
+    """Process-wide TTL cache of read-mostly values keyed by id.
+
+    Commits in this process drop the entries they change (invalidate_reads);
+    other workers' writes show up once READ_CACHE_TTL has passed.
+    """
+
+    def __init__(self, max_entries=4096):
+        self._lock = threading.Lock()
+        self._entries = OrderedDict()
+        self._max_entries = max_entries
+        self.ttl = 60
+
+    def get_many(self, keys):
+        """({key: value} for the fresh entries, [keys that must be loaded])"""
+        found, missing = {}, []
+        now = time.monotonic()
+        with self._lock:
+            for key in keys:
+                entry = self._entries.get(key)
+                if entry and entry[0] > now:
+                    self._entries.move_to_end(key)
+                    found[key] = entry[1]
+                else:
+                    self._entries.pop(key, None)
+                    missing.append(key)
+        return found, missing
+
+    def get(self, key):
+        return self.get_many([key])[0].get(key)
+
+    def set_many(self, values):
+        expires = time.monotonic() + self.ttl
+        with self._lock:
+            for key, value in values.items():
+                self._entries[key] = (expires, value)
+                self._entries.move_to_end(key)
+            while len(self._entries) > self._max_entries:
+                self._entries.popitem(last=False)
+
+    def set(self, key, value):
+        self.set_many({key: value})
+
+    def discard(self, keys):
+        with self._lock:
+            for key in keys:
+                self._entries.pop(key, None)
+
+    def clear(self):
+        with self._lock:
+            self._entries.clear()
+
+
+# Serialized GET /courses/ listings keyed by their filters
+catalog_cache = ReadCache(max_entries=256)
+# Course.instructor_cards entries keyed by instructor id
+instructor_card_cache = ReadCache()
+# Course.bulk_stats entries (rating, total_students, total_reviews) keyed by course id
+course_stats_cache = ReadCache()
+
+
+def invalidate_reads(session, course_ids=(), instructor_ids=()):
+    """Queue cache entries that this transaction changes; they are dropped when it commits.
+
+    The ORM writes are found by capture_read_changes; callers writing with
+    Core statements (upserts, bulk inserts) name what they changed here.
+    """
+    pending = session.info.setdefault('read_cache_changes', (set(), set()))
+    pending[0].update(course_ids)
+    pending[1].update(instructor_ids)
+
+
+def capture_read_changes(session, flush_context):
+    """Queue the courses and instructors whose cached stats, cards or listings an ORM flush changes"""
+    course_ids, instructor_ids = set(), set()
+    for obj in list(session.new) + list(session.dirty) + list(session.deleted):
+        if isinstance(obj, (Enrollment, Rating, Review)):
+            course_ids.add(obj.course_id)
+        elif isinstance(obj, Course):
+            course_ids.add(obj.id)
+        elif isinstance(obj, (User, Profile)):
+            instructor_ids.add(obj.id if isinstance(obj, User) else obj.user_id)
+    if course_ids or instructor_ids:
+        invalidate_reads(session, course_ids, instructor_ids)
+
+
+def apply_read_changes(session):
+    pending = session.info.pop('read_cache_changes', None)
+    if not pending:
+        return
+    course_ids, instructor_ids = pending
+    course_stats_cache.discard(course_ids)
+    instructor_card_cache.discard(instructor_ids)
+    # Listings embed stats and cards, and any course change can move a course in or out of one
+    catalog_cache.clear()
+
+
+def discard_read_changes(session):
+    session.info.pop('read_cache_changes', None)
+
+
+def init_read_caches(app):
+    ttl = app.config.get('READ_CACHE_TTL', 60)
+    for cache in (catalog_cache, instructor_card_cache, course_stats_cache):
+        cache.ttl = ttl
+        cache.clear()
+    if not event.contains(Session, 'after_flush', capture_read_changes):
+        event.listen(Session, 'after_flush', capture_read_changes)
+        event.listen(Session, 'after_commit', apply_read_changes)
+        event.listen(Session, 'after_rollback', discard_read_changes)
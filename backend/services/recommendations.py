@@ -0,0 +1,229 @@
+from datetime import datetime, timedelta
+
+from flask import current_app
+from sqlalchemy import delete, func, insert, select
+
+from database import db
+from models import Course, CourseRanking, CourseRecommendation, Enrollment, RecommendationRun
+from services.jobs import enqueue, job_handler
+
+try:
+    import numpy as np
+    from scipy import sparse
+except ImportError:  # in requirements.txt; without them no recommendations are computed
+    np = None
+    sparse = None
+
+COUNTED_STATUSES = ('active', 'completed')
+
+
+def learners_of(course_ids):
+    return select(Enrollment.user_id).where(
+        Enrollment.course_id.in_(course_ids),
+        Enrollment.status.in_(COUNTED_STATUSES)
+    )
+
+
+def load_enrollment_matrix(course_ids=None):
+    """Binary learner x course CSR matrix of current enrollments, plus the course id of each column.
+
+    With course_ids, only the learners enrolled in one of those courses are
+    loaded (with all their enrollments): enough for the co-enrollments of
+    those courses, but column sums of other courses are partial.
+    """
+    query = db.session.query(Enrollment.user_id, Enrollment.course_id).filter(
+        Enrollment.status.in_(COUNTED_STATUSES)
+    )
+    if course_ids is not None:
+        query = query.filter(Enrollment.user_id.in_(learners_of(course_ids)))
+    rows = query.execution_options(yield_per=10000).all()
+
+    course_ids = np.array(sorted({course_id for _, course_id in rows}), dtype=np.int64)
+    if not rows:
+        return sparse.csr_matrix((0, 0), dtype=np.float64), course_ids
+
+    users = np.fromiter((user_id for user_id, _ in rows), dtype=np.int64, count=len(rows))
+    courses = np.fromiter((course_id for _, course_id in rows), dtype=np.int64, count=len(rows))
+    _, user_index = np.unique(users, return_inverse=True)
+    course_index = np.searchsorted(course_ids, courses)
+
+    matrix = sparse.csr_matrix(
+        (np.ones(len(rows), dtype=np.float64), (user_index, course_index)),
+        shape=(user_index.max() + 1, len(course_ids))
+    )
+    # Duplicate (user, course) pairs cannot occur (unique_user_course), but keep the matrix binary regardless
+    matrix.data[:] = 1.0
+    return matrix, course_ids
+
+
+def enrollment_counts(course_ids):
+    """Learners per course, aligned with course_ids, counted over the whole table"""
+    counts = dict(db.session.query(Enrollment.course_id, func.count(Enrollment.id)).filter(
+        Enrollment.status.in_(COUNTED_STATUSES)
+    ).group_by(Enrollment.course_id).all())
+    return np.array([counts.get(int(course_id), 0) for course_id in course_ids], dtype=np.float64)
+
+
+def top_neighbours(matrix, course_ids, columns, recommendable, limit, min_co_enrollments, counts=None):
+    """Cosine item-item similarity for the given columns, reduced to the top neighbours of each.
+
+    One sparse product X[:, columns].T @ X gives the co-enrollment counts of
+    those courses with every course; dividing by sqrt(n_i * n_j) turns counts
+    into cosine similarity. counts are the learners per course, by default the
+    column sums. Returns {course_id: [(neighbour_id, score, co_enrollments)]}.
+    """
+    if counts is None:
+        counts = np.asarray(matrix.sum(axis=0)).ravel()
+    norms = np.sqrt(counts)
+    co_enrollments = (matrix[:, columns].T @ matrix).tocsr()
+
+    neighbours = {}
+    for row, column in enumerate(columns):
+        start, end = co_enrollments.indptr[row], co_enrollments.indptr[row + 1]
+        others = co_enrollments.indices[start:end]
+        together = co_enrollments.data[start:end]
+
+        keep = (others != column) & (together >= min_co_enrollments) & recommendable[others]
+        others, together = others[keep], together[keep]
+        if not len(others):
+            neighbours[int(course_ids[column])] = []
+            continue
+
+        scores = together / (norms[column] * norms[others])
+        if len(scores) > limit:
+            best = np.argpartition(-scores, limit - 1)[:limit]
+            others, together, scores = others[best], together[best], scores[best]
+        order = np.lexsort((course_ids[others], -scores))
+        neighbours[int(course_ids[column])] = [
+            (int(course_ids[others[i]]), float(scores[i]), int(together[i])) for i in order
+        ]
+    return neighbours
+
+
+def changed_courses(since):
+    """Courses whose enrollments changed after since, per CourseRanking.enrollments_changed_at"""
+    return {row.course_id for row in db.session.query(CourseRanking.course_id).filter(
+        CourseRanking.enrollments_changed_at >= since
+    )}
+
+
+@job_handler('compute_course_recommendations')
+def compute_course_recommendations(payload):
+    """Recompute "students also enrolled in" neighbours.
+
+    A full run loads every enrollment and recomputes every course. An
+    incremental run only recomputes the courses whose enrollments changed
+    since the previous run, plus the courses whose neighbour lists can change
+    because of them: those sharing learners with a changed course now, and
+    those that listed one before. It loads only the learners of those courses,
+    and takes the other courses' sizes from a grouped count.
+    """
+    if np is None:
+        return
+
+    config = current_app.config
+    started_at = datetime.utcnow()
+    previous = RecommendationRun.query.filter(
+        RecommendationRun.finished_at.isnot(None)
+    ).order_by(RecommendationRun.started_at.desc()).first()
+    full = payload.get('full') or previous is None
+
+    if full:
+        matrix, course_ids = load_enrollment_matrix()
+        targets = {int(course_id) for course_id in course_ids}
+        counts = None
+    else:
+        # Overlap with the previous run so writes committed while it ran are not missed
+        since = previous.started_at - timedelta(seconds=config.get('RECOMMENDATIONS_SETTLE_SECONDS', 60))
+        changed = changed_courses(since)
+        targets = set(changed)
+        if changed:
+            targets.update(row.course_id for row in db.session.query(Enrollment.course_id).filter(
+                Enrollment.user_id.in_(learners_of(list(changed))),
+                Enrollment.status.in_(COUNTED_STATUSES)
+            ).distinct())
+            targets.update(row.course_id for row in db.session.query(CourseRecommendation.course_id).filter(
+                CourseRecommendation.recommended_course_id.in_(changed)
+            ).distinct())
+        matrix, course_ids = load_enrollment_matrix(list(targets))
+        counts = enrollment_counts(course_ids)
+
+    active = {row.id for row in db.session.query(Course.id).filter(Course.status == 'active')}
+    recommendable = np.array([int(course_id) in active for course_id in course_ids], dtype=bool)
+    position = {int(course_id): index for index, course_id in enumerate(course_ids)}
+
+    columns = sorted(position[course_id] for course_id in targets if course_id in position)
+    neighbours = top_neighbours(
+        matrix, course_ids, columns, recommendable,
+        config.get('RECOMMENDATIONS_PER_COURSE', 10),
+        config.get('RECOMMENDATIONS_MIN_CO_ENROLLMENTS', 1),
+        counts
+    ) if columns else {}
+
+    # Courses that lost all their learners keep no neighbours either
+    stale = [course_id for course_id in targets if course_id not in neighbours]
+    chunk_size = config.get('BULK_CHUNK_SIZE', 500)
+    if full:
+        db.session.execute(delete(CourseRecommendation))
+    else:
+        refreshed = list(neighbours) + stale
+        for start in range(0, len(refreshed), chunk_size):
+            db.session.execute(delete(CourseRecommendation).where(
+                CourseRecommendation.course_id.in_(refreshed[start:start + chunk_size])
+            ))
+
+    rows = [{
+        'course_id': course_id,
+        'recommended_course_id': neighbour_id,
+        'score': score,
+        'co_enrollments': together,
+        'computed_at': started_at
+    } for course_id, items in neighbours.items() for neighbour_id, score, together in items]
+    for start in range(0, len(rows), chunk_size):
+        db.session.execute(insert(CourseRecommendation), rows[start:start + chunk_size])
+
+    db.session.add(RecommendationRun(
+        mode='full' if full else 'incremental',
+        started_at=started_at,
+        finished_at=datetime.utcnow(),
+        courses_refreshed=len(neighbours) + len(stale)
+    ))
+
+    interval = config.get('RECOMMENDATIONS_REFRESH_INTERVAL', 0)
+    if interval:
+        schedule_refresh(delay=interval)
+
+
+def schedule_refresh(full=False, delay=0):
+    """Queue a recommendation run. Periodic runs re-queue themselves, so an
+    incremental run is skipped while any run is already waiting."""
+    from models import BackgroundJob
+    if not full and BackgroundJob.query.filter(
+        BackgroundJob.job_type == 'compute_course_recommendations',
+        BackgroundJob.status == 'pending'
+    ).first():
+        return None
+    return enqueue('compute_course_recommendations', {'full': full}, delay=delay)
+
+
+def schedule_if_stale():
+    """Start the periodic refresh when no run finished recently (first use, or the chain broke)"""
+    from models import BackgroundJob
+    interval = current_app.config.get('RECOMMENDATIONS_REFRESH_INTERVAL', 0)
+    if np is None or not interval:
+        return None
+    latest = db.session.query(func.max(RecommendationRun.finished_at)).scalar()
+    if latest and latest > datetime.utcnow() - timedelta(seconds=interval * 2):
+        return None
+    if BackgroundJob.query.filter(
+        BackgroundJob.job_type == 'compute_course_recommendations',
+        BackgroundJob.status.in_(('pending', 'running'))
+    ).first():
+        return None
+    return enqueue('compute_course_recommendations', {'full': False})
+
+
+def init_recommendations(app):
+    """Registers the job handler (by importing this module); warns when the job cannot run"""
+    if np is None:
+        app.logger.warning('Course recommendations need numpy and scipy, which are not installed')
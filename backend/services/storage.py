@@ -0,0 +1,163 @@
+import glob
+import hashlib
+import os
+import shutil
+import uuid
+
+from flask import current_app
+
+
+class StorageBackend:
+    """Interface for media storage.
+
+    Finished objects are content-addressed: their key is the SHA-256 of the
+    bytes, so identical uploads share one object. In-progress uploads are
+    assembled under an upload id until commit_upload() moves them into place:
+    each chunk is first spooled on its own, then appended once the caller owns
+    its offset.
+    """
+
+    def receive_chunk(self, upload_id, stream, chunk_size):
+        """Spool a chunk body apart from the upload. Returns (chunk_id, bytes written)."""
+        raise NotImplementedError
+
+    def append_chunk(self, upload_id, chunk_id, offset):
+        """Write a spooled chunk at offset of the upload, dropping anything after it"""
+        raise NotImplementedError
+
+    def discard_chunk(self, upload_id, chunk_id):
+        raise NotImplementedError
+
+    def commit_upload(self, upload_id):
+        """Hash a finished upload and store it. Returns (key, size)."""
+        raise NotImplementedError
+
+    def discard_upload(self, upload_id):
+        raise NotImplementedError
+
+    def put(self, key, data):
+        """Store small, already-derived bytes (e.g. image renditions) under a key"""
+        raise NotImplementedError
+
+    def exists(self, key):
+        raise NotImplementedError
+
+    def open(self, key):
+        raise NotImplementedError
+
+    def delete(self, key):
+        raise NotImplementedError
+
+    def local_path(self, key):
+        """Filesystem path of an object, for zero-copy serving, or None if the backend has none"""
+        return None
+
+
+class LocalStorage(StorageBackend):
+    """Stores objects as files under root/objects/<aa>/<bb>/<sha256>"""
+
+    def __init__(self, root):
+        self.root = os.path.abspath(root)
+        self._uploads = os.path.join(self.root, 'uploads')
+        self._objects = os.path.join(self.root, 'objects')
+        os.makedirs(self._uploads, exist_ok=True)
+        os.makedirs(self._objects, exist_ok=True)
+
+    def _upload_path(self, upload_id):
+        return os.path.join(self._uploads, f'{upload_id}.part')
+
+    def _object_path(self, key):
+        return os.path.join(self._objects, key[:2], key[2:4], key)
+
+    def _chunk_path(self, upload_id, chunk_id):
+        return os.path.join(self._uploads, f'{upload_id}.{chunk_id}.chunk')
+
+    def receive_chunk(self, upload_id, stream, chunk_size):
+        chunk_id = uuid.uuid4().hex
+        written = 0
+        with open(self._chunk_path(upload_id, chunk_id), 'wb') as chunk:
+            while True:
+                block = stream.read(chunk_size)
+                if not block:
+                    break
+                chunk.write(block)
+                written += len(block)
+        return chunk_id, written
+
+    def append_chunk(self, upload_id, chunk_id, offset):
+        path = self._upload_path(upload_id)
+        chunk_path = self._chunk_path(upload_id, chunk_id)
+        with open(path, 'r+b' if os.path.exists(path) else 'wb') as part, open(chunk_path, 'rb') as chunk:
+            part.seek(offset)
+            shutil.copyfileobj(chunk, part, 1024 * 1024)
+            # Bytes past the offset from an interrupted earlier attempt are stale
+            part.truncate()
+        os.remove(chunk_path)
+
+    def discard_chunk(self, upload_id, chunk_id):
+        try:
+            os.remove(self._chunk_path(upload_id, chunk_id))
+        except FileNotFoundError:
+            pass
+
+    def commit_upload(self, upload_id):
+        path = self._upload_path(upload_id)
+        digest = hashlib.sha256()
+        with open(path, 'rb') as part:
+            for block in iter(lambda: part.read(1024 * 1024), b''):
+                digest.update(block)
+        key = digest.hexdigest()
+        size = os.path.getsize(path)
+
+        target = self._object_path(key)
+        if os.path.exists(target):
+            os.remove(path)  # identical content is already stored
+        else:
+            os.makedirs(os.path.dirname(target), exist_ok=True)
+            os.replace(path, target)
+        return key, size
+
+    def discard_upload(self, upload_id):
+        for path in [self._upload_path(upload_id)] + glob.glob(self._chunk_path(upload_id, '*')):
+            try:
+                os.remove(path)
+            except FileNotFoundError:
+                pass
+
+    def put(self, key, data):
+        target = self._object_path(key)
+        os.makedirs(os.path.dirname(target), exist_ok=True)
+        tmp_path = f'{target}.{os.getpid()}.tmp'
+        with open(tmp_path, 'wb') as tmp:
+            tmp.write(data)
+        os.replace(tmp_path, target)
+
+    def exists(self, key):
+        return os.path.exists(self._object_path(key))
+
+    def open(self, key):
+        return open(self._object_path(key), 'rb')
+
+    def delete(self, key):
+        try:
+            os.remove(self._object_path(key))
+        except FileNotFoundError:
+            pass
+
+    def local_path(self, key):
+        return self._object_path(key)
+
+
+BACKENDS = {
+    'local': lambda app: LocalStorage(app.config['MEDIA_ROOT']),
+}
+
+_storage = {}
+
+
+def get_storage():
+    """The configured backend for the current app, created on first use"""
+    app = current_app._get_current_object()
+    if app not in _storage:
+        _storage[app] = BACKENDS[app.config.get('MEDIA_STORAGE', 'local')](app)
+    return _storage[app]
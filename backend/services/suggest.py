@@ -0,0 +1,275 @@
+import bisect
+import re
+import threading
+import time
+import unicodedata
+from collections import OrderedDict
+
+from flask import current_app
+from sqlalchemy import event, func, inspect, select
+from sqlalchemy.orm import Session
+
+from database import db
+from models import Course, Enrollment, User
+
+# Matches on the title rank above instructor names, which rank above categories
+MATCH_RANK = {'title': 0, 'instructor': 1, 'category': 2}
+COUNTED_STATUSES = ('active', 'completed')
+
+_WORD_START = re.compile(r'(?:^|(?<=[^a-z0-9]))[a-z0-9]')
+
+
+def normalize(text):
+    """Lowercase, strip accents and collapse whitespace, so 'Café  Basics' matches 'cafe b'"""
+    text = unicodedata.normalize('NFKD', text or '')
+    text = ''.join(ch for ch in text if not unicodedata.combining(ch))
+    return ' '.join(text.casefold().split())
+
+
+def index_keys(text):
+    """Every suffix of the normalized text that starts a word; 'python basics' -> both words"""
+    text = normalize(text)
+    return [text[match.start():] for match in _WORD_START.finditer(text)]
+
+
+class SuggestIndex:
+    """In-memory prefix index over active course titles, categories and instructor names.
+
+    Keys live in one sorted list of (key, course_id, field) tuples, so a prefix
+    lookup is a bisect plus a scan of the matching run. Hits are ranked by
+    enrollment count and memoized per (prefix, limit) until the next change.
+    Writes committed in this process are applied incrementally through session
+    events; a periodic rebuild in a background thread picks up writes made by
+    other processes.
+    """
+
+    def __init__(self):
+        self._lock = threading.RLock()
+        self._keys = []
+        self._courses = {}
+        self._instructors = {}
+        self._popularity = {}
+        self._memo = OrderedDict()
+        self._memo_size = 1024
+        self._refresh_interval = 300
+        self._built_at = None
+        self._rebuilding = False
+        self._replay = None
+
+    def init_app(self, app):
+        self._refresh_interval = app.config.get('SUGGEST_REFRESH_INTERVAL', 300)
+        self._memo_size = app.config.get('SUGGEST_MEMO_SIZE', 1024)
+        if not event.contains(Session, 'after_flush', collect_suggest_changes):
+            event.listen(Session, 'after_flush', collect_suggest_changes)
+            event.listen(Session, 'after_commit', apply_suggest_changes)
+            event.listen(Session, 'after_rollback', discard_suggest_changes)
+
+    def suggest(self, prefix, limit):
+        """Up to limit course suggestions for a prefix; only builds from the database on first use"""
+        if self._built_at is None:
+            self.rebuild()
+        elif time.monotonic() - self._built_at > self._refresh_interval:
+            self._refresh_in_background(current_app._get_current_object())
+
+        prefix = normalize(prefix)
+        if not prefix:
+            return []
+
+        with self._lock:
+            memo_key = (prefix, limit)
+            if memo_key in self._memo:
+                self._memo.move_to_end(memo_key)
+                return self._memo[memo_key]
+
+            best = {}
+            position = bisect.bisect_left(self._keys, (prefix,))
+            while position < len(self._keys) and self._keys[position][0].startswith(prefix):
+                _, course_id, field = self._keys[position]
+                if course_id not in best or MATCH_RANK[field] < MATCH_RANK[best[course_id]]:
+                    best[course_id] = field
+                position += 1
+
+            ranked = sorted(best, key=lambda course_id: (
+                -self._popularity.get(course_id, 0),
+                MATCH_RANK[best[course_id]],
+                normalize(self._courses[course_id]['title']),
+                course_id
+            ))[:limit]
+            results = [self._suggestion(course_id, best[course_id]) for course_id in ranked]
+
+            self._memo[memo_key] = results
+            if len(self._memo) > self._memo_size:
+                self._memo.popitem(last=False)
+            return results
+
+    def rebuild(self):
+        """Load every active course, its instructor name and enrollment count"""
+        with self._lock:
+            self._replay = []
+            self._rebuilding = True
+        try:
+            rows = db.session.query(
+                Course.id, Course.title, Course.category, Course.image, Course.instructor_id, User.name
+            ).join(User, Course.instructor_id == User.id).filter(Course.status == 'active').all()
+            popularity = dict(db.session.query(Enrollment.course_id, func.count(Enrollment.id)).filter(
+                Enrollment.status.in_(COUNTED_STATUSES)
+            ).group_by(Enrollment.course_id).all())
+        except Exception:
+            with self._lock:
+                self._rebuilding = False
+                self._replay = None
+            raise
+
+        courses = {}
+        instructors = {}
+        keys = []
+        for course_id, title, category, image, instructor_id, instructor_name in rows:
+            courses[course_id] = {'title': title, 'category': category, 'image': image, 'instructor_id': instructor_id}
+            instructors[instructor_id] = instructor_name
+            keys.extend(self._course_keys(course_id, courses[course_id], instructor_name))
+        keys.sort()
+
+        with self._lock:
+            self._keys, self._courses, self._instructors, self._popularity = keys, courses, instructors, popularity
+            # Changes committed while the rows were being read may be missing from them
+            replay, self._replay = self._replay, None
+            self._rebuilding = False
+            for change in replay:
+                self._apply(change)
+            self._memo.clear()
+            self._built_at = time.monotonic()
+
+    def apply(self, changes):
+        """Apply committed (kind, ...) changes collected from a session"""
+        with self._lock:
+            if self._built_at is None and not self._rebuilding:
+                return  # nothing to update; the first lookup builds from the database
+            for change in changes:
+                self._apply(change)
+                # Course and name changes are idempotent; enrollment deltas are not, and any
+                # miscount from a concurrent rebuild is corrected by the next one
+                if self._replay is not None and change[0] != 'enrollment':
+                    self._replay.append(change)
+            self._memo.clear()
+
+    def _apply(self, change):
+        kind = change[0]
+        if kind == 'course':
+            _, course_id, data, instructor_name = change
+            self._remove_course(course_id)
+            if data is not None:
+                self._courses[course_id] = data
+                if instructor_name is not None:
+                    self._instructors[data['instructor_id']] = instructor_name
+                for key in self._course_keys(course_id, data, self._instructors.get(data['instructor_id'])):
+                    bisect.insort(self._keys, key)
+        elif kind == 'instructor':
+            _, user_id, name = change
+            courses = [(course_id, data) for course_id, data in self._courses.items() if data['instructor_id'] == user_id]
+            for course_id, _ in courses:
+                self._remove_course(course_id)  # under the old name
+            self._instructors[user_id] = name
+            for course_id, data in courses:
+                self._apply(('course', course_id, data, None))
+        elif kind == 'enrollment':
+            _, course_id, delta = change
+            self._popularity[course_id] = max(0, self._popularity.get(course_id, 0) + delta)
+
+    def _remove_course(self, course_id):
+        data = self._courses.pop(course_id, None)
+        if data is None:
+            return
+        for key in self._course_keys(course_id, data, self._instructors.get(data['instructor_id'])):
+            position = bisect.bisect_left(self._keys, key)
+            if position < len(self._keys) and self._keys[position] == key:
+                del self._keys[position]
+
+    def _refresh_in_background(self, app):
+        with self._lock:
+            if self._rebuilding:
+                return
+            self._rebuilding = True
+
+        def refresh():
+            with app.app_context():
+                try:
+                    self.rebuild()
+                except Exception as e:
+                    with self._lock:
+                        self._rebuilding = False
+                    print(f"Error rebuilding suggest index: {str(e)}")
+                finally:
+                    db.session.remove()
+
+        threading.Thread(target=refresh, name='suggest-refresh', daemon=True).start()
+
+    def _suggestion(self, course_id, field):
+        data = self._courses[course_id]
+        return {
+            'id': course_id,
+            'title': data['title'],
+            'category': data['category'],
+            'image': data['image'],
+            'instructor_id': data['instructor_id'],
+            'instructor_name': self._instructors.get(data['instructor_id']),
+            'total_students': self._popularity.get(course_id, 0),
+            'match': field
+        }
+
+    @staticmethod
+    def _course_keys(course_id, data, instructor_name):
+        keys = set()
+        for field, text in (('title', data['title']), ('category', data['category']), ('instructor', instructor_name)):
+            for key in index_keys(text):
+                keys.add((key, course_id, field))
+        return keys
+
+
+suggest_index = SuggestIndex()
+
+
+def _enrollment_delta(session, enrollment):
+    if enrollment in session.new:
+        return [(enrollment.course_id, 1)] if enrollment.status in COUNTED_STATUSES else []
+    if enrollment in session.deleted:
+        return [(enrollment.course_id, -1)] if enrollment.status in COUNTED_STATUSES else []
+    history = inspect(enrollment).attrs.status.history
+    if not history.has_changes():
+        return []
+    was = bool(history.deleted) and history.deleted[0] in COUNTED_STATUSES
+    now = enrollment.status in COUNTED_STATUSES
+    return [(enrollment.course_id, int(now) - int(was))] if was != now else []
+
+
+def collect_suggest_changes(session, flush_context):
+    """after_flush hook: remember index changes until the transaction commits"""
+    changes = session.info.setdefault('suggest_changes', [])
+    for obj in list(session.new) + list(session.dirty) + list(session.deleted):
+        if isinstance(obj, Course):
+            if obj in session.deleted or obj.status != 'active':
+                changes.append(('course', obj.id, None, None))
+                continue
+            data = {'title': obj.title, 'category': obj.category, 'image': obj.image, 'instructor_id': obj.instructor_id}
+            instructor_name = None
+            if obj in session.new or inspect(obj).attrs.instructor_id.history.has_changes():
+                instructor_name = session.connection().execute(
+                    select(User.name).where(User.id == obj.instructor_id)
+                ).scalar()
+            changes.append(('course', obj.id, data, instructor_name))
+        elif isinstance(obj, User):
+            if obj not in session.deleted and inspect(obj).attrs.name.history.has_changes():
+                changes.append(('instructor', obj.id, obj.name))
+        elif isinstance(obj, Enrollment):
+            changes.extend(('enrollment', course_id, delta) for course_id, delta in _enrollment_delta(session, obj))
+
+
+def apply_suggest_changes(session):
+    changes = session.info.pop('suggest_changes', None)
+    if changes:
+        suggest_index.apply(changes)
+
+
+def discard_suggest_changes(session):
+    session.info.pop('suggest_changes', None)
+
+
@@ -0,0 +1,58 @@
+import time
+
+from sqlalchemy import func
+
+from database import db
+
+# A current browser, and a client that only speaks gzip
+WARMUP_ENCODINGS = ('gzip, deflate, br, zstd', 'gzip')
+
+
+def warmup_paths(app):
+    """Catalog, search and the detail/outline/review pages of the most-enrolled courses"""
+    from models import Course, Enrollment
+
+    with app.app_context():
+        course_ids = [row.id for row in db.session.query(Course.id).outerjoin(
+            Enrollment, Enrollment.course_id == Course.id
+        ).filter(
+            Course.status == 'active'
+        ).group_by(Course.id).order_by(
+            func.count(Enrollment.id).desc(), Course.id
+        ).limit(app.config.get('WARMUP_COURSE_LIMIT', 50))]
+        db.session.remove()
+
+    # The suggest request builds the typeahead index, which forked workers then share
+    paths = ['/api/courses/', '/api/courses/search', '/api/courses/search?sort=title', '/api/courses/suggest?prefix=a']
+    for course_id in course_ids:
+        paths += [
+            f'/api/courses/{course_id}',
+            f'/api/courses/{course_id}/outline',
+            f'/api/reviews/course/{course_id}'
+        ]
+    return paths
+
+
+def warm_caches(app):
+    """Serve the hot read paths once before the server takes traffic.
+
+    This fills the catalog, instructor card and course stats caches
+    (services.read_cache) for the catalog and the most-enrolled courses, so
+    their first requests run none of those queries, and leaves the compressed
+    response bodies in the compressed-body cache. With gunicorn's preload_app
+    the master does this once and every forked worker starts with the warm
+    caches.
+    """
+    started = time.perf_counter()
+    client = app.test_client()
+    warmed = 0
+    try:
+        for path in warmup_paths(app):
+            for encoding in WARMUP_ENCODINGS:
+                response = client.get(path, headers={'Accept-Encoding': encoding})
+                warmed += response.status_code == 200
+    except Exception as e:
+        # A cold start is slower, not broken
+        print(f"Error warming caches: {str(e)}")
+    app.logger.info(f'Warmed {warmed} responses in {(time.perf_counter() - started) * 1000:.0f} ms')
+    return warmed
@@ -0,0 +1,81 @@
+import os
+import sys
+from datetime import datetime
+
+import pytest
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from config import Config  # noqa: E402
+
+
+@pytest.fixture
+def app(tmp_path, monkeypatch):
+    """The app on a fresh SQLite file (shared by threads); create_app starts no background threads"""
+    monkeypatch.setattr(Config, 'SQLALCHEMY_DATABASE_URI', f'sqlite:///{tmp_path / "test.db"}')
+
+    from app import create_app
+    from database import db
+
+    app = create_app()
+    app.config['TESTING'] = True
+    with app.app_context():
+        db.create_all()
+    yield app
+    with app.app_context():
+        db.session.remove()
+        db.engine.dispose()
+
+
+@pytest.fixture
+def catalog(app):
+    """A learner, an instructor and one course with a module of two resources"""
+    from database import db
+    from models import Course, CourseModule, LectureResource, User
+
+    with app.app_context():
+        learner = User(name='Lena Learner', email='lena@example.com', password='x', role='learner',
+                       created_at=datetime.utcnow())
+        instructor = User(name='Ian Instructor', email='ian@example.com', password='x', role='instructor',
+                          created_at=datetime.utcnow())
+        db.session.add_all([learner, instructor])
+        db.session.flush()
+        course = Course(title='Python Basics', description='Intro', instructor_id=instructor.id,
+                        category='Programming', status='active', created_at=datetime.utcnow())
+        db.session.add(course)
+        db.session.flush()
+        module = CourseModule(course_id=course.id, number=1, title='Getting started')
+        db.session.add(module)
+        db.session.flush()
+        resources = [
+            LectureResource(lecture_id=module.id, resource_type='text', title=f'Lesson {n}', content='...', order=n)
+            for n in range(2)
+        ]
+        db.session.add_all(resources)
+        db.session.commit()
+        return {
+            'learner_id': learner.id,
+            'instructor_id': instructor.id,
+            'course_id': course.id,
+            'module_id': module.id,
+            'resource_ids': [resource.id for resource in resources]
+        }
+
+
+@pytest.fixture
+def enrollment_id(app, catalog):
+    """An active enrollment of the learner, with a progress row per resource"""
+    from database import db
+    from models import Enrollment, Progress
+
+    with app.app_context():
+        enrollment = Enrollment(user_id=catalog['learner_id'], course_id=catalog['course_id'], status='active',
+                                enrolled_at=datetime.utcnow())
+        db.session.add(enrollment)
+        db.session.flush()
+        db.session.add_all([
+            Progress(enrollment_id=enrollment.id, lecture_resource_id=resource_id, completed=False)
+            for resource_id in catalog['resource_ids']
+        ])
+        db.session.commit()
+        return enrollment.id
@@ -0,0 +1,125 @@
+import json
+from datetime import datetime, timedelta
+
+import pytest
+
+from database import db
+
+
+@pytest.fixture
+def settled(app, monkeypatch):
+    """Events count as settled as soon as they are observed, so runs can follow each other directly"""
+    monkeypatch.setitem(app.config, 'ACTIVITY_ROLLUP_SETTLE_SECONDS', 0)
+    return app
+
+
+def record_events(catalog, count):
+    from services.activity import record_activity
+    for _ in range(count):
+        record_activity(catalog['learner_id'], catalog['course_id'], 'lecture_completed')
+    db.session.commit()
+
+
+def run_rollup():
+    from services.activity import rollup_activity
+    rollup_activity({})
+    db.session.commit()
+
+
+def learner_events(catalog):
+    from models import UserActivityDay
+    return sum(row.events for row in UserActivityDay.query.filter_by(user_id=catalog['learner_id']))
+
+
+def test_rollup_counts_each_event_once(app, settled, catalog):
+    with app.app_context():
+        record_events(catalog, 3)
+        run_rollup()  # first run only observes the newest event id
+        run_rollup()
+        run_rollup()
+        assert learner_events(catalog) == 3
+
+
+def test_overlapping_run_gives_up_before_counting(app, settled, catalog, monkeypatch):
+    import services.activity as activity
+    from models import ActivityRollupRun
+
+    with app.app_context():
+        record_events(catalog, 2)
+        run_rollup()
+        checkpoint = activity.latest_run()
+        run_rollup()
+        assert learner_events(catalog) == 2
+
+        # A run that read the checkpoint before the other run committed
+        monkeypatch.setattr(activity, 'latest_run', lambda: checkpoint)
+        run_rollup()
+        assert learner_events(catalog) == 2
+        assert ActivityRollupRun.query.count() == 2
+
+
+def test_schedule_skips_running_rollup_but_the_run_requeues(app, settled, catalog):
+    from models import BackgroundJob
+    from services.activity import schedule_rollup
+
+    with app.app_context():
+        job = schedule_rollup()
+        db.session.commit()
+        BackgroundJob.query.filter_by(id=job.id).update({'status': 'running'})
+        db.session.commit()
+
+        assert schedule_rollup() is None
+        run_rollup()
+        assert BackgroundJob.query.filter_by(job_type='rollup_activity', status='pending').count() == 1
+
+
+def pending_rollups():
+    from models import BackgroundJob
+    return BackgroundJob.query.filter_by(job_type='rollup_activity', status='pending').all()
+
+
+def test_first_run_requeues_once_its_observation_has_settled(app, catalog, monkeypatch):
+    from models import ActivityRollupRun, BackgroundJob
+
+    monkeypatch.setitem(app.config, 'ACTIVITY_ROLLUP_SETTLE_SECONDS', 5)
+    with app.app_context():
+        record_events(catalog, 2)
+        run_rollup()
+        [job] = pending_rollups()
+        assert job.run_after < datetime.utcnow() + timedelta(seconds=10)  # not ACTIVITY_ROLLUP_INTERVAL
+
+        # Too soon: the run defers itself without counting or taking the checkpoint
+        BackgroundJob.query.delete()
+        run_rollup()
+        assert learner_events(catalog) == 0
+        [job] = pending_rollups()
+        assert job.run_after < datetime.utcnow() + timedelta(seconds=10)
+
+        ActivityRollupRun.query.update({'started_at': datetime.utcnow() - timedelta(seconds=6)})
+        db.session.commit()
+        run_rollup()
+        assert learner_events(catalog) == 2
+
+
+def test_batches_continue_right_away_up_to_the_settled_id(app, catalog, monkeypatch):
+    from models import ActivityRollupRun, BackgroundJob
+
+    monkeypatch.setitem(app.config, 'ACTIVITY_ROLLUP_SETTLE_SECONDS', 5)
+    monkeypatch.setitem(app.config, 'ACTIVITY_ROLLUP_BATCH', 2)
+    with app.app_context():
+        record_events(catalog, 3)
+        run_rollup()
+        ActivityRollupRun.query.update({'started_at': datetime.utcnow() - timedelta(seconds=6)})
+        BackgroundJob.query.delete()
+        db.session.commit()
+        record_events(catalog, 1)  # after the first observation
+
+        run_rollup()
+        assert learner_events(catalog) == 2
+        [job] = pending_rollups()
+        assert job.run_after <= datetime.utcnow()
+
+        from services.activity import rollup_activity
+        rollup_activity(json.loads(job.payload))  # the continuation, not held back by the settle window
+        db.session.commit()
+        assert learner_events(catalog) == 3
@@ -0,0 +1,61 @@
+import pytest
+
+from config import Config
+
+pytest.importorskip('aiosqlite')
+
+
+@pytest.fixture
+def async_app(app, monkeypatch):
+    """A second app on the same database with the async read views enabled"""
+    from app import create_app
+    from database import async_db
+
+    monkeypatch.setattr(Config, 'ASYNC_VIEWS', True)
+    async_app = create_app()
+    async_app.config['TESTING'] = True
+    yield async_app
+    async_db.dispose()
+
+
+@pytest.fixture
+def reviewed(app, catalog, enrollment_id):
+    from database import db
+    from models import Course, Rating, Review
+
+    with app.app_context():
+        db.session.add(Review(user_id=catalog['learner_id'], course_id=catalog['course_id'],
+                              comment='Clear and well paced'))
+        db.session.add(Rating(user_id=catalog['learner_id'], course_id=catalog['course_id'], rating=4))
+        db.session.get(Course, catalog['course_id']).status = 'active'
+        db.session.commit()
+    return catalog
+
+
+@pytest.mark.parametrize('path', [
+    '/api/courses/',
+    '/api/courses/search?q=python',
+    '/api/courses/{course_id}',
+    '/api/reviews/course/{course_id}',
+    '/api/dashboard/student/{learner_id}'
+])
+def test_async_views_return_the_sync_payloads(app, async_app, reviewed, path):
+    assert async_app.view_functions['api.courses.get_course'].__module__ == 'routes.async_reads'
+    path = path.format(**reviewed)
+    sync_response = app.test_client().get(path)
+    async_response = async_app.test_client().get(path)
+    assert sync_response.status_code == 200
+    assert async_response.status_code == sync_response.status_code
+    assert async_response.get_json() == sync_response.get_json()
+
+
+def test_async_views_share_one_loop_and_pool(async_app, reviewed):
+    from database import async_db
+
+    client = async_app.test_client()
+    for _ in range(3):
+        assert client.get(f'/api/courses/{reviewed["course_id"]}').status_code == 200
+    loop = async_db.loop
+    assert loop.is_running()
+    assert client.get('/api/courses/').status_code == 200
+    assert async_db.loop is loop
@@ -0,0 +1,39 @@
+from database import db
+from middleware.auth import Principal, principal_cache
+
+
+def test_role_change_invalidates_on_commit_not_flush(app, catalog):
+    from models import User
+
+    user_id = catalog['learner_id']
+    with app.app_context():
+        principal_cache.clear()
+        user = db.session.get(User, user_id)
+        user.role = 'instructor'
+        db.session.flush()
+
+        # A request reading the still-committed row between flush and commit
+        principal_cache.set(Principal(user_id, 'learner', 'active'), 30)
+        db.session.commit()
+        assert principal_cache.get(user_id) is None
+
+
+def test_rolled_back_change_keeps_the_cached_principal(app, catalog):
+    from models import User
+
+    user_id = catalog['learner_id']
+    with app.app_context():
+        principal_cache.clear()
+        principal_cache.set(Principal(user_id, 'learner', 'active'), 30)
+        db.session.get(User, user_id).status = 'deleted'
+        db.session.flush()
+        db.session.rollback()
+        assert principal_cache.get(user_id) == Principal(user_id, 'learner', 'active')
+
+
+def test_lookup_started_before_an_invalidation_is_not_cached(catalog):
+    principal_cache.clear()
+    generation = principal_cache.generation
+    principal_cache.invalidate(catalog['learner_id'])
+    principal_cache.set(Principal(catalog['learner_id'], 'learner', 'active'), 30, generation)
+    assert principal_cache.get(catalog['learner_id']) is None
@@ -0,0 +1,47 @@
+from datetime import datetime
+
+from database import db
+
+
+def test_changes_get_their_cursor_at_commit_not_at_flush(app, catalog):
+    from models import CatalogChange, Course
+
+    with app.app_context():
+        before = CatalogChange.query.count()
+        course = Course(title='Long import', description='...', instructor_id=catalog['instructor_id'],
+                        category='Programming', created_at=datetime.utcnow())
+        db.session.add(course)
+        db.session.flush()  # an import flushes early, then runs its bulk inserts
+        assert CatalogChange.query.count() == before
+        db.session.commit()
+
+        change = CatalogChange.query.order_by(CatalogChange.id.desc()).first()
+        assert (change.entity_type, change.entity_id, change.action) == ('course', course.id, 'create')
+
+
+def test_rolled_back_changes_are_not_logged(app, catalog):
+    from models import CatalogChange, CourseModule
+
+    with app.app_context():
+        before = CatalogChange.query.count()
+        db.session.get(CourseModule, catalog['module_id']).title = 'Renamed'
+        db.session.flush()
+        db.session.rollback()
+        db.session.commit()
+        assert CatalogChange.query.count() == before
+
+
+def test_imported_modules_and_resources_are_in_the_feed(app, catalog, monkeypatch):
+    monkeypatch.setitem(app.config, 'CHANGE_FEED_SETTLE_SECONDS', 0)
+    client = app.test_client()
+    cursor = client.get('/api/changes/').get_json()['next_cursor']
+
+    response = client.post('/api/courses/import', json={
+        'title': 'Imported', 'description': '...', 'instructor_id': catalog['instructor_id'],
+        'category': 'Programming',
+        'modules': [{'number': 1, 'title': 'One', 'resources': [{'title': 'Intro', 'resource_type': 'text'}]}]
+    })
+    assert response.status_code == 201
+
+    changes = client.get(f'/api/changes/?since={cursor}').get_json()['changes']
+    assert [change['entity_type'] for change in changes] == ['course', 'module', 'lecture_resource']
@@ -0,0 +1,58 @@
+import json
+import threading
+from datetime import datetime, timedelta
+
+from database import db
+
+
+def get_funnel(app, catalog):
+    return app.test_client().get(f'/api/dashboard/instructor/courses/{catalog["course_id"]}/funnel',
+                                 headers={'X-User-Id': str(catalog['instructor_id'])})
+
+
+def test_first_view_queues_the_rollup_instead_of_computing_it(app, catalog, enrollment_id, monkeypatch):
+    from models import BackgroundJob, CourseCompletionStats
+    from services.completion_stats import refresh_completion_stats
+    from services.jobs import job_runner
+
+    monkeypatch.setattr(job_runner, '_thread', threading.Thread())  # started, as in a serving process
+    monkeypatch.setattr(job_runner, 'wake', lambda: None)
+    for _ in range(2):
+        response = get_funnel(app, catalog)
+        assert response.status_code == 202
+        assert response.get_json()['funnel'] is None
+
+    with app.app_context():
+        assert CourseCompletionStats.query.count() == 0
+        [job] = BackgroundJob.query.filter_by(job_type='refresh_completion_stats').all()
+        refresh_completion_stats(json.loads(job.payload))
+        db.session.commit()
+
+    response = get_funnel(app, catalog)
+    assert response.status_code == 200
+    assert response.get_json()['funnel']['learners'] == 1
+
+
+def test_first_view_computes_inline_without_a_running_runner(app, catalog, enrollment_id):
+    response = get_funnel(app, catalog)
+    assert response.status_code == 200
+    assert response.get_json()['funnel']['learners'] == 1
+
+
+def test_first_view_does_not_move_the_incremental_checkpoint(app, catalog, enrollment_id):
+    from models import Course, CourseCompletionStats
+    from services.completion_stats import refresh_first_view
+
+    checkpoint = datetime.utcnow() - timedelta(minutes=10)
+    with app.app_context():
+        other = Course(title='Other', description='...', instructor_id=catalog['instructor_id'],
+                       category='Programming', status='active', created_at=datetime.utcnow())
+        db.session.add(other)
+        db.session.flush()
+        db.session.add(CourseCompletionStats(course_id=other.id, learners=0, completed_count=0,
+                                             computed_at=checkpoint))
+        db.session.commit()
+
+        refresh_first_view(catalog['course_id'])
+        db.session.commit()
+        assert db.session.query(db.func.max(CourseCompletionStats.computed_at)).scalar() == checkpoint
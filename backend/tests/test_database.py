@@ -0,0 +1,44 @@
+import pytest
+from sqlalchemy.exc import DBAPIError
+
+from database import retry_on_deadlock
+
+mysql_errors = pytest.importorskip('mysql.connector.errors')
+
+
+def driver_error(error_class, errno, message):
+    """The SQLAlchemy wrapper of a mysql.connector error, as the engine raises it"""
+    return DBAPIError.instance('UPDATE ratings SET rating=%s', (4,), error_class(msg=message, errno=errno),
+                               mysql_errors.Error)
+
+
+@pytest.mark.parametrize('error_class, errno', [
+    (mysql_errors.InternalError, 1213),  # deadlock
+    (mysql_errors.DatabaseError, 1205)  # lock wait timeout
+])
+def test_deadlock_and_lock_timeout_are_retried(app, error_class, errno):
+    calls = []
+
+    @retry_on_deadlock(backoff=0)
+    def write():
+        calls.append(1)
+        if len(calls) == 1:
+            raise driver_error(error_class, errno, 'try restarting transaction')
+        return 'ok'
+
+    with app.app_context():
+        assert write() == 'ok'
+    assert len(calls) == 2
+
+
+def test_other_driver_errors_are_not_retried(app):
+    calls = []
+
+    @retry_on_deadlock(backoff=0)
+    def write():
+        calls.append(1)
+        raise driver_error(mysql_errors.IntegrityError, 1062, 'Duplicate entry')
+
+    with app.app_context(), pytest.raises(DBAPIError):
+        write()
+    assert len(calls) == 1
@@ -0,0 +1,47 @@
+import threading
+
+from config import Config
+
+
+def enroll(app, catalog):
+    response = app.test_client().post('/api/enrollments/', json={
+        'user_id': catalog['learner_id'], 'course_id': catalog['course_id']
+    })
+    assert response.status_code == 201
+    return response.get_json()['enrollment']['id']
+
+
+def queued_and_materialized(app, enrollment_id):
+    from models import BackgroundJob, Progress
+
+    with app.app_context():
+        return (BackgroundJob.query.filter_by(job_type='materialize_progress').count(),
+                Progress.query.filter_by(enrollment_id=enrollment_id).count())
+
+
+def test_enrollment_queues_progress_when_the_runner_is_running(app, catalog, monkeypatch):
+    from services.jobs import job_runner
+
+    monkeypatch.setattr(job_runner, '_thread', threading.Thread())  # started, as in a serving process
+    assert job_runner.running
+    enrollment_id = enroll(app, catalog)
+    assert queued_and_materialized(app, enrollment_id) == (1, 0)
+
+
+def test_enrollment_materializes_progress_without_a_running_runner(app, catalog):
+    from services.jobs import job_runner
+
+    assert job_runner.enabled and not job_runner.running  # flask run, or a CLI command
+    enrollment_id = enroll(app, catalog)
+    assert queued_and_materialized(app, enrollment_id) == (0, len(catalog['resource_ids']))
+
+
+def test_enrollment_materializes_progress_with_background_jobs_off(app, catalog, monkeypatch):
+    from app import create_app
+    from services.jobs import job_runner
+
+    monkeypatch.setattr(Config, 'BACKGROUND_JOBS', False)
+    jobless_app = create_app()  # same database as app
+    assert not job_runner.enabled
+    enrollment_id = enroll(jobless_app, catalog)
+    assert queued_and_materialized(app, enrollment_id) == (0, len(catalog['resource_ids']))
@@ -0,0 +1,45 @@
+from datetime import datetime
+
+import pytest
+
+from database import db
+
+
+@pytest.fixture
+def rated(app, catalog):
+    """Three Programming courses averaging 4.3, 4.1 and 3.8"""
+    from models import Course, Rating, User
+
+    with app.app_context():
+        learners = [
+            User(name=f'Rater {n}', email=f'rater{n}@example.com', password='x', role='learner',
+                 created_at=datetime.utcnow())
+            for n in range(10)
+        ]
+        db.session.add_all(learners)
+        db.session.flush()
+        for title, ratings in [('Rated 4.3', [4, 5, 4]), ('Rated 4.1', [4] * 9 + [5]), ('Rated 3.8', [4, 4, 3, 4, 4])]:
+            course = Course(title=title, description='...', instructor_id=catalog['instructor_id'],
+                            category='Programming', status='active', created_at=datetime.utcnow())
+            db.session.add(course)
+            db.session.flush()
+            db.session.add_all([
+                Rating(user_id=learner.id, course_id=course.id, rating=rating)
+                for learner, rating in zip(learners, ratings)
+            ])
+        db.session.commit()
+    return catalog
+
+
+@pytest.mark.parametrize('min_rating, titles', [(4.2, ['Rated 4.3']), (4.0, ['Rated 4.1', 'Rated 4.3'])])
+def test_facet_counts_apply_min_rating_like_the_results(app, rated, min_rating, titles):
+    response = app.test_client().get(f'/api/courses/search?q=rated&min_rating={min_rating}&sort=title')
+    assert response.status_code == 200
+    data = response.get_json()
+
+    assert [course['title'] for course in data['courses']] == titles
+    assert data['facets']['category'] == [{'value': 'Programming', 'count': len(titles)}]
+    # The rating facet ignores its own filter
+    assert data['facets']['rating'] == [
+        {'value': 4.5, 'count': 0}, {'value': 4.0, 'count': 2}, {'value': 3.5, 'count': 3}, {'value': 3.0, 'count': 3}
+    ]
@@ -0,0 +1,84 @@
+import threading
+import urllib.error
+from http.server import BaseHTTPRequestHandler, HTTPServer
+
+import pytest
+
+import services.images as images
+from services.images import ImageSourceError, is_public_address, read_source
+
+
+class Handler(BaseHTTPRequestHandler):
+    routes = {}
+
+    def do_GET(self):
+        status, headers, body = self.routes.get(self.path, (404, {}, b''))
+        self.send_response(status)
+        for name, value in headers.items():
+            self.send_header(name, value)
+        self.end_headers()
+        self.wfile.write(body)
+
+    def log_message(self, *args):
+        pass
+
+
+@pytest.fixture
+def server():
+    httpd = HTTPServer(('127.0.0.1', 0), Handler)
+    thread = threading.Thread(target=httpd.serve_forever, daemon=True)
+    thread.start()
+    yield f'http://127.0.0.1:{httpd.server_address[1]}'
+    httpd.shutdown()
+    httpd.server_close()
+
+
+@pytest.fixture
+def allow_loopback(app, monkeypatch):
+    """Treat the local test server as a public, allow-listed host"""
+    monkeypatch.setattr(images, 'is_public_address', lambda address: True)
+    app.config['IMAGE_REMOTE_HOSTS'] = ['127.0.0.1']
+
+
+@pytest.mark.parametrize('address', [
+    '127.0.0.1', '10.0.0.5', '172.16.0.1', '192.168.1.1', '169.254.169.254', '0.0.0.0', '240.0.0.1',
+    '::1', 'fe80::1', 'fc00::1', '::ffff:127.0.0.1'
+])
+def test_non_public_addresses_are_rejected(address):
+    assert not is_public_address(address)
+
+
+def test_public_addresses_are_allowed():
+    assert is_public_address('93.184.216.34')
+    assert is_public_address('2606:2800:220:1:248:1893:25c8:1946')
+
+
+def test_allow_listed_host_resolving_to_loopback_is_refused(app, server):
+    app.config['IMAGE_REMOTE_HOSTS'] = ['127.0.0.1']
+    Handler.routes = {'/image.png': (200, {}, b'png')}
+    with app.app_context(), pytest.raises(ImageSourceError, match='non-public'):
+        read_source(f'{server}/image.png')
+
+
+def test_redirect_off_the_allow_list_is_not_followed(app, server, allow_loopback):
+    Handler.routes = {'/image.png': (302, {'Location': 'http://metadata.internal/latest'}, b'')}
+    with app.app_context(), pytest.raises(ImageSourceError, match='metadata.internal'):
+        read_source(f'{server}/image.png')
+
+
+def test_redirect_to_an_allow_listed_host_is_followed(app, server, allow_loopback):
+    Handler.routes = {
+        '/image.png': (301, {'Location': f'{server}/moved.png'}, b''),
+        '/moved.png': (200, {}, b'png')
+    }
+    with app.app_context():
+        assert read_source(f'{server}/image.png') == b'png'
+
+
+def test_missing_image_is_permanent_but_unavailable_is_retried(app, server, allow_loopback):
+    Handler.routes = {'/busy.png': (503, {}, b'')}
+    with app.app_context():
+        with pytest.raises(ImageSourceError, match='HTTP 404'):
+            read_source(f'{server}/missing.png')
+        with pytest.raises(urllib.error.HTTPError):
+            read_source(f'{server}/busy.png')
@@ -0,0 +1,36 @@
+from datetime import datetime, timedelta
+
+from database import db
+
+
+def test_create_app_starts_no_background_threads(app):
+    from services.jobs import job_runner
+    from services.progress_buffer import progress_buffer
+
+    assert job_runner.enabled
+    assert job_runner._thread is None
+    assert progress_buffer._thread is None
+
+
+def test_heartbeat_keeps_long_running_jobs_from_being_requeued(app):
+    from models import BackgroundJob
+    from services.jobs import JobRunner
+
+    runner = JobRunner()
+    runner.init_app(app)
+    with app.app_context():
+        started = datetime.utcnow() - timedelta(seconds=app.config['JOB_LOCK_TIMEOUT'] + 60)
+        alive, orphaned = [
+            BackgroundJob(job_type='noop', payload='{}', status='running', run_after=started, locked_at=started)
+            for _ in range(2)
+        ]
+        db.session.add_all([alive, orphaned])
+        db.session.commit()
+
+        runner._running.add(alive.id)  # still executing in this process
+        runner._heartbeat()
+        runner._requeue_stale()
+
+        db.session.expire_all()
+        assert db.session.get(BackgroundJob, alive.id).status == 'running'
+        assert db.session.get(BackgroundJob, orphaned.id).status == 'pending'
@@ -0,0 +1,141 @@
+import hashlib
+import threading
+from datetime import datetime, timedelta
+
+import pytest
+
+from database import db
+
+
+@pytest.fixture
+def uploads(app, catalog, tmp_path):
+    """Client, headers and a factory for uploads owned by the instructor"""
+    app.config['MEDIA_ROOT'] = str(tmp_path / 'media')
+    headers = {'X-User-Id': str(catalog['instructor_id'])}
+
+    def create(size, mimetype='application/pdf'):
+        response = app.test_client().post('/api/media/uploads', headers=headers, json={
+            'filename': 'lecture.pdf', 'mimetype': mimetype, 'size': size
+        })
+        assert response.status_code == 201
+        return response.get_json()['upload']['id']
+
+    return headers, create
+
+
+def put_chunk(app, headers, upload_id, start, body, size):
+    return app.test_client().put(f'/api/media/uploads/{upload_id}', data=body, headers=dict(
+        headers, **{'Content-Range': f'bytes {start}-{start + len(body) - 1}/{size}'}
+    ))
+
+
+def part_bytes(app, upload_id):
+    with open(f'{app.config["MEDIA_ROOT"]}/uploads/{upload_id}.part', 'rb') as part:
+        return part.read()
+
+
+def test_chunks_assemble_into_the_stored_file(app, uploads):
+    headers, create = uploads
+    upload_id = create(10)
+    assert put_chunk(app, headers, upload_id, 0, b'hello', 10).status_code == 200
+    assert put_chunk(app, headers, upload_id, 5, b'world', 10).status_code == 200
+
+    response = app.test_client().post(f'/api/media/uploads/{upload_id}/complete', headers=headers)
+    assert response.status_code == 200
+    assert response.get_json()['upload']['sha256'] == hashlib.sha256(b'helloworld').hexdigest()
+
+
+def test_concurrent_chunks_for_one_offset_write_one_body(app, uploads):
+    headers, create = uploads
+    upload_id = create(8)
+    bodies = [b'aaaa', b'bbbb']
+    barrier = threading.Barrier(len(bodies))
+    statuses = []
+
+    def send(body):
+        barrier.wait()
+        statuses.append(put_chunk(app, headers, upload_id, 0, body, 8).status_code)
+
+    threads = [threading.Thread(target=send, args=(body,)) for body in bodies]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+
+    assert sorted(statuses) == [200, 409]
+    assert part_bytes(app, upload_id) in bodies
+
+
+def test_claimed_offset_is_not_written_until_the_claim_is_abandoned(app, uploads):
+    from models import MediaUpload
+
+    headers, create = uploads
+    upload_id = create(8)
+    assert put_chunk(app, headers, upload_id, 0, b'aaaa', 8).status_code == 200
+
+    with app.app_context():
+        # Another request is appending the next chunk
+        MediaUpload.query.filter_by(id=upload_id).update({'status': 'writing', 'updated_at': datetime.utcnow()})
+        db.session.commit()
+    assert put_chunk(app, headers, upload_id, 4, b'bbbb', 8).status_code == 409
+    assert part_bytes(app, upload_id) == b'aaaa'
+
+    with app.app_context():
+        # ...and died without releasing it
+        MediaUpload.query.filter_by(id=upload_id).update({'updated_at': datetime.utcnow() - timedelta(hours=1)})
+        db.session.commit()
+    assert put_chunk(app, headers, upload_id, 4, b'bbbb', 8).status_code == 200
+    assert part_bytes(app, upload_id) == b'aaaabbbb'
+
+
+def completed(app, headers, create, body, mimetype='application/pdf'):
+    upload_id = create(len(body), mimetype)
+    assert put_chunk(app, headers, upload_id, 0, body, len(body)).status_code == 200
+    response = app.test_client().post(f'/api/media/uploads/{upload_id}/complete', headers=headers)
+    assert response.status_code == 200
+    return response.get_json()['upload']['sha256']
+
+
+@pytest.mark.parametrize('mimetype', ['text/html', 'image/svg+xml', 'application/javascript'])
+def test_scriptable_types_are_rejected(app, uploads, mimetype):
+    headers, _ = uploads
+    response = app.test_client().post('/api/media/uploads', headers=headers, json={
+        'filename': 'lecture.html', 'mimetype': mimetype, 'size': 10
+    })
+    assert response.status_code == 415
+
+
+def test_only_images_are_served_inline(app, uploads):
+    headers, create = uploads
+    client = app.test_client()
+
+    document = client.get(f'/api/media/{completed(app, headers, create, b"%PDF-1.4")}')
+    assert document.headers['X-Content-Type-Options'] == 'nosniff'
+    assert document.headers['Content-Disposition'].startswith('attachment')
+
+    image = client.get(f'/api/media/{completed(app, headers, create, b"PNG bytes", "image/png")}')
+    assert image.headers['X-Content-Type-Options'] == 'nosniff'
+    assert image.headers['Content-Disposition'].startswith('inline')
+
+
+def test_concurrent_completions_store_the_file_once(app, uploads):
+    headers, create = uploads
+    upload_id = create(10)
+    assert put_chunk(app, headers, upload_id, 0, b'helloworld', 10).status_code == 200
+    barrier = threading.Barrier(2)
+    statuses = []
+
+    def complete():
+        client = app.test_client()
+        barrier.wait()
+        statuses.append(client.post(f'/api/media/uploads/{upload_id}/complete', headers=headers).status_code)
+
+    threads = [threading.Thread(target=complete) for _ in range(2)]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+
+    assert sorted(statuses) in ([200, 200], [200, 409])
+    response = app.test_client().post(f'/api/media/uploads/{upload_id}/complete', headers=headers)
+    assert response.get_json()['upload']['sha256'] == hashlib.sha256(b'helloworld').hexdigest()
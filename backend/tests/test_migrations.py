@@ -0,0 +1,27 @@
+import os
+
+from alembic.autogenerate import compare_metadata
+from alembic.migration import MigrationContext
+
+from database import db
+
+MIGRATIONS = os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))), 'migrations')
+
+
+def schema_diff():
+    with db.engine.connect() as connection:
+        return compare_metadata(MigrationContext.configure(connection, opts={'compare_type': True}), db.metadata)
+
+
+def test_upgrade_builds_the_models_schema_and_downgrade_removes_it(app):
+    from flask_migrate import downgrade, upgrade
+
+    with app.app_context():
+        db.drop_all()
+        upgrade(directory=MIGRATIONS)
+        assert schema_diff() == []
+
+        downgrade(directory=MIGRATIONS, revision='base')
+        assert db.inspect(db.engine).get_table_names() == ['alembic_version']
+        upgrade(directory=MIGRATIONS)
+        assert schema_diff() == []
@@ -0,0 +1,139 @@
+from datetime import datetime
+
+import pytest
+
+
+@pytest.fixture
+def buffer(app):
+    from services.progress_buffer import ProgressWriteBuffer
+
+    buffer = ProgressWriteBuffer()
+    buffer._app = app  # enabled, without the flush thread
+    return buffer
+
+
+def test_toggle_stays_visible_while_its_flush_runs(app, catalog, enrollment_id, buffer, monkeypatch):
+    import routes.progress
+    from models import Progress
+
+    resource_id = catalog['resource_ids'][0]
+    seen = []
+    apply = routes.progress.apply_progress_states
+
+    def observed_apply(*args, **kwargs):
+        seen.append(buffer.pending_for(enrollment_id))
+        return apply(*args, **kwargs)
+
+    monkeypatch.setattr(routes.progress, 'apply_progress_states', observed_apply)
+    with app.app_context():
+        buffer.record(enrollment_id, resource_id, True, datetime.utcnow())
+        assert buffer.flush() == 1
+        assert seen[0][resource_id][0] is True
+        assert buffer.pending_for(enrollment_id) == {}
+        assert Progress.query.filter_by(enrollment_id=enrollment_id, lecture_resource_id=resource_id).one().completed
+
+
+def test_failed_flush_keeps_the_toggle_pending(app, catalog, enrollment_id, buffer, monkeypatch):
+    import routes.progress
+
+    resource_id = catalog['resource_ids'][0]
+
+    def failing_apply(*args, **kwargs):
+        raise RuntimeError('database went away')
+
+    monkeypatch.setattr(routes.progress, 'apply_progress_states', failing_apply)
+    with app.app_context():
+        buffer.record(enrollment_id, resource_id, True, datetime.utcnow())
+        assert buffer.flush() == 0
+        assert buffer.pending_for(enrollment_id)[resource_id][0] is True
+
+
+@pytest.fixture
+def write_behind(app, buffer, monkeypatch):
+    """The routes running on buffer, as with PROGRESS_WRITE_BEHIND on"""
+    import routes.enrollments
+    import routes.progress
+    import services.progress_buffer
+
+    monkeypatch.setitem(app.config, 'PROGRESS_WRITE_BEHIND', True)
+    buffer.init_app(app)
+    for module in (services.progress_buffer, routes.progress, routes.enrollments):
+        monkeypatch.setattr(module, 'progress_buffer', buffer)
+    return buffer
+
+
+def post_batch(app, enrollment_id, updates):
+    return app.test_client().post('/api/progress/batch', json={'enrollment_id': enrollment_id, 'updates': updates})
+
+
+def test_rejected_batch_keeps_queued_toggles(app, catalog, enrollment_id, write_behind):
+    resource_id = catalog['resource_ids'][0]
+    write_behind.record(enrollment_id, resource_id, True, datetime.utcnow())
+
+    response = post_batch(app, enrollment_id, [
+        {'lecture_resource_id': resource_id, 'completed': False},
+        {'lecture_resource_id': 999999, 'completed': True}
+    ])
+    assert response.status_code == 404
+    assert write_behind.pending_for(enrollment_id)[resource_id][0] is True
+
+
+def test_committed_batch_drops_only_the_toggles_recorded_before_it(app, catalog, enrollment_id, write_behind,
+                                                                   monkeypatch):
+    import routes.progress
+
+    first, second = catalog['resource_ids']
+    write_behind.record(enrollment_id, first, True, datetime.utcnow())
+    apply = routes.progress.apply_progress_states
+
+    def apply_while_a_toggle_arrives(*args, **kwargs):
+        write_behind.record(enrollment_id, second, True, datetime.utcnow())
+        return apply(*args, **kwargs)
+
+    monkeypatch.setattr(routes.progress, 'apply_progress_states', apply_while_a_toggle_arrives)
+    response = post_batch(app, enrollment_id, [
+        {'lecture_resource_id': first, 'completed': False},
+        {'lecture_resource_id': second, 'completed': False}
+    ])
+    assert response.status_code == 200
+    assert list(write_behind.pending_for(enrollment_id)) == [second]
+
+
+def test_flush_waits_for_a_direct_write(app, enrollment_id, write_behind):
+    import threading
+
+    flushed = threading.Event()
+    with app.app_context(), write_behind.superseded_by(enrollment_id):
+        thread = threading.Thread(target=lambda: (write_behind.flush(), flushed.set()))
+        thread.start()
+        assert not flushed.wait(0.2)
+    thread.join()
+    assert flushed.is_set()
+
+
+def test_concurrent_toggles_of_one_lecture_each_flip_it(enrollment_id, buffer):
+    import threading
+
+    barrier = threading.Barrier(2)
+
+    def read_stored():
+        barrier.wait()  # both toggles read the stored state before either records
+        return False
+
+    threads = [threading.Thread(target=buffer.toggle, args=(enrollment_id, 7, read_stored)) for _ in range(2)]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+    assert buffer.pending_for(enrollment_id)[7][0] is False
+    assert [event[2] for _, event in buffer._events] == [True, False]
+
+
+def test_toggle_route_flips_the_pending_state(app, catalog, enrollment_id, write_behind):
+    resource_id = catalog['resource_ids'][0]
+    client = app.test_client()
+    payload = {'enrollment_id': enrollment_id, 'lecture_resource_id': resource_id}
+
+    assert client.post('/api/progress/toggle', json=payload).get_json()['progress']['completed'] is True
+    assert client.post('/api/progress/toggle', json=payload).get_json()['progress']['completed'] is False
+    assert write_behind.pending_for(enrollment_id)[resource_id][0] is False
@@ -0,0 +1,57 @@
+from datetime import datetime, timedelta
+
+from database import db
+
+
+def sync(app, enrollment_id, since=None):
+    query = f'?since={since}' if since else ''
+    response = app.test_client().get(f'/api/progress/completed/{enrollment_id}{query}')
+    assert response.status_code == 200
+    return response.get_json()
+
+
+def complete(enrollment_id, resource_id, updated_at):
+    from models import Progress
+    Progress.query.filter_by(enrollment_id=enrollment_id, lecture_resource_id=resource_id).update({
+        'completed': True, 'completed_at': updated_at, 'updated_at': updated_at
+    })
+    db.session.commit()
+
+
+def test_synced_at_trails_the_clock(app, enrollment_id):
+    synced_at = datetime.fromisoformat(sync(app, enrollment_id)['synced_at'])
+    assert synced_at <= datetime.utcnow() - timedelta(seconds=app.config['PROGRESS_SYNC_SETTLE_SECONDS'])
+
+
+def test_write_committed_after_the_sync_with_an_older_timestamp_is_returned(app, catalog, enrollment_id):
+    first = sync(app, enrollment_id)
+    assert first['completed_lectures'] == []
+
+    # A transaction that stamped updated_at just before the sync and committed after it
+    with app.app_context():
+        complete(enrollment_id, catalog['resource_ids'][0], datetime.utcnow() - timedelta(seconds=1))
+
+    delta = sync(app, enrollment_id, first['synced_at'])
+    assert [row['lecture_resource_id'] for row in delta['completed_lectures']] == [catalog['resource_ids'][0]]
+
+
+def test_deactivated_resource_is_reported_removed(app, catalog, enrollment_id):
+    from models import CatalogChange, LectureResource, Progress
+
+    resource_id = catalog['resource_ids'][0]
+    with app.app_context():
+        complete(enrollment_id, resource_id, datetime.utcnow() - timedelta(days=1))
+        # Course and enrollment were set up well before this sync
+        CatalogChange.query.update({'created_at': datetime.utcnow() - timedelta(days=1)})
+        Progress.query.update({'updated_at': datetime.utcnow() - timedelta(days=1)})
+        db.session.commit()
+    first = sync(app, enrollment_id)
+    assert [row['lecture_resource_id'] for row in first['completed_lectures']] == [resource_id]
+
+    with app.app_context():
+        db.session.get(LectureResource, resource_id).status = 'deleted'
+        db.session.commit()
+
+    delta = sync(app, enrollment_id, first['synced_at'])
+    assert delta['completed_lectures'] == []
+    assert delta['removed_lecture_resource_ids'] == [resource_id]
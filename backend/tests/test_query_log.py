@@ -0,0 +1,47 @@
+import pytest
+from sqlalchemy import text
+
+from config import Config
+from database import db
+
+
+@pytest.fixture
+def logged_app(tmp_path, monkeypatch, request):
+    """The app with every statement counted as slow"""
+    monkeypatch.setattr(Config, 'SLOW_QUERY_LOG', True)
+    monkeypatch.setattr(Config, 'SLOW_QUERY_THRESHOLD_MS', 0)
+    from middleware.query_log import query_stats
+    query_stats.reset()
+    return request.getfixturevalue('app')
+
+
+def entry_for(sql):
+    from middleware.query_log import query_stats
+    return next(e for e in query_stats.top(limit=1000, slow_only=False) if e['sql'] == sql)
+
+
+def test_slow_statement_is_explained_off_the_cursor_event(logged_app):
+    from middleware.query_log import explainer
+
+    from middleware.query_log import query_stats
+
+    with logged_app.app_context():
+        db.session.execute(text('SELECT id FROM users WHERE id = :id'), {'id': 1}).all()
+    explainer.join()
+
+    plan = entry_for('SELECT id FROM users WHERE id = ?')['explain']
+    assert plan and 'error' not in plan[0]
+    # EXPLAIN ran on the explainer's own engine, which is not timed
+    assert not [e for e in query_stats.top(limit=1000, slow_only=False) if e['sql'].startswith('EXPLAIN')]
+
+
+def test_failed_statement_leaves_no_start_time_behind(logged_app):
+    with logged_app.app_context():
+        connection = db.session.connection()
+        with pytest.raises(Exception):
+            connection.execute(text('SELECT * FROM no_such_table'))
+        db.session.rollback()
+        db.session.execute(text('SELECT 1')).all()
+        assert 'query_start_time' not in db.session.connection().info
+
+    assert entry_for('SELECT ?')['count'] == 1
@@ -0,0 +1,71 @@
+from datetime import datetime
+
+import pytest
+
+from database import db
+
+
+@pytest.fixture
+def unranked(app, catalog, monkeypatch):
+    """The catalog course with two existing enrollments and no ranking row, as right after deploy"""
+    import services.rankings
+    from models import CourseRanking, Enrollment, User
+
+    monkeypatch.setattr(services.rankings, '_rankings_complete', False)
+    with app.app_context():
+        for n in range(2):
+            user = User(name=f'Early {n}', email=f'early{n}@example.com', password='x', role='learner',
+                        created_at=datetime.utcnow())
+            db.session.add(user)
+            db.session.flush()
+            db.session.add(Enrollment(user_id=user.id, course_id=catalog['course_id'], status='active',
+                                      enrolled_at=datetime.utcnow()))
+        db.session.commit()
+        CourseRanking.query.delete()
+        db.session.commit()
+    return catalog
+
+
+def ranking(app, course_id):
+    from models import CourseRanking
+
+    with app.app_context():
+        return db.session.get(CourseRanking, course_id)
+
+
+def test_first_enrollment_seeds_the_ranking_from_existing_enrollments(app, unranked):
+    response = app.test_client().post('/api/enrollments/', json={
+        'user_id': unranked['learner_id'], 'course_id': unranked['course_id']
+    })
+    assert response.status_code == 201
+    row = ranking(app, unranked['course_id'])
+    assert row.enrollment_count == 3
+    assert row.trending_score > 0
+    assert row.enrollments_changed_at is not None  # incremental recommendation and funnel refreshes follow it
+
+
+def test_unenrollment_seeds_and_never_goes_negative(app, unranked):
+    from models import CourseRanking, Enrollment
+
+    with app.app_context():
+        enrollment_ids = [e.id for e in Enrollment.query.filter_by(course_id=unranked['course_id'])]
+    client = app.test_client()
+
+    assert client.delete(f'/api/enrollments/{enrollment_ids[0]}').status_code == 200
+    assert ranking(app, unranked['course_id']).enrollment_count == 1
+
+    with app.app_context():
+        CourseRanking.query.update({'enrollment_count': 0})  # drifted
+        db.session.commit()
+    assert client.delete(f'/api/enrollments/{enrollment_ids[1]}').status_code == 200
+    assert ranking(app, unranked['course_id']).enrollment_count == 0
+
+
+def test_trending_read_queues_a_rebuild_for_unranked_courses(app, unranked):
+    from models import BackgroundJob
+
+    client = app.test_client()
+    assert client.get('/api/courses/trending').status_code == 200
+    assert client.get('/api/courses/trending').status_code == 200
+    with app.app_context():
+        assert BackgroundJob.query.filter_by(job_type='rebuild_course_rankings').count() == 1
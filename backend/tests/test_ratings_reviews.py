@@ -0,0 +1,51 @@
+import threading
+
+from models import Rating, Review
+
+
+SUBMITS = 8
+
+
+def submit_concurrently(app, path, payload, submits=SUBMITS):
+    """POST the same payload from several threads at once; returns the sorted status codes"""
+    barrier = threading.Barrier(submits)
+    statuses = []
+
+    def submit():
+        client = app.test_client()
+        barrier.wait()
+        statuses.append(client.post(path, json=payload).status_code)
+
+    threads = [threading.Thread(target=submit) for _ in range(submits)]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+    return sorted(statuses)
+
+
+def test_concurrently_submitted_rating_creates_one_row(app, catalog):
+    payload = {'user_id': catalog['learner_id'], 'course_id': catalog['course_id'], 'rating': 4}
+
+    assert submit_concurrently(app, '/api/ratings/', payload) == [200] * (SUBMITS - 1) + [201]
+    with app.app_context():
+        assert Rating.query.filter_by(user_id=catalog['learner_id'], course_id=catalog['course_id']).count() == 1
+
+
+def test_concurrently_submitted_review_creates_one_row(app, catalog):
+    payload = {'user_id': catalog['learner_id'], 'course_id': catalog['course_id'], 'comment': 'Clear and short'}
+
+    assert submit_concurrently(app, '/api/reviews/', payload) == [200] * (SUBMITS - 1) + [201]
+    with app.app_context():
+        assert Review.query.filter_by(user_id=catalog['learner_id'], course_id=catalog['course_id']).count() == 1
+
+
+def test_resubmit_in_the_same_second_is_an_update(app, catalog):
+    client = app.test_client()
+    payload = {'user_id': catalog['learner_id'], 'course_id': catalog['course_id'], 'rating': 5}
+
+    assert client.post('/api/ratings/', json=payload).status_code == 201
+    response = client.post('/api/ratings/', json=dict(payload, rating=3))
+    assert response.status_code == 200
+    assert response.get_json()['rating']['rating'] == 3
+
@@ -0,0 +1,53 @@
+from contextlib import contextmanager
+
+from sqlalchemy import event
+
+from database import db
+
+
+@contextmanager
+def statements(app):
+    """The SQL run on the app's engine inside the block"""
+    with app.app_context():
+        engine = db.engine
+    seen = []
+
+    def record(conn, cursor, statement, parameters, context, executemany):
+        seen.append(statement)
+
+    event.listen(engine, 'before_cursor_execute', record)
+    try:
+        yield seen
+    finally:
+        event.remove(engine, 'before_cursor_execute', record)
+
+
+def test_warmed_pages_skip_the_catalog_card_and_stats_queries(app, catalog, enrollment_id):
+    from services.warmup import warm_caches
+
+    assert warm_caches(app) > 0
+    client = app.test_client()
+    with statements(app) as seen:
+        assert client.get('/api/courses/').status_code == 200
+        assert client.get(f'/api/courses/{catalog["course_id"]}').status_code == 200
+    assert not [sql for sql in seen if 'FROM ratings' in sql or 'FROM enrollments' in sql or 'FROM profiles' in sql]
+    assert sum('FROM courses' in sql for sql in seen) == 1  # the detail page's own lookup
+
+
+def test_commits_drop_the_entries_they_change(app, catalog, enrollment_id):
+    from services.warmup import warm_caches
+
+    warm_caches(app)
+    client = app.test_client()
+    response = client.post('/api/ratings/', json={
+        'user_id': catalog['learner_id'], 'course_id': catalog['course_id'], 'rating': 4
+    })
+    assert response.status_code == 201
+    assert client.post('/api/profiles/', json={
+        'user_id': catalog['instructor_id'], 'bio': 'Teaches Python'
+    }).status_code == 201
+
+    listed = client.get('/api/courses/').get_json()['courses'][0]
+    detail = client.get(f'/api/courses/{catalog["course_id"]}').get_json()['course']
+    for course in (listed, detail):
+        assert (course['rating'], course['total_students'], course['instructor_bio']) == (4.0, 1, 'Teaches Python')
@@ -0,0 +1,100 @@
+from datetime import datetime, timedelta
+
+import pytest
+
+from database import db
+
+pytest.importorskip('scipy')
+
+
+@pytest.fixture
+def courses(app, catalog):
+    """Four active courses; the last one shares no learners with the others"""
+    from models import Course
+
+    with app.app_context():
+        extra = [
+            Course(title=f'Course {n}', description='...', instructor_id=catalog['instructor_id'],
+                   category='Programming', status='active', created_at=datetime.utcnow())
+            for n in range(3)
+        ]
+        db.session.add_all(extra)
+        db.session.commit()
+        return [catalog['course_id']] + [course.id for course in extra]
+
+
+def enroll(app, user_number, course_id):
+    from models import User
+
+    with app.app_context():
+        email = f'learner{user_number}@example.com'
+        user = User.query.filter_by(email=email).first()
+        if user is None:
+            user = User(name=f'Learner {user_number}', email=email, password='x', role='learner',
+                        created_at=datetime.utcnow())
+            db.session.add(user)
+            db.session.commit()
+        user_id = user.id
+    response = app.test_client().post('/api/enrollments/', json={'user_id': user_id, 'course_id': course_id})
+    assert response.status_code == 201
+
+
+def compute(app, full=False):
+    from services.recommendations import compute_course_recommendations
+
+    with app.app_context():
+        compute_course_recommendations({'full': full})
+        db.session.commit()
+
+
+def stored(app):
+    from models import CourseRecommendation
+
+    with app.app_context():
+        return sorted((row.course_id, row.recommended_course_id, round(row.score, 6), row.co_enrollments)
+                      for row in CourseRecommendation.query)
+
+
+def test_incremental_refresh_loads_only_affected_learners_and_matches_a_full_run(app, courses, monkeypatch):
+    import services.recommendations
+    from models import CourseRanking, RecommendationRun
+
+    a, b, c, lonely = courses
+    for user, course in [(1, a), (1, b), (2, a), (2, b), (3, b), (3, c), (4, lonely)]:
+        enroll(app, user, course)
+    compute(app, full=True)
+    with app.app_context():
+        # The enrollments above settled long before this run
+        RecommendationRun.query.update({'started_at': datetime.utcnow() - timedelta(hours=1)})
+        CourseRanking.query.update({'enrollments_changed_at': datetime.utcnow() - timedelta(hours=2)})
+        db.session.commit()
+
+    enroll(app, 5, a)
+    enroll(app, 5, c)
+
+    loaded = []
+    load = services.recommendations.load_enrollment_matrix
+
+    def recording_load(course_ids=None):
+        matrix, course_ids = load(course_ids)
+        loaded.append({int(course_id) for course_id in course_ids})
+        return matrix, course_ids
+
+    monkeypatch.setattr(services.recommendations, 'load_enrollment_matrix', recording_load)
+    compute(app)
+    assert loaded == [{a, b, c}]
+    incremental = stored(app)
+
+    compute(app, full=True)
+    assert incremental == stored(app)
+    assert (a, c, pytest.approx(1 / 6 ** 0.5, abs=1e-6), 1) in incremental
+
+
+def test_first_read_starts_the_periodic_refresh(app, courses):
+    from models import BackgroundJob
+
+    client = app.test_client()
+    assert client.get(f'/api/courses/{courses[0]}/recommendations').status_code == 200
+    assert client.get(f'/api/courses/{courses[0]}/recommendations').status_code == 200
+    with app.app_context():
+        assert BackgroundJob.query.filter_by(job_type='compute_course_recommendations').count() == 1
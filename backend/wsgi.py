@@ -0,0 +1,12 @@
+"""WSGI entry point for production servers: gunicorn -c gunicorn.conf.py wsgi:app"""
+from app import create_app, start_background_threads
+from services.warmup import warm_caches
+
+app = create_app()
+
+# Pre-fork servers start background threads in each worker instead (gunicorn.conf.py post_fork)
+if not app.config.get('DEFER_BACKGROUND_THREADS'):
+    start_background_threads(app)
+
+if app.config.get('WARM_CACHES_ON_START'):
+    warm_caches(app)
@@ -24,6 +24,16 @@ export default function CategoryGrid() {
   useEffect(() => {
     const fetchCourses = async () => {
       try {
+        const trending = await courseApi.getTrendingCourses();
+        const trendingCourses = trending.success && trending.data
+          ? (trending.data as { courses: Course[] }).courses
+          : [];
+        if (trendingCourses.length > 0) {
+          setCourses(trendingCourses);
+          return;
+        }
+
+        // No enrollments ranked yet: show the catalog as before
         const response = await courseApi.getCourses();
         if (response.success && response.data) {
           const coursesData = (response.data as { courses: Course[] }).courses;
@@ -6,6 +6,14 @@ import LoginModal from './LoginModal';
 import SignupModal from './SignupModal';
 import Link from 'next/link';
 import UserAvatar from './UserAvatar';
+import { courseApi } from '@/lib/api';
+
+interface Suggestion {
+  id: number;
+  title: string;
+  category: string;
+  instructor_name: string | null;
+}
 
 export default function Header() {
   const [showLogin, setShowLogin] = useState(false);
@@ -14,6 +22,7 @@ export default function Header() {
   const [user, setUser] = useState<{ id: number; name: string; email: string; role: string } | null>(null);
   const [showDropdown, setShowDropdown] = useState(false);
   const [searchQuery, setSearchQuery] = useState('');
+  const [suggestions, setSuggestions] = useState<Suggestion[]>([]);
   const router = useRouter();
 
   useEffect(() => {
@@ -51,6 +60,29 @@ export default function Header() {
     };
   }, [showDropdown]);
 
+  useEffect(() => {
+    const prefix = searchQuery.trim();
+    if (!prefix) {
+      setSuggestions([]);
+      return;
+    }
+    let cancelled = false;
+    const timer = setTimeout(async () => {
+      try {
+        const response = await courseApi.suggestCourses(prefix);
+        if (!cancelled && response.success) {
+          setSuggestions(response.suggestions);
+        }
+      } catch (error) {
+        console.error('Error fetching suggestions:', error);
+      }
+    }, 150);
+    return () => {
+      cancelled = true;
+      clearTimeout(timer);
+    };
+  }, [searchQuery]);
+
   const handleLogout = () => {
     localStorage.removeItem('user');
     setUser(null);
@@ -61,6 +93,7 @@ export default function Header() {
   const handleSearch = (e: React.FormEvent) => {
     e.preventDefault();
     if (searchQuery.trim()) {
+      setSuggestions([]);
       router.push(`/search?q=${encodeURIComponent(searchQuery)}`);
     }
   };
@@ -113,6 +146,7 @@ export default function Header() {
                   type="text"
                   value={searchQuery}
                   onChange={(e) => setSearchQuery(e.target.value)}
+                  onBlur={() => setTimeout(() => setSuggestions([]), 150)}
                   placeholder="Search for anything"
                   className="w-full px-4 py-2 border border-gray-300 rounded-full focus:outline-none focus:ring-2 focus:ring-blue-500 focus:border-transparent bg-gray-50"
                 />
@@ -121,6 +155,27 @@ export default function Header() {
                     <path strokeLinecap="round" strokeLinejoin="round" strokeWidth={2} d="M21 21l-6-6m2-5a7 7 0 11-14 0 7 7 0 0114 0z" />
                   </svg>
                 </button>
+                {suggestions.length > 0 && (
+                  <ul className="absolute left-0 right-0 mt-2 bg-white border border-gray-200 rounded-lg shadow-lg z-50 overflow-hidden">
+                    {suggestions.map((suggestion) => (
+                      <li key={suggestion.id}>
+                        <Link
+                          href={`/course/${suggestion.id}`}
+                          onClick={() => {
+                            setSuggestions([]);
+                            setSearchQuery('');
+                          }}
+                          className="block px-4 py-2 hover:bg-gray-50"
+                        >
+                          <span className="text-sm font-medium text-gray-900">{suggestion.title}</span>
+                          <span className="block text-xs text-gray-500">
+                            {[suggestion.category, suggestion.instructor_name].filter(Boolean).join(' · ')}
+                          </span>
+                        </Link>
+                      </li>
+                    ))}
+                  </ul>
+                )}
               </form>
             </div>
 
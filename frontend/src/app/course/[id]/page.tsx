@@ -23,6 +23,7 @@ export default function CourseDetail() {
   const [userId, setUserId] = useState<number | null>(null);
   const [expandedModules, setExpandedModules] = useState<Set<number>>(new Set());
   const [moduleLessons, setModuleLessons] = useState<Record<number, any[]>>({});
+  const [recommendations, setRecommendations] = useState<any[]>([]);
 
   useEffect(() => {
     const fetchCourseAndEnrollment = async () => {
@@ -59,6 +60,21 @@ export default function CourseDetail() {
     fetchCourseAndEnrollment();
   }, [courseId]);
 
+  useEffect(() => {
+    const fetchRecommendations = async () => {
+      try {
+        const response = await courseApi.getCourseRecommendations(Number(courseId));
+        if (response.success && response.data) {
+          setRecommendations((response.data as { courses: any[] }).courses);
+        }
+      } catch (err) {
+        console.error('Error fetching recommendations:', err);
+      }
+    };
+
+    fetchRecommendations();
+  }, [courseId]);
+
   const handleEnroll = async () => {
     try {
       setEnrolling(true);
@@ -472,6 +488,27 @@ export default function CourseDetail() {
           </div>
         </div>
       </section>
+
+      {recommendations.length > 0 && (
+        <section className="max-w-7xl mx-auto px-6 pb-12">
+          <h2 className="text-2xl font-bold text-gray-900 mb-6">Students also enrolled in</h2>
+          <div className="grid sm:grid-cols-2 md:grid-cols-3 gap-6">
+            {recommendations.map((recommended) => (
+              <Link
+                key={recommended.id}
+                href={`/course/${recommended.id}`}
+                className="block border border-gray-200 rounded-lg p-4 hover:shadow-md transition-shadow"
+              >
+                <p className="font-semibold text-gray-900">{recommended.title}</p>
+                <p className="text-sm text-gray-600 mt-1">{recommended.instructor || recommended.category}</p>
+                <p className="text-xs text-gray-500 mt-2">
+                  {recommended.rating ? `${recommended.rating} ★ · ` : ''}{recommended.total_students ?? 0} students
+                </p>
+              </Link>
+            ))}
+          </div>
+        </section>
+      )}
     </main>
   );
 }
@@ -82,13 +82,15 @@ export default function ManageLectureLessons() {
     }
   };
 
-  const handleEdit = (lesson: any) => {
+  const handleEdit = async (lesson: any) => {
+    // The lesson list only carries a preview, so load the full content for editing
+    const contentRes = lesson.content_preview ? await lectureResourceApi.getResourceContent(lesson.id) : null;
     setEditingLesson(lesson);
     setFormData({
       lesson_type: lesson.resource_type,
       title: lesson.title,
       url: lesson.url || '',
-      content: lesson.content || '',
+      content: contentRes?.success ? contentRes.data || '' : lesson.content_preview || '',
       duration: lesson.duration || '',
       order: lesson.order?.toString() || '',
     });
@@ -204,8 +206,8 @@ export default function ManageLectureLessons() {
                           {lesson.url}
                         </a>
                       )}
-                      {lesson.resource_type === 'text' && lesson.content && (
-                        <p className="text-gray-600 text-sm mb-1">{lesson.content.substring(0, 150)}{lesson.content.length > 150 ? '...' : ''}</p>
+                      {lesson.resource_type === 'text' && lesson.content_preview && (
+                        <p className="text-gray-600 text-sm mb-1">{lesson.content_preview}{lesson.content_truncated ? '...' : ''}</p>
                       )}
                       {lesson.duration && (
                         <span className="text-sm text-gray-500">⏱️ {lesson.duration}</span>
@@ -17,7 +17,12 @@ export default function CourseSidebar({ courseId, modules }: CourseSidebarProps)
     const currentLectureId = params.lectureId ? Number(params.lectureId) : null;
 
     const [expandedModules, setExpandedModules] = useState<Set<number>>(new Set());
-    const [moduleLessons, setModuleLessons] = useState<Record<number, any[]>>({});
+    // Modules from the course outline already carry their resources
+    const [moduleLessons, setModuleLessons] = useState<Record<number, any[]>>(() =>
+        Object.fromEntries(
+            modules.filter((module) => module.resources).map((module) => [module.id, module.resources])
+        )
+    );
     const [loading, setLoading] = useState<Record<number, boolean>>({});
 
     useEffect(() => {
@@ -2,7 +2,7 @@
 
 import { useState, useEffect } from 'react';
 import { useParams, useRouter } from 'next/navigation';
-import { courseApi, lectureApi } from '@/lib/api';
+import { courseApi } from '@/lib/api';
 import CourseSidebar from './_components/CourseSidebar';
 import TopNavigation from './_components/TopNavigation';
 
@@ -29,14 +29,11 @@ export default function LearnLayout({
                     return;
                 }
 
-                const courseRes = await courseApi.getCourse(courseId);
-                if (courseRes.success && courseRes.data) {
-                    setCourse((courseRes.data as any).course);
-                }
-
-                const lecturesRes = await lectureApi.getCourseLectures(courseId);
-                if (lecturesRes.success && lecturesRes.data) {
-                    setModules((lecturesRes.data as any).lectures || []);
+                const outlineRes = await courseApi.getCourseOutline(courseId);
+                if (outlineRes.success && outlineRes.data) {
+                    const outline = (outlineRes.data as any).course;
+                    setCourse(outline);
+                    setModules(outline.modules || []);
                 }
             } catch (err) {
                 console.error('Failed to load course data', err);
@@ -21,6 +21,19 @@ interface Course {
   duration: string;
 }
 
+interface FacetCount {
+  value: string | number;
+  label?: string;
+  count: number;
+}
+
+interface SearchFacets {
+  category: FacetCount[];
+  level: FacetCount[];
+  instructor: FacetCount[];
+  rating: FacetCount[];
+}
+
 export default function SearchPage() {
   const searchParams = useSearchParams();
   const searchQuery = searchParams.get('q') || '';
@@ -28,37 +41,25 @@ export default function SearchPage() {
   const [loading, setLoading] = useState(true);
   const [selectedCategory, setSelectedCategory] = useState<string>('');
   const [selectedLevel, setSelectedLevel] = useState<string>('');
-  const [allCourses, setAllCourses] = useState<Course[]>([]);
-
-  useEffect(() => {
-    const fetchAllCourses = async () => {
-      try {
-        const response = await courseApi.getCourses();
-        if (response.success && response.data) {
-          const coursesData = (response.data as { courses: Course[] }).courses;
-          setAllCourses(coursesData);
-        }
-      } catch (error) {
-        console.error('Error fetching all courses:', error);
-      }
-    };
-    fetchAllCourses();
-  }, []);
+  const [selectedRating, setSelectedRating] = useState<string>('');
+  const [facets, setFacets] = useState<SearchFacets | null>(null);
 
   useEffect(() => {
     const fetchCourses = async () => {
       try {
         setLoading(true);
-        const filters: { q?: string; category?: string; level?: string } = {};
+        const filters: { q?: string; category?: string; level?: string; min_rating?: string } = {};
         
         if (searchQuery) filters.q = searchQuery;
         if (selectedCategory) filters.category = selectedCategory;
         if (selectedLevel) filters.level = selectedLevel;
+        if (selectedRating) filters.min_rating = selectedRating;
 
         const response = await courseApi.getCourses(filters);
         if (response.success && response.data) {
-          const coursesData = (response.data as { courses: Course[] }).courses;
-          setCourses(coursesData);
+          const data = response.data as { courses: Course[]; facets: SearchFacets };
+          setCourses(data.courses);
+          setFacets(data.facets);
         }
       } catch (error) {
         console.error('Error fetching courses:', error);
@@ -68,10 +69,11 @@ export default function SearchPage() {
     };
 
     fetchCourses();
-  }, [searchQuery, selectedCategory, selectedLevel]);
+  }, [searchQuery, selectedCategory, selectedLevel, selectedRating]);
 
-  const categories = Array.from(new Set(allCourses.map(c => c.category).filter(Boolean)));
   const levels = ['Beginner', 'Intermediate', 'Advanced'];
+  const facetCount = (facet: FacetCount[] | undefined, value: string | number) =>
+    facet?.find(item => item.value === value)?.count ?? 0;
 
   return (
     <main className="min-h-screen bg-white">
@@ -97,9 +99,9 @@ export default function SearchPage() {
                 className="px-4 py-2 border border-gray-300 rounded-lg focus:outline-none focus:ring-2 focus:ring-blue-500 min-w-[200px]"
               >
                 <option value="">All Categories</option>
-                {categories.map(cat => (
-                  <option key={cat} value={cat}>
-                    {cat}
+                {(facets?.category ?? []).map(cat => (
+                  <option key={cat.value} value={cat.value}>
+                    {cat.value} ({cat.count})
                   </option>
                 ))}
               </select>
@@ -115,17 +117,34 @@ export default function SearchPage() {
                 <option value="">All Levels</option>
                 {levels.map(level => (
                   <option key={level} value={level}>
-                    {level}
+                    {level} ({facetCount(facets?.level, level)})
+                  </option>
+                ))}
+              </select>
+            </div>
+
+            <div>
+              <label className="block text-sm font-medium text-gray-700 mb-2">Rating</label>
+              <select
+                value={selectedRating}
+                onChange={(e) => setSelectedRating(e.target.value)}
+                className="px-4 py-2 border border-gray-300 rounded-lg focus:outline-none focus:ring-2 focus:ring-blue-500 min-w-[200px]"
+              >
+                <option value="">Any Rating</option>
+                {(facets?.rating ?? []).map(bucket => (
+                  <option key={bucket.value} value={bucket.value.toString()}>
+                    {Number(bucket.value).toFixed(1)} & up ({bucket.count})
                   </option>
                 ))}
               </select>
             </div>
 
-            {(selectedCategory || selectedLevel) && (
+            {(selectedCategory || selectedLevel || selectedRating) && (
               <button
                 onClick={() => {
                   setSelectedCategory('');
                   setSelectedLevel('');
+                  setSelectedRating('');
                 }}
                 className="px-4 py-2 text-sm text-blue-600 hover:text-blue-800 self-end"
               >
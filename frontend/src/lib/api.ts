@@ -159,11 +159,13 @@ export const courseApi = {
     category?: string;
     level?: string;
     q?: string;
+    min_rating?: string;
   }) => {
     const params = new URLSearchParams();
     if (filters?.category) params.append('category', filters.category);
     if (filters?.level) params.append('level', filters.level);
     if (filters?.q) params.append('q', filters.q);
+    if (filters?.min_rating) params.append('min_rating', filters.min_rating);
 
     const query = params.toString() ? `?${params.toString()}` : '';
     return apiCall(`/courses/search${query}`, {
@@ -171,12 +173,49 @@ export const courseApi = {
     });
   },
 
+  getTrendingCourses: async (options?: {
+    category?: string;
+    ranking?: 'trending' | 'popular' | 'top_rated';
+    limit?: number;
+  }) => {
+    const params = new URLSearchParams();
+    if (options?.category) params.append('category', options.category);
+    if (options?.ranking) params.append('ranking', options.ranking);
+    if (options?.limit) params.append('limit', options.limit.toString());
+
+    const query = params.toString() ? `?${params.toString()}` : '';
+    return apiCall(`/courses/trending${query}`, {
+      method: 'GET',
+    });
+  },
+
+  suggestCourses: async (prefix: string, limit?: number) => {
+    const params = new URLSearchParams({ prefix });
+    if (limit) params.append('limit', limit.toString());
+    return apiCall(`/courses/suggest?${params.toString()}`, {
+      method: 'GET',
+    });
+  },
+
   getCourse: async (courseId: number) => {
     return apiCall(`/courses/${courseId}`, {
       method: 'GET',
     });
   },
 
+  getCourseRecommendations: async (courseId: number, limit?: number) => {
+    const query = limit ? `?limit=${limit}` : '';
+    return apiCall(`/courses/${courseId}/recommendations${query}`, {
+      method: 'GET',
+    });
+  },
+
+  getCourseOutline: async (courseId: number) => {
+    return apiCall(`/courses/${courseId}/outline`, {
+      method: 'GET',
+    });
+  },
+
   createCourse: async (courseData: any) => {
     return apiCall('/courses/', {
       method: 'POST',
@@ -184,6 +223,13 @@ export const courseApi = {
     });
   },
 
+  importCourse: async (outline: any) => {
+    return apiCall('/courses/import', {
+      method: 'POST',
+      body: JSON.stringify(outline),
+    });
+  },
+
   updateCourse: async (courseId: number, updates: any) => {
     return apiCall(`/courses/${courseId}`, {
       method: 'PUT',
@@ -210,6 +256,32 @@ export const dashboardApi = {
       method: 'GET',
     });
   },
+
+  getCourseFunnel: async (courseId: number, userId: number) => {
+    return apiCall(`/dashboard/instructor/courses/${courseId}/funnel`, {
+      method: 'GET',
+      headers: {
+        'X-User-Id': userId.toString(),
+      },
+    });
+  },
+
+  getStudentActivity: async (userId: number, days?: number) => {
+    const query = days ? `?days=${days}` : '';
+    return apiCall(`/dashboard/student/${userId}/activity${query}`, {
+      method: 'GET',
+    });
+  },
+
+  getCourseActivity: async (courseId: number, userId: number, days?: number) => {
+    const query = days ? `?days=${days}` : '';
+    return apiCall(`/dashboard/instructor/courses/${courseId}/activity${query}`, {
+      method: 'GET',
+      headers: {
+        'X-User-Id': userId.toString(),
+      },
+    });
+  },
 };
 
 export const enrollmentApi = {
@@ -238,6 +310,12 @@ export const enrollmentApi = {
       method: 'GET',
     });
   },
+
+  getContinueLearning: async (userId: number) => {
+    return apiCall(`/enrollments/user/${userId}/continue`, {
+      method: 'GET',
+    });
+  },
 };
 
 export const reviewApi = {
@@ -363,6 +441,22 @@ export const lectureResourceApi = {
     });
   },
 
+  getResourceContent: async (resourceId: number): Promise<ApiResponse<string>> => {
+    try {
+      const response = await fetch(`${API_BASE_URL}/lecture-resources/${resourceId}/content`);
+      if (!response.ok) {
+        const data = await response.json().catch(() => ({}));
+        return { success: false, error: data.error || 'Something went wrong' };
+      }
+      return { success: true, data: await response.text() };
+    } catch (error) {
+      return {
+        success: false,
+        error: error instanceof Error ? error.message : 'Network error',
+      };
+    }
+  },
+
   updateResource: async (resourceId: number, updates: any) => {
     return apiCall(`/lecture-resources/${resourceId}`, {
       method: 'PUT',
@@ -388,17 +482,92 @@ export const progressApi = {
     });
   },
 
+  batchUpdateProgress: async (
+    enrollmentId: number,
+    updates: { lecture_resource_id: number; completed: boolean }[]
+  ) => {
+    return apiCall('/progress/batch', {
+      method: 'POST',
+      body: JSON.stringify({
+        enrollment_id: enrollmentId,
+        updates,
+      }),
+    });
+  },
+
   getCourseProgress: async (enrollmentId: number) => {
     return apiCall(`/progress/course/${enrollmentId}`, {
       method: 'GET',
     });
   },
 
-  getCompletedLectures: async (enrollmentId: number) => {
-    return apiCall(`/progress/completed/${enrollmentId}`, {
+  getCompletedLectures: async (enrollmentId: number, since?: string) => {
+    const query = since ? `?since=${encodeURIComponent(since)}` : '';
+    return apiCall(`/progress/completed/${enrollmentId}${query}`, {
       method: 'GET',
     });
   },
 };
 
+export const mediaApi = {
+  // Uploads a file in chunks; an interrupted upload resumes from the server's offset
+  uploadFile: async (
+    file: File,
+    lectureResourceId?: number,
+    onProgress?: (sent: number, total: number) => void,
+    chunkSize: number = 8 * 1024 * 1024
+  ) => {
+    const created = await apiCall<{ upload: { id: string; offset: number } }>('/media/uploads', {
+      method: 'POST',
+      body: JSON.stringify({
+        filename: file.name,
+        mimetype: file.type || 'application/octet-stream',
+        size: file.size,
+        lecture_resource_id: lectureResourceId,
+      }),
+    });
+    if (!created.success || !created.data) return created;
+
+    const uploadId = created.data.upload.id;
+    const userId = getUserIdFromStorage();
+    let offset = created.data.upload.offset;
+    let retries = 0;
+
+    while (offset < file.size) {
+      const end = Math.min(offset + chunkSize, file.size) - 1;
+      try {
+        const response = await fetch(`${API_BASE_URL}/media/uploads/${uploadId}`, {
+          method: 'PUT',
+          headers: {
+            'Content-Range': `bytes ${offset}-${end}/${file.size}`,
+            ...(userId ? { 'X-User-Id': userId } : {}),
+          },
+          body: file.slice(offset, end + 1),
+        });
+        const data = await response.json();
+        if (typeof data.offset === 'number') {
+          offset = data.offset;
+        } else if (!response.ok) {
+          return { success: false, error: data.error || 'Upload failed' };
+        }
+        retries = 0;
+      } catch (error) {
+        if (++retries > 3) {
+          return {
+            success: false,
+            error: error instanceof Error ? error.message : 'Network error',
+          };
+        }
+        const status = await apiCall<{ upload: { offset: number } }>(`/media/uploads/${uploadId}`, { method: 'GET' });
+        if (status.success && status.data) offset = status.data.upload.offset;
+      }
+      onProgress?.(offset, file.size);
+    }
+
+    return apiCall(`/media/uploads/${uploadId}/complete`, {
+      method: 'POST',
+    });
+  },
+};
+
 export { API_BASE_URL };